@@ -75,13 +75,10 @@ nb_name = "01-sanity_check_run"
 # ## Part 2. Load Simulation Data
 
 # %% papermill={"duration": 0.015428, "end_time": "2024-03-07T18:33:03.287428", "exception": false, "start_time": "2024-03-07T18:33:03.272000", "status": "completed"}
-from glob import glob
+from subspace_model.store import load_results
 
 # %% papermill={"duration": 0.019857, "end_time": "2024-03-07T18:33:03.311768", "exception": false, "start_time": "2024-03-07T18:33:03.291911", "status": "completed"}
-newest_data = sorted(glob("../data/simulations/sanity_check_run*"))[-1]
-
-# %% papermill={"duration": 0.015725, "end_time": "2024-03-07T18:33:03.332112", "exception": false, "start_time": "2024-03-07T18:33:03.316387", "status": "completed"}
-sim_df = pd.read_pickle(newest_data)
+sim_df = load_results("sanity_check_run", directory="../data/simulations")
 
 # %% papermill={"duration": 0.037289, "end_time": "2024-03-07T18:33:03.373985", "exception": false, "start_time": "2024-03-07T18:33:03.336696", "status": "completed"}
 sim_df.head(5)
@@ -43,10 +43,10 @@ pd.set_option('display.max_columns', None)
 # from subspace_model.experiment import standard_stochastic_run
 # sim_df = standard_stochastic_run()
 
-# Load simulation results from terminal ran experiment
-sim_df = pd.read_pickle(
-    "../data/simulations/standard_stochastic_run-2024-01-02_12-04-38.pkl.gz"
-)
+# Load the latest simulation results from terminal ran experiment
+from subspace_model.store import load_results
+
+sim_df = load_results("standard_stochastic_run", directory="../data/simulations")
 
 # %% papermill={"duration": 0.018446, "end_time": "2024-01-31T00:36:42.685898", "exception": false, "start_time": "2024-01-31T00:36:42.667452", "status": "completed"}
 sim_df.head()
@@ -45,9 +45,9 @@ pio.renderers.default = "png" # For GitHub rendering
 # ## Part 2. Load Simulation Data
 
 # %% papermill={"duration": 0.010236, "end_time": "2024-01-31T00:36:58.067839", "exception": false, "start_time": "2024-01-31T00:36:58.057603", "status": "completed"}
-sim_df = pd.read_pickle(
-    "../data/simulations/reward_split_sweep-2024-01-02_10-17-33.pkl.gz"
-)
+from subspace_model.store import load_results
+
+sim_df = load_results("reward_split_sweep", directory="../data/simulations")
 
 # %% papermill={"duration": 0.014895, "end_time": "2024-01-31T00:36:58.084163", "exception": false, "start_time": "2024-01-31T00:36:58.069268", "status": "completed"}
 sim_df.head()
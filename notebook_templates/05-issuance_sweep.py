@@ -50,7 +50,9 @@ pio.renderers.default = "png" # For GitHub rendering
 # ## Part 2. Load Simulation Data
 
 # %% papermill={"duration": 0.009916, "end_time": "2024-01-31T00:36:50.717887", "exception": false, "start_time": "2024-01-31T00:36:50.707971", "status": "completed"}
-sim_df = pd.read_pickle("../data/simulations/issuance_sweep-2024-01-02_12-27-12.pkl.gz")
+from subspace_model.store import load_results
+
+sim_df = load_results("issuance_sweep", directory="../data/simulations")
 
 # %% papermill={"duration": 0.013708, "end_time": "2024-01-31T00:36:50.733654", "exception": false, "start_time": "2024-01-31T00:36:50.719946", "status": "completed"}
 sim_df.head()
@@ -48,7 +48,9 @@ from subspace_model.experiments.charts import ab_block_utilization
 # Load simulation data and set index to `days_passed`, backfill (for initial timesteps) and replace nan with 0.
 
 # %% papermill={"duration": 0.032844, "end_time": "2024-01-31T00:37:02.141933", "exception": false, "start_time": "2024-01-31T00:37:02.109089", "status": "completed"}
-df = pd.read_pickle('../data/simulations/sweep_credit_supply-2023-12-21_22-37-37.pkl.gz').set_index('days_passed').bfill().fillna(0)
+from subspace_model.store import load_results
+
+df = load_results('sweep_credit_supply', directory='../data/simulations').set_index('days_passed').bfill().fillna(0)
 df.head()
 
 # %% papermill={"duration": 0.015682, "end_time": "2024-01-31T00:37:02.161396", "exception": false, "start_time": "2024-01-31T00:37:02.145714", "status": "completed"}
@@ -49,12 +49,17 @@ from bokeh.palettes import Turbo256, Category20
 # ## Part 2. Load Simulation Data
 
 # %% [markdown] papermill={"duration": 0.004393, "end_time": "2024-01-31T00:37:21.387874", "exception": false, "start_time": "2024-01-31T00:37:21.383481", "status": "completed"}
-# Load the simulation results data.
+# Load the simulation results data from the result store.
 
 # %% papermill={"duration": 0.019539, "end_time": "2024-01-31T00:37:21.430033", "exception": false, "start_time": "2024-01-31T00:37:21.410494", "status": "completed"}
-sim_df = pd.read_pickle(
-    "../data/simulations/initial_conditions-2024-01-04_11-38-47.pkl.gz"
-).drop(['timestep', 'simulation', 'subset', 'timestep_in_days', 'block_time_in_seconds', 'delta_days', 'delta_blocks'], axis=1)
+from subspace_model.store import load_results
+
+# Load the latest results, without reading the unused columns
+sim_df = load_results(
+    'initial_conditions',
+    exclude=['timestep', 'simulation', 'subset', 'timestep_in_days', 'block_time_in_seconds', 'delta_days', 'delta_blocks'],
+    directory='../data/simulations',
+)
 
 # %% papermill={"duration": 0.026983, "end_time": "2024-01-31T00:37:21.461524", "exception": false, "start_time": "2024-01-31T00:37:21.434541", "status": "completed"}
 sim_df.head(5)
@@ -54,15 +54,10 @@ from subspace_model.util import g
 # Load the simulation results data.
 
 # %% papermill={"duration": 0.021693, "end_time": "2024-01-31T08:17:08.644912", "exception": false, "start_time": "2024-01-31T08:17:08.623219", "status": "completed"}
-import glob
-import os
+from subspace_model.store import load_results
 
 def load_latest_simulation(simulation_name):
-    files = glob.glob(f"../data/simulations/{simulation_name}-*.pkl.gz")
-    latest_file = max(files, key=os.path.getctime)
-
-    print(f"Loading Latest File: {latest_file}")
-    df = pd.read_pickle(latest_file)
+    df = load_results(simulation_name, directory="../data/simulations")
     df = df.drop(['timestep', 'simulation', 'subset', 'timestep_in_days', 'block_time_in_seconds', 'delta_days', 'delta_blocks'], axis=1)
     return df
 
@@ -72,8 +67,8 @@ sim_df = load_latest_simulation("reference_subsidy_sweep")
 sim_df
 
 # %% papermill={"duration": 0.0231, "end_time": "2024-01-31T08:17:08.749916", "exception": false, "start_time": "2024-01-31T08:17:08.726816", "status": "completed"}
-# sim_df = pd.read_pickle(
-#     "../data/simulations/reference_subsidy_sweep-2024-01-30_11-07-21.pkl.gz"
+# sim_df = load_results(
+#     "reference_subsidy_sweep", timestamp="2024-01-30_11-07-21", directory="../data/simulations"
 # ).drop(['timestep', 'simulation', 'subset', 'timestep_in_days', 'block_time_in_seconds', 'delta_days', 'delta_blocks'], axis=1)
 
 # %% papermill={"duration": 0.042732, "end_time": "2024-01-31T08:17:08.799469", "exception": false, "start_time": "2024-01-31T08:17:08.756737", "status": "completed"}
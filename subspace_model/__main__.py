@@ -1,10 +1,10 @@
 import logging
 
 logger = logging.getLogger("subspace-digital-twin")
-import glob
 
 # logging.basicConfig(filename='cadcad.log', level=logging.INFO)
 import os
+import time
 from datetime import datetime
 
 import click
@@ -15,7 +15,9 @@ pd.set_option("display.width", None)
 pd.set_option("display.max_columns", None)
 # pd.set_option('display.max_rows', None)
 
+from subspace_model.experiments.backends import BACKENDS, use_backend
 from subspace_model.experiments.charts import (  # mc_total_supply,
+    CHART_COLUMNS,
     ab_block_utilization,
     ab_circulating_supply,
     ab_circulating_supply_volatility,
@@ -24,21 +26,42 @@ from subspace_model.experiments.charts import (  # mc_total_supply,
 )
 from subspace_model.experiments.experiment import (
     fund_inclusion,
+    gradients,
     initial_conditions,
     issuance_sweep,
+    pruned_sweep_over_single_component_and_credit_supply,
     reference_subsidy_sweep,
     reward_split_sweep,
     sanity_check_run,
+    screened_sweep_over_single_component_and_credit_supply,
+    standard_mean_field_run,
     standard_stochastic_run,
     sweep_credit_supply,
     sweep_over_single_component_and_credit_supply,
 )
+import subspace_model.experiments.charts as experiment_plots
+import subspace_model.experiments.metrics as experiment_metrics
+import subspace_model.store as store
 from subspace_model.experiments.metrics import (
     profit1_mean,
     profit1_timestep,
     total_supply_max,
     total_supply_mean,
 )
+from subspace_model.experiments.sequential import sequential_run
+from subspace_model.experiments.spec import bundled_specs, compile_spec, run_plans
+from subspace_model.experiments.precision import precision_report
+from subspace_model.store import (
+    PRECISIONS,
+    BackgroundWriter,
+    latest_timestamp,
+    load_results,
+    migrate_pickles,
+    use_checkpoints,
+    use_precision,
+    write_results,
+    write_table,
+)
 
 # Define a dictionary to map string log levels to their corresponding constants in logging module
 log_levels = {
@@ -49,6 +72,8 @@ log_levels = {
     "critical": logging.CRITICAL,
 }
 
+METRICS_DIRECTORY = "data/metrics"
+
 experiments = {
     "sanity_check_run": sanity_check_run,
     "standard_stochastic_run": standard_stochastic_run,
@@ -59,6 +84,10 @@ experiments = {
     "sweep_over_single_component_and_credit_supply": sweep_over_single_component_and_credit_supply,
     "initial_conditions": initial_conditions,
     "reference_subsidy_sweep": reference_subsidy_sweep,
+    "gradients": gradients,
+    "standard_mean_field_run": standard_mean_field_run,
+    "screened_sweep_over_single_component_and_credit_supply": screened_sweep_over_single_component_and_credit_supply,
+    "pruned_sweep_over_single_component_and_credit_supply": pruned_sweep_over_single_component_and_credit_supply,
 }
 
 experiment_ids = {
@@ -72,18 +101,22 @@ experiment_ids = {
     "initial_conditions": 8,
     "sweep_over_single_component_and_credit_supply": 9,
     "reference_subsidy_sweep": 10,
+    "gradients": 11,
+    "standard_mean_field_run": 12,
+    "screened_sweep_over_single_component_and_credit_supply": 13,
+    "pruned_sweep_over_single_component_and_credit_supply": 14,
 }
 
+# The experiments with a bundled spec list their outputs in it, see
+# `charts_of` and `trajectory_metrics_of`
 experiment_charts = {
-    "sanity_check_run": [],
-    "standard_stochastic_run": [ab_block_utilization],
-    "issuance_sweep": [],
-    "fund_inclusion": [],
-    "reward_split_sweep": [],
-    "sweep_credit_supply": [ab_block_utilization],
     "sweep_over_single_component_and_credit_supply": [],
     "initial_conditions": [],
     "reference_subsidy_sweep": [],
+    "gradients": [],
+    "standard_mean_field_run": [],
+    "screened_sweep_over_single_component_and_credit_supply": [],
+    "pruned_sweep_over_single_component_and_credit_supply": [],
 }
 
 experiment_timestep_metrics = {
@@ -96,18 +129,20 @@ experiment_timestep_metrics = {
     "sweep_over_single_component_and_credit_supply": [],
     "initial_conditions": [],
     "reference_subsidy_sweep": [],
+    "gradients": [],
+    "standard_mean_field_run": [],
+    "screened_sweep_over_single_component_and_credit_supply": [],
+    "pruned_sweep_over_single_component_and_credit_supply": [],
 }
 
 experiment_trajectory_metrics = {
-    "sanity_check_run": [total_supply_mean, total_supply_max, profit1_mean],
-    "standard_stochastic_run": [total_supply_mean, total_supply_max, profit1_mean],
-    "issuance_sweep": [],
-    "fund_inclusion": [],
-    "reward_split_sweep": [],
-    "sweep_credit_supply": [],
     "sweep_over_single_component_and_credit_supply": [],
     "initial_conditions": [],
     "reference_subsidy_sweep": [],
+    "gradients": [],
+    "standard_mean_field_run": [],
+    "screened_sweep_over_single_component_and_credit_supply": [],
+    "pruned_sweep_over_single_component_and_credit_supply": [],
 }
 
 experiment_additional_notebook_templates = {
@@ -120,69 +155,81 @@ experiment_additional_notebook_templates = {
     "sweep_over_single_component_and_credit_supply": [],
     "initial_conditions": [],
     "reference_subsidy_sweep": [],
+    "gradients": [],
+    "standard_mean_field_run": [],
+    "screened_sweep_over_single_component_and_credit_supply": [],
+    "pruned_sweep_over_single_component_and_credit_supply": [],
 }
 
 
-def write_pickle_results(df, directory: str, filename: str):
-    filepath = os.path.join(directory, filename)
-
-    # Check if the directory exists, create it if it doesn't
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-
-    # Save the DataFrame
-    df.to_pickle(filepath, compression="gzip")
-    logger.info(f"Results saved to {filepath}.")
-
-
 def find_latest_simulation(experiment: str) -> str | None:
-    pattern = f"data/simulations/{experiment}-*.pkl.gz"
-    files = glob.glob(pattern)
-
     if experiment not in list(experiments.keys()):
         logger.warning(
             f"Experiment {experiment} not found. Try one of: {list(experiments.keys())}"
         )
         return None
 
-    if not files:
+    # Get the most recent results based on their timestamp
+    timestamp = latest_timestamp(experiment)
+
+    if timestamp is None:
         logger.warning(
             f"No data found for experiment: {experiment}. Try generating data with `python -m subspace_model -e {experiment}"
         )
         return None
 
-    # Get the most recent file based on modification time
-    latest_file = max(files, key=os.path.getmtime)
+    return timestamp
 
-    # Get the timestamp of the experiment
-    timestamp = "-".join(latest_file.split("-")[1:]).replace(".pkl.gz", "")
 
-    return timestamp
+def charts_of(experiment: str) -> list:
+    """The charts of an experiment, from its spec when it has one."""
+    if experiment in bundled_specs():
+        plan = compile_spec(experiment)
+        return [getattr(experiment_plots, chart) for chart in plan.charts]
+    return experiment_charts[experiment]
+
 
+def trajectory_metrics_of(experiment: str) -> list:
+    """The trajectory metrics of an experiment, from its spec when it has one."""
+    if experiment in bundled_specs():
+        plan = compile_spec(experiment)
+        return [getattr(experiment_metrics, m) for m in plan.trajectory_metrics]
+    return experiment_trajectory_metrics[experiment]
 
-def get_charts(df: pd.DataFrame, experiment: str):
-    charts = [
-        (plot.__name__, plot(df, experiment)) for plot in experiment_charts[experiment]
-    ]
+
+def get_charts(df: pd.DataFrame, experiment: str, charts: list | None = None):
+    charts = charts_of(experiment) if charts is None else charts
+    charts = [(plot.__name__, plot(df, experiment)) for plot in charts]
 
     return charts
 
 
-def save_charts(experiment: str):
+def save_charts(
+    experiment: str, charts: list | None = None, timestamp: str | None = None
+):
+    """
+    Saves the charts of the latest results of an experiment, or of the
+    results at `timestamp`. `charts` default to the charts of the
+    experiment, see `charts_of`.
+    """
     logger.info(f"Visualizing experiment: {experiment}...")
-    latest_simulation_timestamp = find_latest_simulation(experiment)
+    latest_simulation_timestamp = timestamp or find_latest_simulation(experiment)
     if latest_simulation_timestamp is not None:
-        latest_simulation = (
-            f"data/simulations/{experiment}-{latest_simulation_timestamp}.pkl.gz"
+        # Only read the columns the charts need
+        charts = charts_of(experiment) if charts is None else charts
+        columns = None
+        if all(chart.__name__ in CHART_COLUMNS for chart in charts):
+            columns = sorted({c for f in charts for c in CHART_COLUMNS[f.__name__]})
+        df = load_results(
+            experiment, columns=columns, timestamp=latest_simulation_timestamp
         )
-        df = pd.read_pickle(latest_simulation)
 
         # Check if the directory exists, create it if it doesn't
         directory = f"data/charts/"
         if not os.path.exists(directory):
             os.makedirs(directory)
 
-        charts = get_charts(df, experiment)
+        charts = get_charts(df, experiment, charts)
         for chart_name, chart in charts:
             logger.info(f"Generating chart {chart_name} for experiment {experiment}...")
             chart.write_image(
@@ -205,10 +252,10 @@ def run_calculate_metrics(sim_df: pd.DataFrame, experiment: str):
     logger.info(timestep_metrics_df)
 
     # Trajectory metrics
-    trajectory_metrics = experiment_trajectory_metrics[experiment]
+    trajectory_metrics = trajectory_metrics_of(experiment)
     if len(trajectory_metrics):
         trajectory_metrics_df = pd.concat(
-            [metrics(sim_df) for metrics in experiment_trajectory_metrics[experiment]],
+            [metrics(sim_df) for metrics in trajectory_metrics],
             axis=1,
         ).T
     else:
@@ -220,14 +267,36 @@ def run_calculate_metrics(sim_df: pd.DataFrame, experiment: str):
 
 
 def run_experiment(
-    experiment: str, samples: int | None = None, days: int | None = None
+    experiment: str,
+    samples: int | None = None,
+    days: int | None = None,
+    ci_half_width: float | None = None,
+    max_samples: int = 100,
 ):
     """
     Run an experiment with for a given number of days and samples.
+
+    If `ci_half_width` is set, samples are added in batches of `samples`
+    until the relative confidence interval half-width of the experiment's
+    first trajectory metric is below it, or `max_samples` is reached.
     """
     logger.info(f"Executing experiment: {experiment}...")
     experiment_run = experiments[experiment]
-    if days is not None:
+    started = time.perf_counter()
+    if ci_half_width is not None:
+        metric = (trajectory_metrics_of(experiment) or [total_supply_mean])[0]
+        kwargs = {"SIMULATION_DAYS": days} if days is not None else {}
+        df, diagnostics = sequential_run(
+            experiment_run,
+            metric=metric,
+            target=ci_half_width,
+            batch_size=samples if samples is not None else 5,
+            max_samples=max_samples,
+            **kwargs,
+        )
+        logger.info(f"Sequential sampling diagnostics for {experiment}:")
+        logger.info(diagnostics)
+    elif days is not None:
         if samples is not None:
             df = experiment_run(SAMPLES=samples, SIMULATION_DAYS=days)
         else:
@@ -237,6 +306,7 @@ def run_experiment(
             df = experiment_run(SAMPLES=samples)
         else:
             df = experiment_run()
+    df.attrs["duration"] = time.perf_counter() - started
 
     logger.info(f"{experiment} executed.")
     logger.info(df.columns)
@@ -253,6 +323,8 @@ def process_experiment(
     generate_template: bool = False,
     samples: int | None = None,
     days: int | None = None,
+    ci_half_width: float | None = None,
+    max_samples: int = 100,
 ):
     if generate_notebooks:
         generate_notebooks_from_templates(experiment)
@@ -264,34 +336,176 @@ def process_experiment(
         save_charts(experiment)
         return
     else:
-        sim_df = run_experiment(experiment, samples, days)
-        if calculate_metrics:
-            timestep_metrics_df, trajectory_metrics_df = run_calculate_metrics(
+        sim_df = run_experiment(
+            experiment, samples, days, ci_half_width, max_samples
+        )
+        save_experiment_results(sim_df, experiment, pickle, calculate_metrics)
+
+
+def log_precision_report(sim_df: pd.DataFrame, experiment: str):
+    """Reports the error of the key metrics when storing in float32."""
+    if store.PRECISION != "float32":
+        return
+    report = precision_report(sim_df)
+    logger.info(f"Precision report for {experiment}:")
+    logger.info(report)
+    if not report["within_tolerance"].all():
+        logger.warning(
+            f"Storing {experiment} in float32 exceeds the tolerance on: "
+            f"{list(report.index[~report['within_tolerance']])}"
+        )
+
+
+def save_experiment_results(
+    sim_df: pd.DataFrame,
+    experiment: str,
+    pickle: bool,
+    calculate_metrics: bool,
+    timestamp: str | None = None,
+):
+    """
+    Calculates the metrics of the results and saves them. When given a
+    `timestamp`, the results were already written while running, with a
+    `BackgroundWriter`, and only the metrics are.
+    """
+    if calculate_metrics:
+        timestep_metrics_df, trajectory_metrics_df = run_calculate_metrics(
+            sim_df,
+            experiment,
+        )
+
+    # Conditionally save the results
+    if pickle and timestamp is None:
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        write_results(sim_df, experiment, timestamp)
+    if pickle:
+        log_precision_report(sim_df, experiment)
+    if pickle and calculate_metrics:
+        write_table(
+            timestep_metrics_df,
+            f"{METRICS_DIRECTORY}/{experiment}-timestep-metrics-{timestamp}.parquet",
+        )
+        write_table(
+            trajectory_metrics_df,
+            f"{METRICS_DIRECTORY}/{experiment}-trajectory-metrics-{timestamp}.parquet",
+        )
+
+
+def process_all_experiments(
+    visualize: bool,
+    pickle: bool,
+    calculate_metrics: bool,
+    generate_notebooks: bool = False,
+    generate_template: bool = False,
+    samples: int | None = None,
+    days: int | None = None,
+    ci_half_width: float | None = None,
+    max_samples: int = 100,
+):
+    """
+    Processes every experiment. When running them, the experiments defined
+    by bundled specs are batched: their plans are compiled once and run
+    together (see `run_plans`), and the results are split back per
+    experiment. The other experiments are run one by one.
+    """
+    batched = []
+    running = not (visualize or generate_notebooks or generate_template)
+    if running and ci_half_width is None:
+        batched = [e for e in experiments if e in bundled_specs()]
+        plans = [
+            compile_spec(experiment, SIMULATION_DAYS=days, SAMPLES=samples)
+            for experiment in batched
+        ]
+        logger.info(f"Executing batched experiments: {batched}...")
+        # The results are written while the next chunks run
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        # Sparse results are split once complete, see `store.sparse_results`
+        streaming = pickle and store.CHECKPOINT_EVERY is None
+        writers = [
+            BackgroundWriter(experiment, timestamp) if streaming else None
+            for experiment in batched
+        ]
+        try:
+            results = run_plans(plans, writers)
+        except BaseException:
+            for writer in writers:
+                if writer is not None:
+                    writer.abort()
+            raise
+        for experiment, sim_df, writer in zip(batched, results, writers):
+            if writer is not None:
+                writer.close()
+            logger.info(f"{experiment} executed.")
+            save_experiment_results(
                 sim_df,
                 experiment,
+                pickle,
+                calculate_metrics,
+                timestamp if streaming else None,
             )
 
-        # Conditionally pickle the results
-        if pickle:
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            write_pickle_results(
-                sim_df,
-                directory="data/simulations/",
-                filename=f"{experiment}-{timestamp}.pkl.gz",
-            )
-        if pickle and calculate_metrics:
-            write_pickle_results(
-                timestep_metrics_df,
-                directory="data/metrics/",
-                filename=f"{experiment}-timestep-metrics-{timestamp}.pkl.gz",
-            )
-            write_pickle_results(
-                trajectory_metrics_df,
-                directory="data/metrics/",
-                filename=f"{experiment}-trajectory-metrics-{timestamp}.pkl.gz",
+    for experiment in experiments:
+        if experiment not in batched:
+            process_experiment(
+                visualize,
+                experiment,
+                pickle,
+                calculate_metrics,
+                generate_notebooks,
+                generate_template,
+                samples,
+                days,
+                ci_half_width,
+                max_samples,
             )
 
 
+def process_spec(
+    spec: str,
+    pickle: bool,
+    calculate_metrics: bool,
+    samples: int | None = None,
+    days: int | None = None,
+):
+    """
+    Runs an experiment spec file, see `subspace_model.experiments.spec`.
+    Results are saved under the name of the spec, along with the charts
+    and trajectory metrics listed in its outputs.
+    """
+    plan = compile_spec(spec, SIMULATION_DAYS=days, SAMPLES=samples)
+    logger.info(f"Executing spec {spec} ({plan.name}, hash {plan.spec_hash})...")
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    if pickle and store.CHECKPOINT_EVERY is None:
+        # The results are written while the next chunks run
+        with BackgroundWriter(plan.name, timestamp) as writer:
+            sim_df = plan.run(writer)
+        log_precision_report(sim_df, plan.name)
+    else:
+        sim_df = plan.run()
+        if pickle:
+            write_results(sim_df, plan.name, timestamp)
+            log_precision_report(sim_df, plan.name)
+    logger.info(f"{plan.name} executed.")
+
+    if calculate_metrics:
+        metrics = [getattr(experiment_metrics, m) for m in plan.trajectory_metrics]
+        if len(metrics):
+            trajectory_metrics_df = pd.concat(
+                [metric(sim_df) for metric in metrics], axis=1
+            ).T
+        else:
+            trajectory_metrics_df = pd.DataFrame()
+        logger.info(f"Trajectory metrics for {plan.name}:")
+        logger.info(trajectory_metrics_df)
+        if pickle:
+            filename = f"{plan.name}-trajectory-metrics-{timestamp}.parquet"
+            write_table(trajectory_metrics_df, f"{METRICS_DIRECTORY}/{filename}")
+
+    if pickle and len(plan.charts):
+        charts = [getattr(experiment_plots, chart) for chart in plan.charts]
+        save_charts(plan.name, charts, timestamp)
+
+
 def generate_notebooks_from_templates(experiment: str):
     logger.info(f"Generating notebooks for {experiment}")
     id = "{:02d}".format(experiment_ids[experiment])
@@ -331,10 +545,18 @@ def generate_template_from_notebook(experiment: str):
 @click.option(
     "-p",
     "--pickle",
+    "--save",
     "pickle",
     default=False,
     is_flag=True,
-    help="Pickle results to data/simulations/.",
+    help="Save results to data/simulations/ as Parquet datasets.",
+)
+@click.option(
+    "--migrate-pickles",
+    "migrate",
+    default=False,
+    is_flag=True,
+    help="Convert the gzip pickles in data/simulations/ to Parquet datasets and exit.",
 )
 @click.option(
     "-i",
@@ -384,6 +606,50 @@ def generate_template_from_notebook(experiment: str):
     type=int,
     help="Number of simulation days.",
 )
+@click.option(
+    "-ci",
+    "--ci-half-width",
+    "ci_half_width",
+    default=None,
+    type=float,
+    help="Add samples in batches of -s until the relative confidence interval half-width of the first trajectory metric is below this value.",
+)
+@click.option(
+    "--max-samples",
+    "max_samples",
+    default=100,
+    type=int,
+    help="Maximum number of samples when sampling sequentially with -ci.",
+)
+@click.option(
+    "-b",
+    "--backend",
+    "backend",
+    type=click.Choice(["auto", *BACKENDS.keys()], case_sensitive=False),
+    default="single",
+    help="Execution backend. auto picks one from the size of every run.",
+)
+@click.option(
+    "--precision",
+    "precision",
+    type=click.Choice(PRECISIONS, case_sensitive=False),
+    default="float64",
+    help="Precision of the saved results. float32 keeps the balances and sum_of_stocks in float64.",
+)
+@click.option(
+    "--checkpoint-every",
+    "checkpoint_every",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Save sparse results: summary columns at every timestep and the full state every N timesteps, from which runs can be reconstructed.",
+)
+@click.option(
+    "--spec",
+    "spec",
+    default=None,
+    type=str,
+    help="Run an experiment spec file (TOML or YAML), or a bundled spec by name, instead of -e.",
+)
 @click.option(
     "-m",
     "--metrics",
@@ -411,12 +677,19 @@ def generate_template_from_notebook(experiment: str):
 def main(
     experiment: str,
     pickle: bool,
+    migrate: bool,
     interactive: bool,
     log_level: str,
     run_all: bool,
     visualize: bool,
     samples: int | None,
     days: int | None,
+    ci_half_width: float | None,
+    max_samples: int,
+    backend: str,
+    precision: str,
+    checkpoint_every: int | None,
+    spec: str | None,
     calculate_metrics: bool,
     generate_notebooks: bool,
     generate_template: bool,
@@ -426,20 +699,31 @@ def main(
     logger.info(f"Initializing main...")
     logger.info(f"Setting log level to {log_level}...")
     logger.setLevel(log_levels[log_level])
+    use_backend(backend)
+    use_precision(precision)
+    use_checkpoints(checkpoint_every)
+
+    if migrate:
+        migrate_pickles()
+        return
+
+    # Experiment spec selected
+    if spec is not None:
+        process_spec(spec, pickle, calculate_metrics, samples, days)
 
     # All experiments selected
-    if run_all:
-        for experiment in list(experiments.keys()):
-            process_experiment(
-                visualize,
-                experiment,
-                pickle,
-                calculate_metrics,
-                generate_notebooks,
-                generate_template,
-                samples,
-                days,
-            )
+    elif run_all:
+        process_all_experiments(
+            visualize,
+            pickle,
+            calculate_metrics,
+            generate_notebooks,
+            generate_template,
+            samples,
+            days,
+            ci_half_width,
+            max_samples,
+        )
 
     # Single experiment selected
     else:
@@ -452,6 +736,8 @@ def main(
             generate_template,
             samples,
             days,
+            ci_half_width,
+            max_samples,
         )
 
     # Conditionally drop into an IPython shell
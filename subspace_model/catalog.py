@@ -0,0 +1,267 @@
+"""
+Results catalog.
+
+Every result set written to the store is recorded in a SQLite catalog
+next to it, with its experiment, the hash of the assigned params of every
+subset (see `param_set_hash`),
+the fingerprint of the model code, the seeds, the sample count, the
+horizon, the row count, its path and how long it took to run. Lookups
+such as the latest results of an experiment with given params, or all
+the results touching a label, are indexed queries instead of scans of
+the filesystem.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("subspace-digital-twin")
+
+CATALOG_FILE = "catalog.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    experiment TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    spec_hash TEXT,
+    code_fingerprint TEXT,
+    seeds TEXT,
+    samples INTEGER,
+    subsets INTEGER,
+    timesteps INTEGER,
+    days REAL,
+    rows INTEGER,
+    duration REAL,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS results_experiment
+    ON results (experiment, timestamp);
+CREATE TABLE IF NOT EXISTS result_params (
+    result_id INTEGER REFERENCES results (id) ON DELETE CASCADE,
+    subset INTEGER,
+    params_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS result_params_hash ON result_params (params_hash);
+CREATE TABLE IF NOT EXISTS result_labels (
+    result_id INTEGER REFERENCES results (id) ON DELETE CASCADE,
+    label TEXT,
+    environmental_label TEXT
+);
+CREATE INDEX IF NOT EXISTS result_labels_label ON result_labels (label);
+CREATE INDEX IF NOT EXISTS result_labels_environmental_label
+    ON result_labels (environmental_label);
+"""
+
+
+def catalog_path(directory: str) -> str:
+    return os.path.join(directory, CATALOG_FILE)
+
+
+def connect(directory: str) -> sqlite3.Connection:
+    """Opens the catalog of a results directory, creating it if needed."""
+    os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(catalog_path(directory))
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+@lru_cache
+def code_fingerprint() -> str:
+    """A hash of the source of the model package."""
+    root = os.path.dirname(__file__)
+    digest = hashlib.sha256()
+    for folder, _, files in sorted(os.walk(root)):
+        for name in sorted(f for f in files if f.endswith(".py")):
+            path = os.path.join(folder, name)
+            digest.update(os.path.relpath(path, root).encode())
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def _canonical(value: object) -> object:
+    # Numpy scalars hash as the numbers they hold, as in the param sets
+    if isinstance(value, np.generic):
+        return value.item()
+    # Functions are named rather than printed, as their repr holds an address
+    return getattr(value, "__qualname__", None) or str(value)
+
+
+def params_hash(params: dict) -> str:
+    """A short hash of a set of param values, independent of key order."""
+    canonical = json.dumps(params, sort_keys=True, default=_canonical)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:12]
+
+
+def param_set_hash(param_set: dict, assign_params: set) -> str:
+    """
+    The hash a param set is recorded with: the hash of its params which are
+    assigned to the results, eg. `batch.ASSIGN_PARAMS` or the
+    `assign_params` of an experiment plan.
+    """
+    return params_hash({k: v for k, v in param_set.items() if k in assign_params})
+
+
+def subset_params_hashes(
+    sim_df: pd.DataFrame, param_columns: list[str]
+) -> dict[int, str]:
+    """The hash of the param columns of every subset."""
+    if "subset" not in sim_df.columns:
+        return {0: params_hash({c: sim_df[c].iloc[0] for c in param_columns})}
+    first = sim_df.groupby("subset")[param_columns].first()
+    return {
+        int(subset): params_hash(row.to_dict()) for subset, row in first.iterrows()
+    }
+
+
+def record_results(
+    sim_df: pd.DataFrame,
+    experiment: str,
+    timestamp: str,
+    path: str,
+    directory: str,
+    param_columns: Optional[list[str]] = None,
+    append: bool = False,
+    rows: Optional[int] = None,
+) -> int:
+    """
+    Records a result set in the catalog of `directory`. The params of every
+    subset are hashed from its `param_columns`, the columns of its assigned
+    params, as `param_set_hash` hashes a param set. The run duration and
+    the spec hash are taken from `sim_df.attrs` when set. With `append`,
+    `sim_df` is a part of a result set already recorded, whose rows,
+    duration and subsets are added to the record. `rows` overrides the
+    row count, eg. when `sim_df` only holds the last row of every run.
+
+    Returns:
+        int: The id of the result set in the catalog
+    """
+    if param_columns is None:
+        param_columns = []
+    seeds = None
+    if "random_seed" in sim_df.columns:
+        seeds = json.dumps(sorted(sim_df["random_seed"].dropna().unique().tolist()))
+    record = {
+        "experiment": experiment,
+        "timestamp": timestamp,
+        "path": os.path.abspath(path),
+        "spec_hash": sim_df.attrs.get("spec_hash"),
+        "code_fingerprint": code_fingerprint(),
+        "seeds": seeds,
+        "samples": int(sim_df["run"].nunique()) if "run" in sim_df else None,
+        "subsets": int(sim_df["subset"].nunique()) if "subset" in sim_df else None,
+        "timesteps": int(sim_df["timestep"].max()) if "timestep" in sim_df else None,
+        "days": float(sim_df["days_passed"].max()) if "days_passed" in sim_df else None,
+        "rows": len(sim_df) if rows is None else rows,
+        "duration": sim_df.attrs.get("duration"),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    labels = [c for c in ["label", "environmental_label"] if c in sim_df.columns]
+    pairs = sim_df[labels].drop_duplicates() if labels else pd.DataFrame()
+    hashes = subset_params_hashes(sim_df, param_columns) if len(sim_df) else {}
+
+    with connect(directory) as connection:
+        # Takes the write lock first, as writers may append concurrently
+        connection.execute("BEGIN IMMEDIATE")
+        existing = connection.execute(
+            "SELECT id FROM results WHERE path = ?", (record["path"],)
+        ).fetchone()
+        if append and existing is not None:
+            result_id = existing[0]
+            connection.execute(
+                "UPDATE results SET rows = rows + ?, "
+                "duration = COALESCE(duration, 0) + COALESCE(?, 0) WHERE id = ?",
+                (record["rows"], record["duration"], result_id),
+            )
+        else:
+            connection.execute("DELETE FROM results WHERE path = ?", (record["path"],))
+            cursor = connection.execute(
+                f"INSERT INTO results ({', '.join(record)}) "
+                f"VALUES ({', '.join('?' * len(record))})",
+                list(record.values()),
+            )
+            result_id = cursor.lastrowid
+        connection.executemany(
+            "INSERT INTO result_params VALUES (?, ?, ?)",
+            [(result_id, subset, h) for subset, h in hashes.items()],
+        )
+        connection.executemany(
+            "INSERT INTO result_labels VALUES (?, ?, ?)",
+            [
+                (result_id, row.get("label"), row.get("environmental_label"))
+                for row in pairs.to_dict("records")
+            ],
+        )
+        if append:
+            connection.execute(
+                "UPDATE results SET subsets = (SELECT COUNT(DISTINCT subset) "
+                "FROM result_params WHERE result_id = ?) WHERE id = ?",
+                (result_id, result_id),
+            )
+    connection.close()
+    return result_id
+
+
+def find_results(
+    directory: str,
+    experiment: Optional[str] = None,
+    label: Optional[str] = None,
+    environmental_label: Optional[str] = None,
+    params_hash: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    The result sets matching every filter that is set, most recent first.
+
+    Returns:
+        pd.DataFrame: One row per result set
+    """
+    if not os.path.exists(catalog_path(directory)):
+        return pd.DataFrame()
+    clauses, values = [], []
+    if experiment is not None:
+        clauses.append("experiment = ?")
+        values.append(experiment)
+    if label is not None:
+        clauses.append("id IN (SELECT result_id FROM result_labels WHERE label = ?)")
+        values.append(label)
+    if environmental_label is not None:
+        clauses.append(
+            "id IN (SELECT result_id FROM result_labels "
+            "WHERE environmental_label = ?)"
+        )
+        values.append(environmental_label)
+    if params_hash is not None:
+        clauses.append(
+            "id IN (SELECT result_id FROM result_params WHERE params_hash = ?)"
+        )
+        values.append(params_hash)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    connection = connect(directory)
+    results = pd.read_sql_query(
+        f"SELECT * FROM results {where} ORDER BY timestamp DESC, id DESC",
+        connection,
+        params=values,
+    )
+    connection.close()
+    return results
+
+
+def latest_result(
+    directory: str, experiment: str, params_hash: Optional[str] = None
+) -> Optional[dict]:
+    """The most recent result set of an experiment still on disk, if any."""
+    results = find_results(directory, experiment=experiment, params_hash=params_hash)
+    for record in results.to_dict("records"):
+        if os.path.exists(record["path"]):
+            return record
+    return None
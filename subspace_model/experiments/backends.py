@@ -0,0 +1,251 @@
+"""
+Execution backends.
+
+Every backend runs a list of parameter sets, one cadCAD subset each, and
+returns the same dataframe schema as `easy_run`: the state variables,
+`simulation`, `subset`, `run`, `timestep` and the assigned params, sorted
+by subset, run and timestep.
+
+- `single`: cadCAD single mode, in process
+- `local`: cadCAD local mode, cadCAD's own multiprocessing
+- `process_pool`: the parameter sets are split across a pool of worker
+  processes, each running them in cadCAD single mode. Parameter functions
+  are serialized with dill, as lambdas do not pickle. Workers hand their
+  trajectories back through shared memory rather than pickles.
+
+`auto` picks one of them from the size of the run.
+"""
+import logging
+import os
+import uuid
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Optional
+
+import dill  # type: ignore
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from cadCAD.tools import easy_run  # type: ignore
+from multiprocess import Pool  # type: ignore
+from pandas import DataFrame
+
+logger = logging.getLogger("subspace-digital-twin")
+
+# Runs (cells x samples x timesteps) below which a process pool does not
+# pay for its setup and serialization
+POOL_MIN_WORK = 20_000
+
+
+def param_sets_to_sweep(param_sets: list[dict]) -> dict[str, list]:
+    """
+    Converts a list of parameter sets into cadCAD sweep params, where the
+    i-th element of every list belongs to the i-th parameter set.
+    """
+    keys: dict[str, None] = {}
+    for param_set in param_sets:
+        keys.update(dict.fromkeys(param_set))
+    return {k: [param_set[k] for param_set in param_sets] for k in keys}
+
+
+def _normalize(sim_df: DataFrame) -> DataFrame:
+    return sim_df.sort_values(["subset", "run", "timestep"], ignore_index=True)
+
+
+def _cadcad_backend(exec_mode: str) -> Callable:
+    def run(
+        param_sets: list[dict],
+        TIMESTEPS: int,
+        SAMPLES: int,
+        initial_state: dict,
+        blocks: list[dict],
+        assign_params: set,
+    ) -> DataFrame:
+        sim_df = easy_run(
+            initial_state,
+            param_sets_to_sweep(param_sets),
+            blocks,
+            TIMESTEPS,
+            SAMPLES,
+            assign_params=assign_params,
+            exec_mode=exec_mode,
+            deepcopy_off=True,
+            supress_print=True,
+        )
+        sim_df = _normalize(sim_df)
+        sim_df.attrs["assign_params"] = sorted(assign_params)
+        return sim_df
+
+    return run
+
+
+run_single = _cadcad_backend("single")
+run_local = _cadcad_backend("local")
+
+
+def _to_shared_memory(
+    sim_df: DataFrame, name: Optional[str] = None
+) -> tuple[str, DataFrame, list[str]]:
+    """
+    Writes the numeric columns of a frame as an Arrow IPC stream into a
+    shared memory block sized for them, named `name` when given. The block
+    outlives the worker, and is unlinked by the process reading it.
+
+    Returns:
+        tuple: The name of the block, the other columns, eg. labels and
+        parameter functions, which are sent as usual, and the column order
+    """
+    columns = [
+        c for c in sim_df.columns if pd.api.types.is_numeric_dtype(sim_df[c].dtype)
+    ]
+    table = pa.Table.from_pandas(sim_df[columns], preserve_index=False)
+    size = pa.MockOutputStream()
+    with pa.ipc.new_stream(size, table.schema) as writer:
+        writer.write_table(table)
+    block = shared_memory.SharedMemory(name, create=True, size=max(size.size(), 1))
+    # The worker must not unlink the block when it exits
+    resource_tracker.unregister(block._name, "shared_memory")
+    sink = pa.FixedSizeBufferWriter(pa.py_buffer(block.buf))
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    # The block only closes once nothing refers to its memory
+    del writer, sink
+    block.close()
+    return block.name, sim_df.drop(columns=columns), list(sim_df.columns)
+
+
+def _from_shared_memory(names: list[str]) -> DataFrame:
+    """
+    Reads the Arrow streams of shared memory blocks into a single frame
+    and unlinks the blocks. The tables are mapped onto the blocks rather
+    than copied, and are concatenated the same way; the only copy is the
+    final one into the numpy blocks of the frame, which no longer refer to
+    the blocks.
+    """
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    try:
+        tables = [pa.ipc.open_stream(pa.py_buffer(b.buf)).read_all() for b in blocks]
+        df = pa.concat_tables(tables).to_pandas()
+        del tables
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return df
+
+
+def _unlink_shared_memory(names: list[str]) -> None:
+    """Unlinks the shared memory blocks of `names` that still exist."""
+    for name in names:
+        try:
+            block = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            continue
+        block.close()
+        block.unlink()
+
+
+def _run_chunk(args: tuple) -> tuple[str, DataFrame, list[str]]:
+    name, run_args = args
+    return _to_shared_memory(run_single(*run_args), name)
+
+
+def run_process_pool(
+    param_sets: list[dict],
+    TIMESTEPS: int,
+    SAMPLES: int,
+    initial_state: dict,
+    blocks: list[dict],
+    assign_params: set,
+    workers: Optional[int] = None,
+) -> DataFrame:
+    """
+    Runs contiguous chunks of the parameter sets on a pool of workers. The
+    shared memory blocks are named by the parent, so that the blocks of the
+    workers which succeeded are unlinked when another one fails.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(param_sets))
+    bounds = np.linspace(0, len(param_sets), workers + 1).astype(int)
+    token = uuid.uuid4().hex[:12]
+    names = [f"subspace_{token}_{i}" for i in range(workers)]
+    args = (TIMESTEPS, SAMPLES, initial_state, blocks, assign_params)
+    chunks = [
+        (name, (param_sets[a:b], *args))
+        for name, a, b in zip(names, bounds[:-1], bounds[1:])
+    ]
+    try:
+        with Pool(workers) as pool:
+            results = pool.map(_run_chunk, chunks)
+        _, objects, columns = zip(*results)
+        sim_df = _from_shared_memory(names)
+    finally:
+        _unlink_shared_memory(names)
+    sim_df["subset"] += np.repeat(bounds[:-1], [len(o) for o in objects])
+    sim_df = pd.concat([sim_df, pd.concat(objects, ignore_index=True)], axis=1)
+    return _normalize(sim_df[columns[0]])
+
+
+BACKENDS: dict[str, Callable] = {
+    "single": run_single,
+    "local": run_local,
+    "process_pool": run_process_pool,
+}
+
+# Backend used when the runners are not given one, see `use_backend`
+BACKEND = "single"
+
+
+def use_backend(name: str) -> None:
+    """Sets the backend of the runners, eg. from the `--backend` option."""
+    global BACKEND
+    if name != "auto" and name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name}, try one of {list(BACKENDS)}")
+    BACKEND = name
+
+
+def select_backend(
+    param_sets: list[dict],
+    TIMESTEPS: int,
+    SAMPLES: int,
+    initial_state: dict,
+    blocks: list[dict],
+) -> str:
+    """
+    Picks a backend for a run: a process pool when there are several
+    parameter sets, cores to spread them on, enough work to amortize the
+    workers and a model that can be serialized, and single mode otherwise.
+    """
+    work = len(param_sets) * SAMPLES * TIMESTEPS
+    if len(param_sets) < 2 or (os.cpu_count() or 1) < 2 or work < POOL_MIN_WORK:
+        return "single"
+    if not dill.pickles((param_sets, initial_state, blocks)):
+        logger.warning("The model does not serialize, running in single mode")
+        return "single"
+    return "process_pool"
+
+
+def execute(
+    param_sets: list[dict],
+    TIMESTEPS: int,
+    SAMPLES: int,
+    initial_state: dict,
+    blocks: list[dict],
+    assign_params: set,
+    backend: Optional[str] = None,
+) -> DataFrame:
+    """
+    Runs the parameter sets on `backend`, or on the backend set with
+    `use_backend` when not given.
+
+    Returns:
+        DataFrame: A dataframe of simulation data, with the assigned params
+        in `attrs["assign_params"]`
+    """
+    name = backend or BACKEND
+    if name == "auto":
+        name = select_backend(param_sets, TIMESTEPS, SAMPLES, initial_state, blocks)
+    logger.debug(f"Running {len(param_sets)} parameter sets on the {name} backend")
+    sim_df = BACKENDS[name](
+        param_sets, TIMESTEPS, SAMPLES, initial_state, blocks, assign_params
+    )
+    sim_df.attrs["assign_params"] = sorted(assign_params)
+    return sim_df
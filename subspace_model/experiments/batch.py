@@ -0,0 +1,282 @@
+"""
+Running batches of parameter sets through the model.
+
+Parameter sets are described as overlays onto `DEFAULT_PARAMS`, run as a
+single cadCAD sweep (one subset per parameter set) and reduced to one
+row of metric values per parameter set.
+"""
+import hashlib
+import logging
+import marshal
+import os
+import types
+from dataclasses import is_dataclass, replace
+from datetime import datetime
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from subspace_model.experiments.backends import execute, param_sets_to_sweep
+from subspace_model.experiments.metrics import run_values
+from subspace_model.params import DEFAULT_PARAMS
+from subspace_model.state import INITIAL_STATE
+from subspace_model.store import SIMULATIONS_DIRECTORY
+from subspace_model.structure import SUBSPACE_MODEL_BLOCKS
+from subspace_model.types import SubspaceModelParams
+
+logger = logging.getLogger("subspace-digital-twin")
+
+ASSIGN_PARAMS = {
+    "label",
+    "environmental_label",
+    "timestep_in_days",
+    "block_time_in_seconds",
+    "max_credit_supply",
+}
+
+
+def _set_path(obj: object, path: list[str], value: object) -> object:
+    """Returns a copy of `obj` with the field at `path` replaced."""
+    head, *rest = path
+    if isinstance(obj, list):
+        new = list(obj)
+        new[int(head)] = _set_path(obj[int(head)], rest, value) if rest else value
+        return new
+    elif isinstance(obj, dict):
+        return {**obj, head: _set_path(obj[head], rest, value) if rest else value}
+    elif is_dataclass(obj):
+        field = _set_path(getattr(obj, head), rest, value) if rest else value
+        return replace(obj, **{head: field})  # type: ignore
+    else:
+        raise TypeError(f"Cannot set {'.'.join(path)} on {type(obj).__name__}")
+
+
+def overlay_params(
+    overlay: dict, base: SubspaceModelParams = DEFAULT_PARAMS
+) -> SubspaceModelParams:
+    """
+    Returns a copy of `base` with the values of `overlay` set on it.
+
+    Dotted keys address nested fields, eg.
+    `reference_subsidy_components.0.max_reference_subsidy` replaces the
+    `max_reference_subsidy` of the first `SubsidyComponent`.
+    """
+    params = dict(base)
+    for key, value in overlay.items():
+        name, *path = key.split(".")
+        params[name] = _set_path(params[name], path, value) if path else value
+    return params  # type: ignore
+
+
+def sweep_to_param_sets(sweep_params: dict[str, list]) -> list[dict]:
+    """
+    Converts cadCAD sweep params into the parameter set of every subset.
+    Shorter lists are padded with their last element, as cadCAD does.
+    """
+    n = max(len(v) for v in sweep_params.values())
+    return [
+        {k: v[i] if i < len(v) else v[-1] for k, v in sweep_params.items()}
+        for i in range(n)
+    ]
+
+
+def run_param_sets(
+    param_sets: list[dict],
+    SIMULATION_DAYS: int = 183,
+    TIMESTEP_IN_DAYS: int = 1,
+    SAMPLES: int = 1,
+    initial_state: dict = INITIAL_STATE,
+    blocks: list[dict] = SUBSPACE_MODEL_BLOCKS,
+    assign_params: set = ASSIGN_PARAMS,
+    common_random_numbers: bool = False,
+    backend: Optional[str] = None,
+    RUN_OFFSET: int = 0,
+) -> DataFrame:
+    """
+    Runs every parameter set as one subset of a single cadCAD sweep, on
+    `backend` (see `backends.execute`).
+
+    With `common_random_numbers`, the n-th run of every parameter set draws
+    the same random numbers from seeded generators (see the `random_seed`
+    param). Every run is then executed as its own subset with an explicit
+    `random_run`, as the run numbers cadCAD hands to the model depend on
+    the subset.
+
+    `RUN_OFFSET` sets the `run_offset` param, so that seeded runs draw the
+    random numbers of the runs numbered after the offset, eg. for runs added
+    to the `RUN_OFFSET` runs of an earlier execution.
+
+    Returns:
+        DataFrame: A dataframe of simulation data, where `subset` is the
+        position of the parameter set in `param_sets`.
+    """
+    TIMESTEPS = int(SIMULATION_DAYS / TIMESTEP_IN_DAYS) + 1
+    runs = SAMPLES
+    if RUN_OFFSET:
+        param_sets = [
+            {**param_set, "run_offset": RUN_OFFSET} for param_set in param_sets
+        ]
+    if common_random_numbers:
+        param_sets = [
+            {**param_set, "random_run": run}
+            for param_set in param_sets
+            for run in range(1, SAMPLES + 1)
+        ]
+        SAMPLES = 1
+    sim_df = execute(
+        param_sets, TIMESTEPS, SAMPLES, initial_state, blocks, assign_params, backend
+    )
+    if common_random_numbers:
+        sim_df["run"] = sim_df["subset"] % runs + 1
+        sim_df["subset"] = sim_df["subset"] // runs
+    return sim_df
+
+
+def cell_values(sim_df: DataFrame, metrics: dict[str, Callable]) -> DataFrame:
+    """
+    Computes every metric on every run and averages them over the runs of
+    each subset.
+    """
+    return pd.DataFrame(
+        {
+            name: run_values(sim_df, metric).groupby(level="subset").mean()
+            for name, metric in metrics.items()
+        }
+    )
+
+
+def evaluate_param_sets(
+    param_sets: list[dict], metrics: dict[str, Callable], **run_kwargs
+) -> DataFrame:
+    """
+    Runs the parameter sets and returns one row of metric values per set.
+    """
+    sim_df = run_param_sets(param_sets, **run_kwargs)
+    return cell_values(sim_df, metrics).reindex(range(len(param_sets)))
+
+
+def _describe(value: object) -> str:
+    """
+    Stable textual description of a parameter value. Functions are
+    described by value, from their code, defaults and closure, so that
+    lambdas built from different arguments, eg. by `POISSON_GENERATOR(mu)`,
+    are told apart.
+    """
+    if isinstance(value, types.FunctionType):
+        code = hashlib.sha256(marshal.dumps(value.__code__)).hexdigest()[:12]
+        closure = []
+        for cell in value.__closure__ or ():
+            try:
+                closure.append(_describe(cell.cell_contents))
+            except ValueError:
+                closure.append("<empty>")
+        return (
+            f"{value.__module__}.{value.__qualname__}[{code}]"
+            f"({_describe(value.__defaults__)};{';'.join(closure)})"
+        )
+    if isinstance(value, np.ndarray):
+        return f"array[{hashlib.sha256(value.tobytes()).hexdigest()[:12]}]"
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(_describe(v) for v in value) + "]"
+    if isinstance(value, dict):
+        items = sorted(value.items(), key=lambda item: str(item[0]))
+        return "{" + ",".join(f"{k}:{_describe(v)}" for k, v in items) + "}"
+    return repr(value)
+
+
+def metric_column(name: str, metric: Callable) -> str:
+    """The cache column of a metric, identified by its name and its value."""
+    digest = hashlib.sha256(_describe(metric).encode()).hexdigest()[:12]
+    return f"{name}@{digest}"
+
+
+class ResultCache:
+    """
+    Metric values of evaluated parameter sets, persisted as a gzip pickle so
+    that every point ever evaluated can be looked up again instead of re-run.
+    Entries are keyed by the full parameter set and the run arguments, and
+    metrics are identified by their name and their value (see
+    `metric_column`). The cache lives with the simulation results by default.
+    """
+
+    def __init__(
+        self, path: str = os.path.join(SIMULATIONS_DIRECTORY, "evaluations.pkl.gz")
+    ):
+        self.path = path
+        if os.path.exists(path):
+            self.df = pd.read_pickle(path)
+        else:
+            self.df = pd.DataFrame(columns=["key", "evaluated_at"])
+
+    @staticmethod
+    def key(param_set: dict, **run_kwargs) -> str:
+        items = sorted({**param_set, **run_kwargs}.items())
+        text = ";".join(f"{k}={_describe(v)}" for k, v in items)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get(self, key: str, metrics: list[str]) -> Optional[dict]:
+        rows = self.df[self.df["key"] == key]
+        if len(rows) == 0 or not set(metrics) <= set(rows.columns):
+            return None
+        row = rows.iloc[-1]
+        if row[metrics].isna().any():
+            return None
+        return row[metrics].to_dict()
+
+    def put(self, key: str, overlay: dict, values: dict) -> None:
+        row = {"key": key, "evaluated_at": datetime.now(), **overlay, **values}
+        self.df = pd.concat([self.df, pd.DataFrame([row])], ignore_index=True)
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.df.to_pickle(self.path, compression="gzip")
+
+
+def evaluate_overlays(
+    overlays: list[dict],
+    metrics: dict[str, Callable],
+    base: SubspaceModelParams = DEFAULT_PARAMS,
+    cache: Optional[ResultCache] = None,
+    **run_kwargs,
+) -> DataFrame:
+    """
+    Evaluates overlays onto `base`, running only the ones that are not
+    already in `cache`. Every new evaluation is logged to the cache with
+    its seed, but only parameter sets with a `random_seed` are looked up,
+    as the results of the others are random draws. Without a cache, the
+    default `ResultCache` is used.
+
+    Returns:
+        DataFrame: One row of metric values per overlay.
+    """
+    if cache is None:
+        cache = ResultCache()
+    param_sets = [overlay_params(overlay, base) for overlay in overlays]
+    # The backend does not change the results
+    cache_kwargs = {k: v for k, v in run_kwargs.items() if k != "backend"}
+    keys = [ResultCache.key(p, **cache_kwargs) for p in param_sets]
+    columns = {name: metric_column(name, metric) for name, metric in metrics.items()}
+
+    rows: list[Optional[dict]] = [None] * len(overlays)
+    for i, key in enumerate(keys):
+        if param_sets[i].get("random_seed") is not None:
+            row = cache.get(key, list(columns.values()))
+            if row is not None:
+                rows[i] = {name: row[column] for name, column in columns.items()}
+
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if len(missing) > 0:
+        values = evaluate_param_sets(
+            [param_sets[i] for i in missing], metrics, **run_kwargs
+        )
+        for i, (_, row) in zip(missing, values.iterrows()):
+            rows[i] = row.to_dict()
+            stored = {columns[name]: value for name, value in rows[i].items()}
+            seed = {"random_seed": param_sets[i].get("random_seed")}
+            cache.put(keys[i], {**overlays[i], **seed}, stored)
+        cache.save()
+    return pd.DataFrame(rows, columns=list(metrics))
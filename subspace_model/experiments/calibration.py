@@ -0,0 +1,261 @@
+"""
+Calibration of environmental scenarios against observed chain series.
+
+Observed daily series (eg. transaction counts, transaction sizes and new
+sectors per day) are reduced to summary statistics. Approximate Bayesian
+computation with sequential Monte Carlo (ABC-SMC) then looks for the
+scenario parameters whose simulated series have statistics close to the
+observed ones. Every population of candidates is run as one batch, and
+the posterior can be written out and fed back into a scenario.
+"""
+import logging
+import os
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from scipy.stats import multivariate_normal  # type: ignore
+
+from subspace_model.const import SECTOR_SIZE
+from subspace_model.experiments.batch import overlay_params, run_param_sets
+from subspace_model.experiments.sensitivity import Ranges
+from subspace_model.params import DEFAULT_PARAMS, stochastic_scenario
+from subspace_model.types import SubspaceModelParams
+
+logger = logging.getLogger("subspace-digital-twin")
+
+# Observed column -> how to read the same series from a simulated run
+OBSERVED_SERIES: dict[str, Callable[[DataFrame], pd.Series]] = {
+    "transaction_count": lambda df: df["transaction_count"],
+    "average_transaction_size": lambda df: df["average_transaction_size"],
+    "new_sectors": lambda df: df["total_space_pledged"].diff().dropna() / SECTOR_SIZE,
+}
+
+# Prior ranges for the arguments of `stochastic_scenario`
+DEFAULT_PRIORS: Ranges = {
+    "transaction_count_per_day_mu": (1_000, 50_000),
+    "transaction_size_mu": (100, 1_000),
+    "transaction_size_sigma": (10, 500),
+    "new_sectors_per_day_mu": (100, 5_000),
+    "new_sectors_per_day_sigma": (10, 2_500),
+}
+
+
+def load_observations(path: str) -> DataFrame:
+    """
+    Loads observed daily series from a CSV with one row per day and one
+    column per observed series, eg. `transaction_count`.
+    """
+    df = pd.read_csv(path)
+    if "day" in df.columns:
+        df = df.sort_values("day").set_index("day")
+    return df
+
+
+def summary_statistics(series: dict[str, pd.Series]) -> pd.Series:
+    """Mean and standard deviation of every series."""
+    stats = {}
+    for name, values in series.items():
+        values = pd.Series(values, dtype=float).dropna()
+        stats[(name, "mean")] = values.mean()
+        stats[(name, "std")] = values.std(ddof=1) if len(values) > 1 else 0.0
+    return pd.Series(stats)
+
+
+def distance(simulated: pd.Series, observed: pd.Series) -> float:
+    """
+    Euclidean distance between summary statistics, each one relative to
+    the magnitude of the observed statistic.
+    """
+    scale = observed.abs().where(observed.abs() > 0, 1.0)
+    return float(np.sqrt((((simulated[observed.index] - observed) / scale) ** 2).sum()))
+
+
+def simulated_distances(
+    sim_df: DataFrame,
+    observed: pd.Series,
+    series: dict[str, Callable[[DataFrame], pd.Series]],
+) -> pd.Series:
+    """
+    Distance of every subset to the observed statistics, averaging the
+    statistics over the runs of the subset.
+    """
+    names = observed.index.get_level_values(0).unique()
+    stats = {
+        key: summary_statistics({n: series[n](df) for n in names})
+        for key, df in sim_df.groupby(["subset", "run"])
+    }
+    by_subset = pd.DataFrame(stats).T.groupby(level=0).mean()
+    return pd.Series(
+        {subset: distance(row, observed) for subset, row in by_subset.iterrows()}
+    )
+
+
+def _kernel_weights(
+    theta: np.ndarray, previous: np.ndarray, weights: np.ndarray, cov: np.ndarray
+) -> np.ndarray:
+    """Importance weights of particles under a uniform prior."""
+    density = np.array(
+        [
+            np.sum(weights * multivariate_normal.pdf(previous, mean=t, cov=cov))
+            for t in theta
+        ]
+    )
+    w = 1 / density
+    return w / w.sum()
+
+
+def abc_smc(
+    observations: DataFrame,
+    priors: Ranges = DEFAULT_PRIORS,
+    scenario: Callable[..., dict] = stochastic_scenario,
+    series: dict[str, Callable[[DataFrame], pd.Series]] = OBSERVED_SERIES,
+    particles: int = 100,
+    generations: int = 5,
+    quantile: float = 0.5,
+    max_batches: int = 20,
+    base: SubspaceModelParams = DEFAULT_PARAMS,
+    seed: Optional[int] = None,
+    SIMULATION_DAYS: Optional[int] = None,
+    **run_kwargs,
+) -> tuple[DataFrame, DataFrame]:
+    """
+    Calibrates the arguments of `scenario` against observed series.
+
+    The first population is drawn from the uniform `priors`. Every following
+    population perturbs particles of the previous one and only accepts the
+    ones closer to the observations than a tolerance, set as a `quantile`
+    of the previous distances.
+
+    Args:
+        observations (DataFrame): Observed daily series, see `load_observations`
+        priors (Ranges): Uniform prior range of every scenario argument
+        scenario (Callable): Builds the params overlay from the arguments
+        series (dict): How to read every observed column from a simulated run
+        particles (int): Posterior sample size, also the simulation batch size
+        generations (int): Number of SMC populations after the prior one
+        quantile (float): Quantile of previous distances used as tolerance
+        max_batches (int): Maximum number of batches run per population
+        SIMULATION_DAYS (int): Defaults to the length of the observations
+        **run_kwargs: Forwarded to `run_param_sets`
+
+    Returns:
+        tuple[DataFrame, DataFrame]: The weighted posterior particles with
+        their distance, and one row per population with its tolerance and
+        acceptance rate.
+    """
+    names = list(priors)
+    lower = np.array([priors[n][0] for n in names])
+    upper = np.array([priors[n][1] for n in names])
+    observed = summary_statistics(
+        {c: observations[c] for c in observations.columns if c in series}
+    )
+    if len(observed) == 0:
+        raise ValueError(f"No observed series found. Try one of: {list(series)}")
+    if SIMULATION_DAYS is None:
+        SIMULATION_DAYS = len(observations) - 1
+    rng = np.random.default_rng(seed)
+
+    def simulate(theta: np.ndarray) -> np.ndarray:
+        param_sets = [
+            overlay_params(
+                {**scenario(**dict(zip(names, t))), "label": "calibration"}, base
+            )
+            for t in theta
+        ]
+        sim_df = run_param_sets(
+            param_sets, SIMULATION_DAYS=SIMULATION_DAYS, **run_kwargs
+        )
+        distances = simulated_distances(sim_df, observed, series)
+        return distances.reindex(range(len(theta))).to_numpy(dtype=float)
+
+    theta = lower + rng.random((particles, len(names))) * (upper - lower)
+    distances = simulate(theta)
+    weights = np.full(particles, 1 / particles)
+    history = [
+        {
+            "generation": 0,
+            "epsilon": np.inf,
+            "simulated": particles,
+            "acceptance_rate": 1.0,
+        }
+    ]
+
+    for generation in range(1, generations + 1):
+        epsilon = np.nanquantile(distances, quantile)
+        cov = 2 * np.atleast_2d(np.cov(theta.T, aweights=weights))
+        cov += 1e-12 * np.eye(len(names))
+
+        accepted_theta, accepted_distances = [], []
+        simulated = 0
+        for _ in range(max_batches):
+            parents = theta[rng.choice(particles, size=particles, p=weights)]
+            proposals = np.array([rng.multivariate_normal(p, cov) for p in parents])
+            inside = np.all((proposals >= lower) & (proposals <= upper), axis=1)
+            proposals = proposals[inside]
+            if len(proposals) == 0:
+                continue
+            proposal_distances = simulate(proposals)
+            simulated += len(proposals)
+            keep = proposal_distances <= epsilon
+            accepted_theta.extend(proposals[keep])
+            accepted_distances.extend(proposal_distances[keep])
+            if len(accepted_theta) >= particles:
+                break
+
+        if len(accepted_theta) < particles:
+            logger.warning(
+                f"ABC-SMC generation {generation}: only {len(accepted_theta)} "
+                f"particles accepted, stopping"
+            )
+            break
+
+        new_theta = np.array(accepted_theta[:particles])
+        weights = _kernel_weights(new_theta, theta, weights, cov)
+        theta, distances = new_theta, np.array(accepted_distances[:particles])
+        history.append(
+            {
+                "generation": generation,
+                "epsilon": epsilon,
+                "simulated": simulated,
+                "acceptance_rate": len(accepted_theta) / simulated,
+            }
+        )
+        logger.info(
+            f"ABC-SMC generation {generation}: epsilon {epsilon:.4g}, "
+            f"{simulated} simulated"
+        )
+
+    posterior = pd.DataFrame(theta, columns=names)
+    posterior["weight"] = weights
+    posterior["distance"] = distances
+    return posterior, pd.DataFrame(history)
+
+
+def write_posterior(
+    posterior: DataFrame, path: str = "data/calibration/posterior.csv"
+) -> str:
+    """Writes the posterior particles as a CSV."""
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    posterior.to_csv(path, index=False)
+    return path
+
+
+def posterior_scenario(
+    posterior, scenario: Callable[..., dict] = stochastic_scenario
+) -> dict:
+    """
+    Builds a scenario from the weighted posterior mean of every argument.
+
+    Args:
+        posterior: The posterior particles, or the path of a written posterior
+    """
+    if isinstance(posterior, str):
+        posterior = pd.read_csv(posterior)
+    names = [c for c in posterior.columns if c not in ("weight", "distance")]
+    weights = posterior["weight"] / posterior["weight"].sum()
+    arguments = {n: float((posterior[n] * weights).sum()) for n in names}
+    return {**scenario(**arguments), "environmental_label": "calibrated"}
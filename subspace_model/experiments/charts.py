@@ -9,6 +9,25 @@ import seaborn as sns
 from subspace_model.experiments.metrics import window_volatility
 from subspace_model.util import get_hex_colors_from_matplotlib_cmap
 
+# Result columns read by the charts, so that only those are loaded
+CHART_COLUMNS = {
+    "ab_circulating_supply": ["days_passed", "circulating_supply"],
+    "ab_operator_pool_shares": ["days_passed", "operator_pool_shares"],
+    "ab_nominator_pool_shares": ["days_passed", "nominator_pool_shares"],
+    "ab_block_utilization": [
+        "days_passed",
+        "block_utilization",
+        "environmental_label",
+        "label",
+    ],
+    "ab_circulating_supply_volatility": [
+        "days_passed",
+        "circulating_supply",
+        "label",
+        "run",
+    ],
+}
+
 
 def ab_circulating_supply(
     sim_df: pd.DataFrame, experiment: str
@@ -0,0 +1,108 @@
+"""
+Reconstruction of runs from sparse results.
+
+Sparse results (see `store.sparse_results`) keep the full state of every
+run every K timesteps only. The random draws of seeded runs are keyed by
+the seed, the run and the timestep (see `logic.random_state`), so the
+state at a checkpoint is all it takes to re-simulate a run from there:
+it becomes the initial state of a new run, whose `random_run` is the run
+and whose `timestep_offset` is the timestep of the checkpoint.
+"""
+import logging
+from typing import Optional
+
+import pandas as pd
+from pandas import DataFrame
+
+from subspace_model.experiments.backends import execute
+from subspace_model.experiments.batch import ASSIGN_PARAMS
+from subspace_model.state import INITIAL_STATE
+from subspace_model.store import read_checkpoints
+from subspace_model.structure import SUBSPACE_MODEL_BLOCKS
+
+logger = logging.getLogger("subspace-digital-twin")
+
+
+def restore_state(checkpoint: pd.Series, initial_state: dict) -> dict:
+    """
+    The state of a checkpoint row. Variables missing from it keep their
+    initial value, and the ones initially None are None again when null.
+    """
+    state = dict(initial_state)
+    for variable, initial in initial_state.items():
+        if variable in checkpoint.index:
+            value = checkpoint[variable]
+            state[variable] = None if initial is None and pd.isna(value) else value
+    return state
+
+
+def reconstruct(
+    path: str,
+    param_set: dict,
+    run: int,
+    timestep_range: tuple[int, int],
+    subset: int = 0,
+    initial_state: dict = INITIAL_STATE,
+    blocks: list[dict] = SUBSPACE_MODEL_BLOCKS,
+    assign_params: set = ASSIGN_PARAMS,
+    backend: Optional[str] = None,
+) -> DataFrame:
+    """
+    Re-simulates a segment of a run of sparse results, from the nearest
+    checkpoint before it. The stored results do not hold the param
+    functions, so the param set of the subset is given, eg. from the spec
+    of the experiment: `compile_spec(name).sweep[subset]`.
+
+    Args:
+        path (str): The path of the sparse results
+        param_set (dict): The full param set of the subset
+        run (int): The run to reconstruct
+        timestep_range (tuple[int, int]): The first and last timesteps
+        subset (int): The subset of the run
+
+    Returns:
+        DataFrame: The full simulation data of the run over the range
+    """
+    start, end = timestep_range
+    checkpoints = read_checkpoints(
+        path,
+        filters=[
+            ("subset", "==", subset),
+            ("run", "==", run),
+            ("timestep", "<=", start),
+        ],
+    )
+    if len(checkpoints) == 0:
+        raise ValueError(
+            f"No checkpoint of run {run} of subset {subset} up to timestep {start}"
+        )
+    checkpoint = checkpoints.loc[checkpoints["timestep"].idxmax()]
+    offset = int(checkpoint["timestep"])
+    if param_set.get("random_seed") is None:
+        logger.warning(
+            "Reconstructing an unseeded run, its random draws will differ"
+        )
+
+    params = {
+        **param_set,
+        "random_run": param_set.get("random_run", run),
+        "timestep_offset": param_set.get("timestep_offset", 0) + offset,
+    }
+    logger.info(
+        f"Reconstructing timesteps {start} to {end} of run {run} of subset "
+        f"{subset} from timestep {offset}"
+    )
+    sim_df = execute(
+        [params],
+        end - offset,
+        1,
+        restore_state(checkpoint, initial_state),
+        blocks,
+        assign_params,
+        backend,
+    )
+    sim_df["timestep"] += offset
+    sim_df["subset"] = subset
+    sim_df["run"] = run
+    in_range = (sim_df["timestep"] >= start) & (sim_df["timestep"] <= end)
+    return sim_df[in_range].reset_index(drop=True)
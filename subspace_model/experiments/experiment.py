@@ -1,28 +1,27 @@
-from copy import deepcopy
+from typing import Optional
 
 import numpy as np
 import pandas as pd
-from cadCAD.tools import easy_run  # type: ignore
-from cadCAD.tools.preparation import sweep_cartesian_product
 from pandas import DataFrame
 
 from subspace_model.const import *
+from subspace_model.experiments.batch import ASSIGN_PARAMS, run_param_sets
+from subspace_model.experiments.gradients import (
+    GRADIENT_ASSIGN_PARAMS,
+    numeric_parameters,
+    perturbed_param_sets,
+)
+from subspace_model.experiments.mean_field import mean_field_run
+from subspace_model.experiments.multifidelity import Fidelity, multifidelity_sweep
+from subspace_model.experiments.pruning import DEFAULT_CONSTRAINTS, pruned_run
+from subspace_model.experiments.spec import run_spec
+from subspace_model.experiments.sweep import Grid, Sweep, Values, run_sweep
 from subspace_model.experiments.logic import (
     DEFAULT_ISSUANCE_FUNCTION,
-    MOCK_ISSUANCE_FUNCTION,
-    MOCK_ISSUANCE_FUNCTION_2,
     NORMAL_GENERATOR,
     POISSON_GENERATOR,
     POSITIVE_INTEGER,
-    REFERENCE_SUBSIDY_CONSTANT_SINGLE_COMPONENT,
-    REFERENCE_SUBSIDY_HYBRID_SINGLE_COMPONENT,
-    REFERENCE_SUBSIDY_HYBRID_TWO_COMPONENTS,
-    SUPPLY_EARNED,
-    SUPPLY_EARNED_MINUS_BURNED,
-    SUPPLY_ISSUED,
     SUPPLY_TOTAL,
-    TRANSACTION_COUNT_PER_DAY_FUNCTION_CONSTANT_UTILIZATION_50,
-    TRANSACTION_COUNT_PER_DAY_FUNCTION_GROWING_UTILIZATION_TWO_YEARS,
     SubsidyComponent,
 )
 from subspace_model.params import DEFAULT_PARAMS, ENVIRONMENTAL_SCENARIOS
@@ -32,299 +31,150 @@ from subspace_model.types import SubspaceModelParams
 
 
 def sanity_check_run(
-    SIMULATION_DAYS: int = 183, TIMESTEP_IN_DAYS: int = 1, SAMPLES: int = 1
+    SIMULATION_DAYS: Optional[int] = None,
+    TIMESTEP_IN_DAYS: Optional[int] = None,
+    SAMPLES: Optional[int] = None,
 ) -> DataFrame:
     """
-    This experiment tests the model with default parameters and with deterministic parameters.
+    This experiment tests the model with default parameters.
+
+    Defined in `specs/sanity_check_run.toml`, the arguments that are set override
+    its run settings.
 
     Returns:
         DataFrame: A dataframe of simulation data
     """
-    TIMESTEPS = int(SIMULATION_DAYS / TIMESTEP_IN_DAYS) + 1
-
-    # Get the sweep params in the form of single length arrays
-    sweep_params = {k: [v] for k, v in DEFAULT_PARAMS.items()}
-
-    # Load simulation arguments
-    sim_args = (INITIAL_STATE, sweep_params, SUBSPACE_MODEL_BLOCKS, TIMESTEPS, SAMPLES)
-
-    # Run simulation
-    sim_df = easy_run(
-        *sim_args,
-        assign_params={
-            "label",
-            "environmental_label",
-            "timestep_in_days",
-            "block_time_in_seconds",
-            "max_credit_supply",
-        },
-        exec_mode="single",
-        deepcopy_off=True,
-    )
-    return sim_df
+    return run_spec("sanity_check_run", SIMULATION_DAYS, TIMESTEP_IN_DAYS, SAMPLES)
 
 
 def standard_stochastic_run(
-    SIMULATION_DAYS: int = 183, TIMESTEP_IN_DAYS: int = 1, SAMPLES: int = 5
+    SIMULATION_DAYS: Optional[int] = None,
+    TIMESTEP_IN_DAYS: Optional[int] = None,
+    SAMPLES: Optional[int] = None,
 ) -> DataFrame:
-    """Function which runs the cadCAD simulations
+    """
+    Runs the default parameters under the stochastic environmental scenario.
+
+    Defined in `specs/standard_stochastic_run.toml`, the arguments that are set override
+    its run settings.
 
     Returns:
         DataFrame: A dataframe of simulation data
     """
-    TIMESTEPS = int(SIMULATION_DAYS / TIMESTEP_IN_DAYS) + 1
-
-    # Get the sweep parameters in the form of single length arrays
-    param_set = deepcopy(DEFAULT_PARAMS)
-
-    sweep_params = {
-        **{k: [v] for k, v in param_set.items()},
-        **{k: [v] for k, v in ENVIRONMENTAL_SCENARIOS["stochastic"].items()},
-    }
-
-    # Load simulation arguments
-    sim_args = (INITIAL_STATE, sweep_params, SUBSPACE_MODEL_BLOCKS, TIMESTEPS, SAMPLES)
-
-    # Run simulation
-    sim_df = easy_run(
-        *sim_args,
-        assign_params={
-            "label",
-            "environmental_label",
-            "timestep_in_days",
-            "block_time_in_seconds",
-            "max_credit_supply",
-        },
-        exec_mode="single",
-        deepcopy_off=True,
+    return run_spec(
+        "standard_stochastic_run", SIMULATION_DAYS, TIMESTEP_IN_DAYS, SAMPLES
     )
-    return sim_df
 
 
 def issuance_sweep(
-    SIMULATION_DAYS: int = 183, TIMESTEP_IN_DAYS: int = 1, SAMPLES: int = 1
+    SIMULATION_DAYS: Optional[int] = None,
+    TIMESTEP_IN_DAYS: Optional[int] = None,
+    SAMPLES: Optional[int] = None,
 ) -> DataFrame:
-    """Sweeps issuance functions.
+    """
+    Sweeps issuance functions.
+
+    Defined in `specs/issuance_sweep.toml`, the arguments that are set override
+    its run settings.
 
     Returns:
         DataFrame: A dataframe of simulation data
     """
-
-    TIMESTEPS = int(SIMULATION_DAYS / TIMESTEP_IN_DAYS) + 1
-
-    # Get the sweep params in the form of single length arrays
-    param_set_1 = DEFAULT_PARAMS
-    param_set_1["label"] = "default-issuance-function"
-    param_set_2 = deepcopy(DEFAULT_PARAMS)
-    param_set_2["label"] = "mock-issuance-function"
-    param_set_2["issuance_function"] = MOCK_ISSUANCE_FUNCTION
-    param_set_3 = deepcopy(DEFAULT_PARAMS)
-    param_set_3["label"] = "mock-issuance-function-2"
-    param_set_3["issuance_function"] = MOCK_ISSUANCE_FUNCTION_2
-    param_sets = [param_set_1, param_set_2, param_set_3]
-
-    sweep_params: dict[str, list] = {k: [] for k in DEFAULT_PARAMS.keys()}
-    for param_set in param_sets:
-        for k, v in param_set.items():
-            sweep_params[k].append(v)
-
-    # Load simulation arguments
-    sim_args = (INITIAL_STATE, sweep_params, SUBSPACE_MODEL_BLOCKS, TIMESTEPS, SAMPLES)
-
-    # Run simulation
-    sim_df = easy_run(
-        *sim_args,
-        assign_params={
-            "label",
-            "environmental_label",
-            "timestep_in_days",
-            "block_time_in_seconds",
-            "max_credit_supply",
-        },
-        exec_mode="single",
-        deepcopy_off=True,
-    )
-    return sim_df
+    return run_spec("issuance_sweep", SIMULATION_DAYS, TIMESTEP_IN_DAYS, SAMPLES)
 
 
 def fund_inclusion(
-    SIMULATION_DAYS: int = 183, TIMESTEP_IN_DAYS: int = 1, SAMPLES: int = 1
+    SIMULATION_DAYS: Optional[int] = None,
+    TIMESTEP_IN_DAYS: Optional[int] = None,
+    SAMPLES: Optional[int] = None,
 ) -> DataFrame:
-    """Function which runs the cadCAD simulations
+    """
+    Compares the default parameters with a model without the fund.
+
+    Defined in `specs/fund_inclusion.toml`, the arguments that are set override
+    its run settings.
 
     Returns:
         DataFrame: A dataframe of simulation data
     """
-    TIMESTEPS = int(SIMULATION_DAYS / TIMESTEP_IN_DAYS) + 1
-
-    # Get the sweep parameters in the form of single length arrays
-    param_set_1 = DEFAULT_PARAMS
-    param_set_2 = deepcopy(DEFAULT_PARAMS)
-    param_set_2["label"] = "no-fund"
-    param_set_2["fund_tax_on_proposer_reward"] = 0
-    param_set_2["fund_tax_on_storage_fees"] = 0
-    param_set_2["slash_to_fund"] = 0
-    param_sets = [param_set_1, param_set_2]
-
-    # Create the sweep parameters dictionary
-    sweep_params: dict[str, list] = {k: [] for k in DEFAULT_PARAMS.keys()}
-    for param_set in param_sets:
-        for k, v in param_set.items():
-            sweep_params[k].append(v)
-
-    # Load simulation arguments
-    sim_args = (INITIAL_STATE, sweep_params, SUBSPACE_MODEL_BLOCKS, TIMESTEPS, SAMPLES)
-
-    # Run simulation
-    sim_df = easy_run(
-        *sim_args,
-        assign_params={
-            "label",
-            "environmental_label",
-            "timestep_in_days",
-            "block_time_in_seconds",
-            "max_credit_supply",
-        },
-        exec_mode="single",
-        deepcopy_off=True,
-    )
-
-    # Return the simulation results dataframe
-    return sim_df
+    return run_spec("fund_inclusion", SIMULATION_DAYS, TIMESTEP_IN_DAYS, SAMPLES)
 
 
 def reward_split_sweep(
-    SIMULATION_DAYS: int = 183,
-    TIMESTEP_IN_DAYS: int = 1,
-    SAMPLES: int = 1,
+    SIMULATION_DAYS: Optional[int] = None,
+    TIMESTEP_IN_DAYS: Optional[int] = None,
+    SAMPLES: Optional[int] = None,
 ) -> DataFrame:
-    """Function which runs the cadCAD simulations
+    """
+    Compares the default reward split with an even one.
+
+    Defined in `specs/reward_split_sweep.toml`, the arguments that are set override
+    its run settings.
 
     Returns:
         DataFrame: A dataframe of simulation data
     """
-    TIMESTEPS = int(SIMULATION_DAYS / TIMESTEP_IN_DAYS) + 1
-
-    # Get the sweep params in the form of single length arrays
-    param_set_1 = DEFAULT_PARAMS
-    param_set_2 = deepcopy(DEFAULT_PARAMS)
-    param_set_2["label"] = "alternate-split"
-    param_set_2["reward_proposer_share"] = 0.5
-
-    param_sets = [param_set_1, param_set_2]
-
-    sweep_params: dict[str, list] = {k: [] for k in DEFAULT_PARAMS.keys()}
-    for param_set in param_sets:
-        for k, v in param_set.items():
-            sweep_params[k].append(v)
-
-    # Load simulation arguments
-    sim_args = (INITIAL_STATE, sweep_params, SUBSPACE_MODEL_BLOCKS, TIMESTEPS, SAMPLES)
-
-    # Run simulation
-    sim_df = easy_run(
-        *sim_args,
-        assign_params={
-            "label",
-            "environmental_label",
-            "timestep_in_days",
-            "block_time_in_seconds",
-            "max_credit_supply",
-        },
-        exec_mode="single",
-        deepcopy_off=True,
-    )
-    return sim_df
+    return run_spec("reward_split_sweep", SIMULATION_DAYS, TIMESTEP_IN_DAYS, SAMPLES)
 
 
 def sweep_credit_supply(
-    SIMULATION_DAYS: int = 183,
-    TIMESTEP_IN_DAYS: int = 1,
-    SAMPLES: int = 1,
+    SIMULATION_DAYS: Optional[int] = None,
+    TIMESTEP_IN_DAYS: Optional[int] = None,
+    SAMPLES: Optional[int] = None,
 ) -> DataFrame:
-    """ """
-    TIMESTEPS = int(SIMULATION_DAYS / TIMESTEP_IN_DAYS) + 1
-
-    # Get the sweep params in the form of single length arrays
-    param_set_1 = deepcopy(DEFAULT_PARAMS)
-    param_set_1["label"] = "supply-issued"
-    param_set_1["credit_supply_definition"] = SUPPLY_ISSUED
-    param_set_1["environmental_label"] = "constant-utilization"
-    param_set_1["transaction_count_per_day_function"] = (
-        TRANSACTION_COUNT_PER_DAY_FUNCTION_CONSTANT_UTILIZATION_50
-    )
+    """
+    Sweeps credit supply definitions under constant and growing utilization.
 
-    param_set_2 = deepcopy(DEFAULT_PARAMS)
-    param_set_2["label"] = "supply-earned"
-    param_set_2["credit_supply_definition"] = SUPPLY_EARNED
-    param_set_2["environmental_label"] = "constant-utilization"
-    param_set_2["transaction_count_per_day_function"] = (
-        TRANSACTION_COUNT_PER_DAY_FUNCTION_CONSTANT_UTILIZATION_50
-    )
+    Defined in `specs/sweep_credit_supply.toml`, the arguments that are set override
+    its run settings.
 
-    param_set_3 = deepcopy(DEFAULT_PARAMS)
-    param_set_3["label"] = "supply-earned-minus-burned"
-    param_set_3["credit_supply_definition"] = SUPPLY_EARNED_MINUS_BURNED
-    param_set_3["environmental_label"] = "constant-utilization"
-    param_set_3["transaction_count_per_day_function"] = (
-        TRANSACTION_COUNT_PER_DAY_FUNCTION_CONSTANT_UTILIZATION_50
-    )
+    Returns:
+        DataFrame: A dataframe of simulation data
+    """
+    return run_spec("sweep_credit_supply", SIMULATION_DAYS, TIMESTEP_IN_DAYS, SAMPLES)
 
-    param_set_4 = deepcopy(DEFAULT_PARAMS)
-    param_set_4["label"] = "supply-issued"
-    param_set_4["credit_supply_definition"] = SUPPLY_ISSUED
-    param_set_4["environmental_label"] = "growing-utilization"
-    param_set_4["transaction_count_per_day_function"] = (
-        TRANSACTION_COUNT_PER_DAY_FUNCTION_GROWING_UTILIZATION_TWO_YEARS
-    )
 
-    param_set_5 = deepcopy(DEFAULT_PARAMS)
-    param_set_5["label"] = "supply-earned"
-    param_set_5["credit_supply_definition"] = SUPPLY_EARNED
-    param_set_5["environmental_label"] = "growing-utilization"
-    param_set_5["transaction_count_per_day_function"] = (
-        TRANSACTION_COUNT_PER_DAY_FUNCTION_GROWING_UTILIZATION_TWO_YEARS
-    )
+def single_component_and_credit_supply_sweep(N_PARAM_SWEEP: int = 1) -> Sweep:
+    """
+    Sweeps the issuance function constant and single-component reference
+    subsidies, whose reference subsidy is null, halved or full, for every
+    environmental scenario.
 
-    param_set_6 = deepcopy(DEFAULT_PARAMS)
-    param_set_6["label"] = "supply-earned-minus-burned"
-    param_set_6["credit_supply_definition"] = SUPPLY_EARNED_MINUS_BURNED
-    param_set_6["environmental_label"] = "growing-utilization"
-    param_set_6["transaction_count_per_day_function"] = (
-        TRANSACTION_COUNT_PER_DAY_FUNCTION_GROWING_UTILIZATION_TWO_YEARS
+    Returns:
+        Sweep: The param sets of the sweep
+    """
+    grid = Grid(
+        {
+            "issuance_function_constant": np.linspace(
+                start=0.1, stop=10, num=N_PARAM_SWEEP
+            ),
+            "credit_supply_definition": [SUPPLY_TOTAL],
+            "reference_subsidy_x_1": np.linspace(
+                start=1 * BLOCKS_PER_MONTH, stop=2 * BLOCKS_PER_MONTH, num=N_PARAM_SWEEP
+            ),
+            "reference_subsidy_x_2": np.linspace(
+                start=0.1 * MAX_CREDIT_ISSUANCE,
+                stop=0.2 * MAX_CREDIT_ISSUANCE,
+                num=N_PARAM_SWEEP,
+            ),
+        }
     )
+    x_3_factors = Grid({"reference_subsidy_x_3_factor": [0, 0.5, 1]})
 
-    param_sets = [
-        param_set_1,
-        param_set_2,
-        param_set_3,
-        param_set_4,
-        param_set_5,
-        param_set_6,
-    ]
-
-    sweep_params: dict[str, list] = {k: [] for k in DEFAULT_PARAMS.keys()}
-    for param_set in param_sets:
-        for k, v in param_set.items():
-            sweep_params[k].append(v)
+    def reference_subsidy_components(cell: dict) -> dict:
+        x_1 = cell.pop("reference_subsidy_x_1")
+        x_2 = cell.pop("reference_subsidy_x_2")
+        x_3 = cell.pop("reference_subsidy_x_3_factor") * x_2 / x_1
+        components = [SubsidyComponent(0, x_1, x_2, x_3)]
+        return {**cell, "reference_subsidy_components": components}
 
-    # Load simulation arguments
-    sim_args = (INITIAL_STATE, sweep_params, SUBSPACE_MODEL_BLOCKS, TIMESTEPS, SAMPLES)
+    # Environmental scenarios
+    environmental_scenarios = Values(ENVIRONMENTAL_SCENARIOS.values())
 
-    # Run simulation
-    sim_df = easy_run(
-        *sim_args,
-        assign_params={
-            "label",
-            "environmental_label",
-            "timestep_in_days",
-            "block_time_in_seconds",
-            "max_credit_supply",
-        },
-        exec_mode="single",
-        deepcopy_off=True,
+    sweep = (environmental_scenarios * x_3_factors * grid).map(
+        reference_subsidy_components
     )
-    return sim_df
+    return sweep.params(DEFAULT_PARAMS)
 
 
 def sweep_over_single_component_and_credit_supply(
@@ -334,112 +184,15 @@ def sweep_over_single_component_and_credit_supply(
     N_PARAM_SWEEP: int = 1,
 ) -> DataFrame:
     """ """
-    TIMESTEPS = int(SIMULATION_DAYS / TIMESTEP_IN_DAYS) + 1
-
-    c_params = np.linspace(start=0.1, stop=10, num=N_PARAM_SWEEP)
-    credit_supply_definition_params = [SUPPLY_TOTAL]
-    reference_subsidy_x_1_params = np.linspace(
-        start=1 * BLOCKS_PER_MONTH, stop=2 * BLOCKS_PER_MONTH, num=N_PARAM_SWEEP
-    )
-    reference_subsidy_x_2_params = np.linspace(
-        start=0.1 * MAX_CREDIT_ISSUANCE,
-        stop=0.2 * MAX_CREDIT_ISSUANCE,
-        num=N_PARAM_SWEEP,
-    )
-
-    sweep_params = {
-        "issuance_function_constant": c_params,
-        "credit_supply_definition": credit_supply_definition_params,
-        "reference_subsidy_x_1": reference_subsidy_x_1_params,
-        "reference_subsidy_x_2": reference_subsidy_x_2_params,
-    }
-
-    sweep_params = sweep_cartesian_product(sweep_params)
-    cardinality = max([len(v) for v in sweep_params.values()])
-
-    # Prepare for x_3 expansion
-    sweep_params = {k: v * 3 for k, v in sweep_params.items()}
-
-    # Generate x_3
-    sweep_params["reference_subsidy_x_3"] = [
-        x2 / x1
-        for x1, x2 in zip(
-            sweep_params["reference_subsidy_x_1"], sweep_params["reference_subsidy_x_2"]
-        )
-    ]
-
-    sweep_params["reference_subsidy_x_3"] = (
-        cardinality * [0]
-        + [
-            x_3 / 2
-            for x_3 in sweep_params["reference_subsidy_x_3"][
-                cardinality : 2 * cardinality
-            ]
-        ]
-        + sweep_params["reference_subsidy_x_3"][2 * cardinality : 3 * cardinality]
-    )
-
-    # Generate reference_subsidy_components
-    sweep_params["reference_subsidy_components"] = [
-        [
-            SubsidyComponent(0, x1, x2, x3),
-        ]
-        for x1, x2, x3 in zip(
-            sweep_params["reference_subsidy_x_1"],
-            sweep_params["reference_subsidy_x_2"],
-            sweep_params["reference_subsidy_x_3"],
-        )
-    ]
-
-    # Drop x_1, x_2, x_3
-    sweep_params.pop("reference_subsidy_x_1", None)
-    sweep_params.pop("reference_subsidy_x_2", None)
-    sweep_params.pop("reference_subsidy_x_3", None)
-
-    # Used for adding environmental scenarios
-    cardinality = max([len(v) for v in sweep_params.values()])
-
-    # Environmental scenarios
-    environmental_param_sets = list(ENVIRONMENTAL_SCENARIOS.values())
-
-    # Repeat control scenarios for each environmental scenario
-    sweep_params = {
-        k: list(v * len(environmental_param_sets)) if len(v) == cardinality else v
-        for k, v in sweep_params.items()
-    }
-
-    sweep_params = {**{k: [] for k in DEFAULT_PARAMS.keys()}, **sweep_params}
-
-    for (
-        k,
-        v,
-    ) in DEFAULT_PARAMS.items():
-        for param_set in environmental_param_sets:
-            if k in param_set.keys():
-                sweep_params[k] += [param_set[k]] * cardinality
-            elif len(sweep_params[k]) != cardinality * len(environmental_param_sets):
-                sweep_params[k] += [DEFAULT_PARAMS[k]] * cardinality
-
-    sweep_params = {
-        **{k: [v] for k, v in DEFAULT_PARAMS.items()},
-        **{k: v for k, v in sweep_params.items() if len(v) > 0},
-    }
-
-    # Load simulation arguments
-    sim_args = (INITIAL_STATE, sweep_params, SUBSPACE_MODEL_BLOCKS, TIMESTEPS, SAMPLES)
+    sweep = single_component_and_credit_supply_sweep(N_PARAM_SWEEP)
 
     # Run simulation
-    sim_df = easy_run(
-        *sim_args,
-        assign_params={
-            "label",
-            "environmental_label",
-            "timestep_in_days",
-            "block_time_in_seconds",
-            "max_credit_supply",
-        },
-        exec_mode="single",
-        deepcopy_off=True,
+    sim_df = run_sweep(
+        sweep,
+        SIMULATION_DAYS=SIMULATION_DAYS,
+        TIMESTEP_IN_DAYS=TIMESTEP_IN_DAYS,
+        SAMPLES=SAMPLES,
+        assign_params=ASSIGN_PARAMS | {"issuance_function_constant"},
     )
     return sim_df
 
@@ -452,89 +205,140 @@ def initial_conditions(
     Returns:
         DataFrame: A dataframe of simulation data
     """
-    TIMESTEPS = int(SIMULATION_DAYS / TIMESTEP_IN_DAYS) + 1
-
-    # Get the sweep parameters in the form of single length arrays
-    param_set = deepcopy(DEFAULT_PARAMS)
-
-    sweep_params = {
-        **{k: [v] for k, v in param_set.items()},
-        **{k: [v] for k, v in ENVIRONMENTAL_SCENARIOS["stochastic"].items()},
-    }
-
-    # Load simulation arguments
-    sim_args = (INITIAL_STATE, sweep_params, SUBSPACE_MODEL_BLOCKS, TIMESTEPS, SAMPLES)
+    param_set = {**DEFAULT_PARAMS, **ENVIRONMENTAL_SCENARIOS["stochastic"]}
 
     # Run simulation
-    sim_df = easy_run(
-        *sim_args,
-        assign_params={
-            "label",
-            "environmental_label",
-            "timestep_in_days",
-            "block_time_in_seconds",
-            "max_credit_supply",
-        },
-        exec_mode="single",
-        deepcopy_off=True,
+    sim_df = run_param_sets(
+        [param_set],
+        SIMULATION_DAYS=SIMULATION_DAYS,
+        TIMESTEP_IN_DAYS=TIMESTEP_IN_DAYS,
+        SAMPLES=SAMPLES,
+        assign_params=ASSIGN_PARAMS,
     )
     return sim_df
 
 
 def reference_subsidy_sweep(
-    SIMULATION_DAYS: int = 360, TIMESTEP_IN_DAYS: int = 1, SAMPLES: int = 1
+    SIMULATION_DAYS: Optional[int] = None,
+    TIMESTEP_IN_DAYS: Optional[int] = None,
+    SAMPLES: Optional[int] = None,
 ) -> DataFrame:
-    """Sweeps issuance functions.
+    """
+    Sweeps reference subsidy schedules.
+
+    Defined in `specs/reference_subsidy_sweep.toml`, the arguments that are set override
+    its run settings.
 
     Returns:
         DataFrame: A dataframe of simulation data
     """
+    return run_spec(
+        "reference_subsidy_sweep", SIMULATION_DAYS, TIMESTEP_IN_DAYS, SAMPLES
+    )
 
-    TIMESTEPS = int(SIMULATION_DAYS / TIMESTEP_IN_DAYS) + 1
 
-    REFERENCE_SUBSIDY_CONSTANT_SINGLE_COMPONENT,
-    REFERENCE_SUBSIDY_HYBRID_SINGLE_COMPONENT,
-    REFERENCE_SUBSIDY_HYBRID_TWO_COMPONENTS,
+def gradients(
+    SIMULATION_DAYS: int = 183, TIMESTEP_IN_DAYS: int = 1, SAMPLES: int = 1
+) -> DataFrame:
+    """
+    Perturbs every numeric parameter of the stochastic scenario up and down
+    by 1%, the n-th run of every perturbation sharing the random numbers of
+    the n-th base run. See `gradients.elasticity_table` for the analysis
+    of the results.
 
-    # Get the sweep params in the form of single length arrays
-    param_set_1 = deepcopy(DEFAULT_PARAMS)
-    param_set_1["label"] = "constant-single-component"
-    param_set_1["reference_subsidy_components"] = (
-        REFERENCE_SUBSIDY_CONSTANT_SINGLE_COMPONENT
+    Returns:
+        DataFrame: A dataframe of simulation data
+    """
+    param_set = {
+        **DEFAULT_PARAMS,
+        **ENVIRONMENTAL_SCENARIOS["stochastic"],
+        "label": "gradients",
+    }
+    param_sets = perturbed_param_sets(param_set, numeric_parameters(param_set))
+
+    # Run simulation
+    sim_df = run_param_sets(
+        param_sets,
+        SIMULATION_DAYS,
+        TIMESTEP_IN_DAYS,
+        SAMPLES,
+        assign_params=ASSIGN_PARAMS | GRADIENT_ASSIGN_PARAMS,
+        common_random_numbers=True,
     )
+    return sim_df
+
+
+def standard_mean_field_run(
+    SIMULATION_DAYS: int = 183, TIMESTEP_IN_DAYS: int = 1, SAMPLES: int = 1
+) -> DataFrame:
+    """
+    Runs the stochastic scenario once with every stochastic input replaced
+    by its expectation, with propagated standard deviations. The run is
+    deterministic, so `SAMPLES` is ignored.
 
-    param_set_2 = deepcopy(DEFAULT_PARAMS)
-    param_set_2["label"] = "hybrid-single-component"
-    param_set_2["reference_subsidy_components"] = (
-        REFERENCE_SUBSIDY_HYBRID_SINGLE_COMPONENT
+    Returns:
+        DataFrame: A dataframe of simulation data
+    """
+    sim_df = mean_field_run(
+        {**DEFAULT_PARAMS, **ENVIRONMENTAL_SCENARIOS["stochastic"]},
+        moments=True,
+        SIMULATION_DAYS=SIMULATION_DAYS,
+        TIMESTEP_IN_DAYS=TIMESTEP_IN_DAYS,
     )
+    return sim_df
+
+
+def screened_sweep_over_single_component_and_credit_supply(
+    SIMULATION_DAYS: int = 183 / 2,
+    TIMESTEP_IN_DAYS: int = 1,
+    SAMPLES: int = 1,
+    N_PARAM_SWEEP: int = 3,
+) -> DataFrame:
+    """
+    Screens every cell of `sweep_over_single_component_and_credit_supply`
+    on a weekly timestep over a third of the horizon, and runs the fifth of
+    the cells with the highest mean circulating supply at full fidelity.
 
-    param_set_3 = deepcopy(DEFAULT_PARAMS)
-    param_set_3["label"] = "hybrid-two-components"
-    param_set_3["reference_subsidy_components"] = (
-        REFERENCE_SUBSIDY_HYBRID_TWO_COMPONENTS
+    Returns:
+        DataFrame: A dataframe of simulation data, with the `fidelity` of
+        every cell
+    """
+    param_sets = single_component_and_credit_supply_sweep(N_PARAM_SWEEP)
+
+    low = Fidelity("low", SIMULATION_DAYS / 3, max(7, TIMESTEP_IN_DAYS), 1)
+    high = Fidelity("high", SIMULATION_DAYS, TIMESTEP_IN_DAYS, SAMPLES)
+    sim_df, _ = multifidelity_sweep(
+        param_sets,
+        score=lambda df: df["circulating_supply"].mean(),
+        top_k=max(1, len(param_sets) // 5),
+        low=low,
+        high=high,
+        assign_params=ASSIGN_PARAMS | {"issuance_function_constant"},
     )
-    param_sets = [param_set_1, param_set_2, param_set_3]
+    return sim_df
 
-    sweep_params: dict[str, list] = {k: [] for k in DEFAULT_PARAMS.keys()}
-    for param_set in param_sets:
-        for k, v in param_set.items():
-            sweep_params[k].append(v)
 
-    # Load simulation arguments
-    sim_args = (INITIAL_STATE, sweep_params, SUBSPACE_MODEL_BLOCKS, TIMESTEPS, SAMPLES)
+def pruned_sweep_over_single_component_and_credit_supply(
+    SIMULATION_DAYS: int = 183 / 2,
+    TIMESTEP_IN_DAYS: int = 1,
+    SAMPLES: int = 1,
+    N_PARAM_SWEEP: int = 3,
+) -> DataFrame:
+    """
+    Runs `sweep_over_single_component_and_credit_supply`, cancelling every
+    30 days the arms which drained the holders balance or exhausted the
+    reward issuance balance.
 
-    # Run simulation
-    sim_df = easy_run(
-        *sim_args,
-        assign_params={
-            "label",
-            "environmental_label",
-            "timestep_in_days",
-            "block_time_in_seconds",
-            "max_credit_supply",
-        },
-        exec_mode="single",
-        deepcopy_off=True,
+    Returns:
+        DataFrame: A dataframe of simulation data
+    """
+    sim_df, _ = pruned_run(
+        single_component_and_credit_supply_sweep(N_PARAM_SWEEP),
+        DEFAULT_CONSTRAINTS,
+        check_every=max(1, round(30 / TIMESTEP_IN_DAYS)),
+        SIMULATION_DAYS=SIMULATION_DAYS,
+        TIMESTEP_IN_DAYS=TIMESTEP_IN_DAYS,
+        SAMPLES=SAMPLES,
+        assign_params=ASSIGN_PARAMS | {"issuance_function_constant"},
     )
     return sim_df
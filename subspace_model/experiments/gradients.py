@@ -0,0 +1,172 @@
+"""
+Local sensitivities through batched perturbed runs.
+
+Every numeric parameter of a base parameter set is perturbed by a relative
+step `h` in both directions. The `2P + 1` parameter sets are run as one
+sweep sharing a `random_seed`, so that every run draws the same random
+numbers as the base run and finite differences are not dominated by
+sampling noise.
+"""
+import logging
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from subspace_model.experiments.batch import ASSIGN_PARAMS, run_param_sets
+from subspace_model.experiments.metrics import run_values
+from subspace_model.params import DEFAULT_PARAMS
+from subspace_model.types import SubspaceModelParams
+
+logger = logging.getLogger("subspace-digital-twin")
+
+# Numeric params which are settings of the simulation rather than of the model
+NON_MODEL_PARAMS = {
+    "timestep_in_days",
+    "random_seed",
+    "random_run",
+    "run_offset",
+    "timestep_offset",
+}
+
+# Assigned to the simulation dataframe to identify the perturbation of every run
+GRADIENT_ASSIGN_PARAMS = {"perturbed_parameter", "perturbation", "perturbed_value"}
+
+
+def numeric_parameters(params: dict) -> list[str]:
+    """Names of the params whose value is a number."""
+    return [
+        k
+        for k, v in params.items()
+        if isinstance(v, (int, float))
+        and not isinstance(v, bool)
+        and k not in NON_MODEL_PARAMS
+    ]
+
+
+def perturbed_param_sets(
+    base: dict,
+    parameters: list[str],
+    h: float = 0.01,
+    random_seed: int = 0,
+) -> list[dict]:
+    """
+    Builds the base parameter set followed by `value * (1 ± h)` for every
+    parameter. Integer params are perturbed as floats by the same relative
+    step, as a whole unit is far from local for small values (eg. the
+    `issuance_function_constant` of 1, which must not reach 0). Params
+    equal to zero move by `h` upwards only, as they are often fractions for
+    which negative values are invalid.
+    """
+
+    def tagged(parameter: str, perturbation: int, value: float) -> dict:
+        return {
+            **base,
+            parameter: value,
+            "random_seed": random_seed,
+            "perturbed_parameter": parameter,
+            "perturbation": perturbation,
+            "perturbed_value": float(value),
+        }
+
+    param_sets = [
+        {
+            **base,
+            "random_seed": random_seed,
+            "perturbed_parameter": "base",
+            "perturbation": 0,
+            "perturbed_value": np.nan,
+        }
+    ]
+    for parameter in parameters:
+        value = float(base[parameter])
+        step = abs(value) * h if value != 0 else h
+        directions = (1,) if value == 0 else (-1, 1)
+        for direction in directions:
+            param_sets.append(tagged(parameter, direction, value + direction * step))
+    return param_sets
+
+
+def value_at_day(column: str, day: float) -> Callable:
+    """Metric reading `column` on the first timestep at or after `day`."""
+
+    def metric(sim_df: DataFrame) -> float:
+        df = sim_df.sort_values("timestep")
+        reached = df[df["days_passed"] >= day]
+        row = reached.iloc[0] if len(reached) > 0 else df.iloc[-1]
+        return float(row[column])
+
+    metric.__name__ = f"{column}_at_day_{day:g}"
+    return metric
+
+
+def elasticity_table(sim_df: DataFrame, metrics: dict[str, Callable]) -> DataFrame:
+    """
+    Computes derivatives and elasticities from the runs of a gradients
+    experiment. Central differences are used when both directions were
+    run, and one-sided differences otherwise.
+
+    Returns:
+        DataFrame: One row per metric and parameter, with the base value of
+        both, the derivative and the elasticity `d(metric)/d(param) * param / metric`.
+    """
+    runs = sim_df.groupby("subset")[list(GRADIENT_ASSIGN_PARAMS)].first()
+    base_subset = runs.index[runs["perturbed_parameter"] == "base"][0]
+
+    rows = {}
+    for name, metric in metrics.items():
+        values = run_values(sim_df, metric).groupby(level="subset").mean()
+        y0 = values[base_subset]
+        for parameter, g in runs[runs["perturbation"] != 0].groupby(
+            "perturbed_parameter"
+        ):
+            g = g.sort_values("perturbation")
+            x = g["perturbed_value"].to_numpy()
+            y = values[g.index].to_numpy()
+            if len(g) == 2:
+                # Steps are symmetric around the base value
+                x0 = x.mean()
+                derivative = (y[1] - y[0]) / (x[1] - x[0])
+            else:
+                # Only params equal to zero are perturbed in one direction
+                x0 = 0.0
+                derivative = (y[0] - y0) / x[0]
+            rows[(name, parameter)] = {
+                "parameter_value": x0,
+                "metric_value": y0,
+                "derivative": derivative,
+                "elasticity": derivative * x0 / y0 if y0 != 0 else np.nan,
+            }
+    return pd.DataFrame.from_dict(rows, orient="index").rename_axis(
+        ["metric", "parameter"]
+    )
+
+
+def local_gradients(
+    metrics: dict[str, Callable],
+    base: SubspaceModelParams = DEFAULT_PARAMS,
+    parameters: Optional[list[str]] = None,
+    h: float = 0.01,
+    random_seed: int = 0,
+    **run_kwargs,
+) -> DataFrame:
+    """
+    Runs the perturbations of every numeric parameter of `base` in one
+    batch and returns the elasticity table of `metrics`.
+
+    Args:
+        metrics (dict): Trajectory metrics, eg.
+            `{"supply_180": value_at_day("circulating_supply", 180)}`
+        parameters (list[str]): Defaults to every numeric parameter
+        h (float): Relative perturbation step
+        random_seed (int): Seed shared by every run
+        **run_kwargs: Forwarded to `run_param_sets`
+    """
+    if parameters is None:
+        parameters = numeric_parameters(base)
+    param_sets = perturbed_param_sets(dict(base), parameters, h, random_seed)
+    logger.info(f"Gradients: {len(param_sets)} parameter sets")
+    run_kwargs.setdefault("assign_params", ASSIGN_PARAMS | GRADIENT_ASSIGN_PARAMS)
+    sim_df = run_param_sets(param_sets, common_random_numbers=True, **run_kwargs)
+    return elasticity_table(sim_df, metrics)
@@ -1,3 +1,7 @@
+import hashlib
+import json
+from typing import Callable, Optional
+
 import numpy as np
 from scipy.stats import norm, poisson  # type: ignore
 
@@ -51,22 +55,123 @@ def DEFAULT_SLASH_FUNCTION(params: SubspaceModelParams, state: SubspaceModelStat
     return state["staking_pool_balance"] * 0.001  # HACK
 
 
-def NORMAL_GENERATOR(mu: float, sigma: float) -> StochasticFunction:
-    np.random.seed()
-    return lambda p, s: norm.rvs(mu, sigma, random_state=np.random.RandomState())
+def generator_stream(kind: str, args: tuple, name: Optional[str] = None) -> int:
+    """
+    The random stream of a generator, from its distribution and its name,
+    so that it does not depend on the order generators are created in.
+    Generators of the same distribution need distinct names to draw
+    independent numbers.
+    """
+    text = json.dumps([kind, name, *[float(a) for a in args]])
+    return int(hashlib.sha256(text.encode()).hexdigest()[:8], 16)
+
+
+def random_state(
+    params: SubspaceModelParams,
+    state: SubspaceModelState,
+    stream: int,
+    call: int = 0,
+) -> np.random.RandomState:
+    """
+    Random state for one draw. When the `random_seed` param is set, draws
+    are keyed by the seed, the run, the timestep, the substep, the
+    generator stream and the number of the call within the substep, so
+    that runs sharing a seed and a run number use common random numbers
+    whatever their other params are. The run is read from the `random_run`
+    param when set, as cadCAD numbers runs differently depending on the
+    number of subsets, and shifted by the `run_offset` param, so that
+    batches of runs added to an experiment draw new numbers. Runs continued
+    from an intermediate state set the `timestep_offset` param.
+    """
+    seed = params.get("random_seed") if isinstance(params, dict) else None
+    if seed is None:
+        return np.random.RandomState()
+    key = [
+        seed,
+        params.get("run_offset", 0) + params.get("random_run", state.get("run", 0)),
+        params.get("timestep_offset", 0) + state.get("timestep", 0),
+        state.get("substep", 0),
+        stream,
+        call,
+    ]
+    return np.random.RandomState([int(k) for k in key])
+
+
+# The last caller of every stream and its number of calls. Kept out of the
+# generators, so that they are described by value (see `batch._describe`).
+_LAST_CALLS: dict[int, tuple] = {}
+
+
+def _seeded(draw: Callable, stream: int) -> StochasticFunction:
+    """
+    A generator calling `draw` with the random state of every draw. Calls
+    repeated with the same params and state, eg. twice within a substep,
+    draw the next numbers of the stream rather than the same one.
+    """
+
+    def generator(params, state):
+        caller: tuple = (id(params), id(state))
+        if isinstance(state, dict):
+            caller += tuple(state.get(k) for k in ("run", "timestep", "substep"))
+        last, calls = _LAST_CALLS.get(stream, (None, 0))
+        call = calls + 1 if caller == last else 0
+        _LAST_CALLS[stream] = (caller, call)
+        return draw(random_state(params, state, stream, call))
+
+    return generator
+
+
+def _described(
+    generator: StochasticFunction, distribution, transform
+) -> StochasticFunction:
+    """
+    Attaches to a generator the distribution it draws from and the
+    transform applied to the draws, so that its moments can be computed.
+    """
+    generator.distribution = distribution  # type: ignore
+    generator.transform = transform  # type: ignore
+    return generator
+
+
+def _transformed(generator: StochasticFunction, transform) -> StochasticFunction:
+    """Wraps a generator, keeping track of its distribution when known."""
+    wrapped = lambda p, s: transform(generator(p, s))
+    if hasattr(generator, "distribution"):
+        inner = generator.transform  # type: ignore
+        _described(
+            wrapped,
+            generator.distribution,  # type: ignore
+            lambda x: transform(inner(x)),
+        )
+    return wrapped
+
+
+def NORMAL_GENERATOR(
+    mu: float, sigma: float, name: Optional[str] = None
+) -> StochasticFunction:
+    stream = generator_stream("normal", (mu, sigma), name)
+    return _described(
+        _seeded(lambda rs: norm.rvs(mu, sigma, random_state=rs), stream),
+        norm(mu, sigma),
+        lambda x: x,
+    )
 
 
-def POISSON_GENERATOR(mu: float) -> StochasticFunction:
-    np.random.seed()
-    return lambda p, s: poisson.rvs(mu, random_state=np.random.RandomState())
+def POISSON_GENERATOR(mu: float, name: Optional[str] = None) -> StochasticFunction:
+    stream = generator_stream("poisson", (mu,), name)
+    return _described(
+        _seeded(lambda rs: poisson.rvs(mu, random_state=rs), stream),
+        poisson(mu),
+        lambda x: x,
+    )
 
 
 def POSITIVE_INTEGER(generator: StochasticFunction) -> StochasticFunction:
-    return lambda p, s: max(0, int(generator(p, s)))
+    return _transformed(generator, lambda x: max(0, int(x)))
 
 
 def MAGNITUDE(generator: StochasticFunction) -> StochasticFunction:
-    return lambda p, s: min(1, max(0, generator(p, s)))
+    return _transformed(generator, lambda x: min(1, max(0, x)))
 
 
 SUPPLY_ISSUED = issued_supply
@@ -0,0 +1,204 @@
+"""
+Mean-field runs and control variates.
+
+Every stochastic generator of a scenario has a known distribution. The
+mean-field mode substitutes each generator by its expectation, giving an
+approximate mean trajectory from a single deterministic run, optionally
+with an approximate standard deviation propagated from the spread of the
+inputs.
+
+The same expectations make the realized inputs of a stochastic run usable
+as control variates: their run averages have a known mean, so the part of
+a metric's sampling noise which is explained by them can be removed.
+"""
+import logging
+from typing import Callable, Optional, Union
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from subspace_model.experiments.batch import run_param_sets
+from subspace_model.experiments.metrics import run_values
+from subspace_model.params import DEFAULT_PARAMS, ENVIRONMENTAL_SCENARIOS
+
+logger = logging.getLogger("subspace-digital-twin")
+
+STOCHASTIC_PARAMS = {**DEFAULT_PARAMS, **ENVIRONMENTAL_SCENARIOS["stochastic"]}
+
+# State column -> (generator param, floor applied by the model, as a value or a param)
+INPUT_CONTROLS: dict[str, tuple[str, Union[str, float, None]]] = {
+    "transaction_count": ("transaction_count_per_day_function", 0),
+    "average_transaction_size": ("transaction_size_function", "min_transaction_size"),
+    "average_compute_weight_per_tx": (
+        "compute_weights_per_tx_function",
+        "min_compute_weights_per_tx",
+    ),
+    "average_priority_fee": ("priority_fee_function", 0),
+    "bundle_count": ("bundle_count_per_day_function", 0),
+}
+
+
+def is_stochastic(value: object) -> bool:
+    """Whether a param value is a generator with a known distribution."""
+    return callable(value) and hasattr(value, "distribution")
+
+
+def generator_moments(
+    generator: Callable, floor: Optional[float] = None, points: int = 10_001
+) -> tuple[float, float]:
+    """
+    Mean and standard deviation of the values returned by a generator,
+    optionally floored, computed on an evenly spaced quantile grid.
+    """
+    if not is_stochastic(generator):
+        raise ValueError("The generator does not describe its distribution")
+    u = (np.arange(points) + 0.5) / points
+    x = generator.distribution.ppf(u)  # type: ignore
+    values = np.array([generator.transform(v) for v in x], dtype=float)  # type: ignore
+    if floor is not None:
+        values = np.maximum(values, floor)
+    return float(values.mean()), float(values.std())
+
+
+def constant(value: float) -> Callable:
+    """A deterministic generator always returning `value`."""
+    return lambda p, s: value
+
+
+def mean_field_params(params: dict) -> dict:
+    """Replaces every stochastic generator of `params` by its expectation."""
+    expected = {
+        k: constant(generator_moments(v)[0])
+        for k, v in params.items()
+        if is_stochastic(v)
+    }
+    label = params.get("environmental_label", "standard")
+    return {**params, **expected, "environmental_label": f"{label}-mean-field"}
+
+
+def mean_field_run(
+    params: dict = STOCHASTIC_PARAMS,
+    moments: bool = False,
+    SIMULATION_DAYS: int = 183,
+    TIMESTEP_IN_DAYS: int = 1,
+    **run_kwargs,
+) -> DataFrame:
+    """
+    Runs the model once with every stochastic input at its expectation.
+
+    With `moments`, every input is also shifted by one standard deviation
+    in a run of its own, and the resulting first-order deviations give a
+    `<column>_std` for every numeric state variable. This assumes that the
+    inputs are redrawn independently every timestep and that every draw
+    up to a timestep contributes evenly to the state, so that the
+    variance of a persistent shift is divided by the elapsed timesteps.
+
+    Returns:
+        DataFrame: The approximate mean trajectory
+    """
+    base = mean_field_params(params)
+    param_sets = [base]
+    stochastic = [k for k, v in params.items() if is_stochastic(v)]
+    if moments:
+        for name in stochastic:
+            mean, std = generator_moments(params[name])
+            param_sets.append({**base, name: constant(mean + std)})
+
+    sim_df = run_param_sets(
+        param_sets,
+        SIMULATION_DAYS=SIMULATION_DAYS,
+        TIMESTEP_IN_DAYS=TIMESTEP_IN_DAYS,
+        SAMPLES=1,
+        **run_kwargs,
+    )
+    mean_df = sim_df[sim_df["subset"] == 0].reset_index(drop=True)
+    if not moments:
+        return mean_df
+
+    columns = [
+        c
+        for c in mean_df.select_dtypes("number").columns
+        if c not in ("simulation", "subset", "run", "substep", "timestep")
+    ]
+    elapsed = mean_df["timestep"].clip(lower=1).to_numpy()[:, None]
+    variance = np.zeros((len(mean_df), len(columns)))
+    for subset in range(1, len(param_sets)):
+        shifted = sim_df[sim_df["subset"] == subset].reset_index(drop=True)
+        deviation = shifted[columns].to_numpy(float) - mean_df[columns].to_numpy(float)
+        variance += deviation**2 / elapsed
+    std_df = pd.DataFrame(np.sqrt(variance), columns=[f"{c}_std" for c in columns])
+    return pd.concat([mean_df, std_df], axis=1)
+
+
+def control_expectations(
+    params: dict, controls: dict[str, tuple[str, Union[str, float, None]]]
+) -> pd.Series:
+    """Expected value of every control column under `params`."""
+    expectations = {}
+    for column, (name, floor) in controls.items():
+        if not is_stochastic(params.get(name)):
+            continue
+        floor_value = params[floor] if isinstance(floor, str) else floor
+        expectations[column] = generator_moments(params[name], floor_value)[0]
+    return pd.Series(expectations, dtype=float)
+
+
+def control_variate_estimate(
+    sim_df: DataFrame,
+    metric: Callable,
+    params: Union[dict, list[dict]] = STOCHASTIC_PARAMS,
+    controls: dict[str, tuple[str, Union[str, float, None]]] = INPUT_CONTROLS,
+) -> DataFrame:
+    """
+    Estimates the expectation of a trajectory metric on every subset,
+    using the run averages of realized inputs as control variates.
+
+    Args:
+        sim_df (DataFrame): Simulation results with several runs per subset
+        metric (Callable): Trajectory metric, eg. from `experiments/metrics.py`
+        params (dict | list[dict]): The params of the runs, or of every subset
+        controls (dict): Control columns and the generators producing them
+
+    Returns:
+        DataFrame: One row per subset with the plain Monte Carlo mean, the
+        control variate mean, their standard errors and the variance
+        reduction factor.
+    """
+    values = run_values(sim_df, metric)
+    draws = sim_df[sim_df["timestep"] > 0]
+    rows = {}
+    for subset, y in values.groupby(level="subset"):
+        subset_params = params[subset] if isinstance(params, list) else params
+        expected = control_expectations(subset_params, controls)
+        expected = expected[[c for c in expected.index if c in sim_df.columns]]
+        observed = (
+            draws[draws["subset"] == subset]
+            .groupby("run")[list(expected.index)]
+            .mean()
+            .loc[y.index.get_level_values("run")]
+        )
+
+        y = y.to_numpy(dtype=float)
+        n = len(y)
+        C = observed.to_numpy(dtype=float) - expected.to_numpy()
+        # Controls without spread carry no information
+        C = C[:, C.std(axis=0) > 0] if n > 1 else C[:, :0]
+        plain_se = y.std(ddof=1) / np.sqrt(n) if n > 1 else np.nan
+        if C.shape[1] > 0 and n > C.shape[1] + 1:
+            X = np.column_stack([np.ones(n), C])
+            coefficients, *_ = np.linalg.lstsq(X, y, rcond=None)
+            residuals = y - X @ coefficients
+            cv_mean = coefficients[0]
+            cv_se = np.sqrt(residuals @ residuals / (n - X.shape[1]) / n)
+        else:
+            cv_mean, cv_se = y.mean(), plain_se
+        rows[subset] = {
+            "samples": n,
+            "mean": y.mean(),
+            "std_error": plain_se,
+            "cv_mean": cv_mean,
+            "cv_std_error": cv_se,
+            "variance_reduction": (plain_se / cv_se) ** 2 if cv_se > 0 else np.inf,
+        }
+    return pd.DataFrame.from_dict(rows, orient="index").rename_axis("subset")
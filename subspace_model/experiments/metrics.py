@@ -1,7 +1,7 @@
 """
 Metrics that requires the full trajectory dataset in order to be computable
 """
-from typing import List
+from typing import Callable, List
 
 import numpy as np
 import pandas as pd
@@ -90,3 +90,29 @@ def total_supply_mean(sim_df: pd.DataFrame) -> pd.DataFrame:
     # return pd.DataFrame({'max_total_supply': [max_total_supply]})
 
     return max_total_supply
+
+
+def _scalar(value) -> float:
+    """
+    Reduces the output of a metric to a single float.
+    """
+    if isinstance(value, pd.DataFrame):
+        return float(value.iloc[0, 0])
+    elif isinstance(value, pd.Series):
+        return float(value.iloc[0])
+    else:
+        return float(value)
+
+
+def run_values(sim_df: pd.DataFrame, metric: Callable) -> pd.Series:
+    """
+    Evaluates a trajectory metric on every run separately.
+
+    Returns a series indexed by (subset, run) so that sample statistics
+    can be taken across the Monte Carlo runs of each subset.
+    """
+    values = {}
+    for (subset, run), g_df in sim_df.groupby(['subset', 'run']):
+        values[(subset, run)] = _scalar(metric(g_df))
+    index = pd.MultiIndex.from_tuples(list(values.keys()), names=['subset', 'run'])
+    return pd.Series(list(values.values()), index=index, dtype=float)
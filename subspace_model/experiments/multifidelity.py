@@ -0,0 +1,128 @@
+"""
+Multi-fidelity sweeps.
+
+Every cell of a sweep is first screened at a low fidelity (coarse
+timesteps, short horizon, few samples). Only the most promising cells,
+or the ones closest to a decision threshold, are then promoted and run
+again at full fidelity.
+"""
+import logging
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from subspace_model.experiments.batch import cell_values, run_param_sets
+
+logger = logging.getLogger("subspace-digital-twin")
+
+
+@dataclass
+class Fidelity:
+    label: str
+    SIMULATION_DAYS: float
+    TIMESTEP_IN_DAYS: int
+    SAMPLES: int
+
+    def run(self, param_sets: list[dict], **run_kwargs) -> DataFrame:
+        """Runs the parameter sets at this fidelity."""
+        param_sets = [
+            {**p, "timestep_in_days": self.TIMESTEP_IN_DAYS} for p in param_sets
+        ]
+        sim_df = run_param_sets(
+            param_sets,
+            SIMULATION_DAYS=self.SIMULATION_DAYS,
+            TIMESTEP_IN_DAYS=self.TIMESTEP_IN_DAYS,
+            SAMPLES=self.SAMPLES,
+            **run_kwargs,
+        )
+        sim_df["fidelity"] = self.label
+        return sim_df
+
+
+LOW_FIDELITY = Fidelity("low", SIMULATION_DAYS=90, TIMESTEP_IN_DAYS=7, SAMPLES=1)
+HIGH_FIDELITY = Fidelity("high", SIMULATION_DAYS=183, TIMESTEP_IN_DAYS=1, SAMPLES=3)
+
+
+def promote(
+    scores: pd.Series,
+    top_k: Optional[int] = None,
+    maximize: bool = True,
+    threshold: Optional[float] = None,
+    boundary_k: Optional[int] = None,
+) -> pd.Index:
+    """
+    Cells to promote: the `top_k` best scores, and the `boundary_k` scores
+    closest to `threshold`, where the decision is least certain.
+    """
+    promoted = pd.Index([], dtype=scores.index.dtype)
+    if top_k is not None:
+        ranked = scores.sort_values(ascending=not maximize)
+        promoted = promoted.union(ranked.index[:top_k])
+    if threshold is not None and boundary_k is not None:
+        closest = (scores - threshold).abs().sort_values()
+        promoted = promoted.union(closest.index[:boundary_k])
+    return promoted
+
+
+def multifidelity_sweep(
+    param_sets: list[dict],
+    score: Callable,
+    top_k: Optional[int] = None,
+    maximize: bool = True,
+    threshold: Optional[float] = None,
+    boundary_k: Optional[int] = None,
+    low: Fidelity = LOW_FIDELITY,
+    high: Fidelity = HIGH_FIDELITY,
+    **run_kwargs,
+) -> tuple[DataFrame, DataFrame]:
+    """
+    Screens every cell at low fidelity and promotes a few of them to high
+    fidelity. See `promote` for the promotion rules.
+
+    Args:
+        param_sets (list[dict]): One parameter set per sweep cell
+        score (Callable): Trajectory metric ranking the cells
+        **run_kwargs: Forwarded to `run_param_sets`
+
+    Returns:
+        tuple[DataFrame, DataFrame]: The simulation data of every cell at
+        the highest fidelity it was run at, where `subset` is the cell and
+        `fidelity` the fidelity, and a report with one row per cell.
+    """
+    screening = low.run(param_sets, **run_kwargs)
+    low_scores = cell_values(screening, {"score": score})["score"]
+    promoted = promote(low_scores, top_k, maximize, threshold, boundary_k)
+    logger.info(
+        f"Multi-fidelity sweep: {len(promoted)} of {len(param_sets)} cells promoted"
+    )
+
+    report = pd.DataFrame(
+        {
+            "label": [p.get("label") for p in param_sets],
+            "environmental_label": [p.get("environmental_label") for p in param_sets],
+            "low_score": low_scores.reindex(range(len(param_sets))),
+        }
+    ).rename_axis("cell")
+    report["promoted"] = report.index.isin(promoted)
+    report["high_score"] = np.nan
+
+    frames = [screening[~screening["subset"].isin(promoted)]]
+    if len(promoted) > 0:
+        full = high.run([param_sets[i] for i in promoted], **run_kwargs)
+        full["subset"] = full["subset"].map(dict(enumerate(promoted)))
+        high_scores = cell_values(full, {"score": score})["score"]
+        report.loc[high_scores.index, "high_score"] = high_scores
+        frames.append(full)
+
+    for fidelity, rows in ((low, ~report["promoted"]), (high, report["promoted"])):
+        report.loc[rows, "fidelity"] = fidelity.label
+        report.loc[rows, "SIMULATION_DAYS"] = fidelity.SIMULATION_DAYS
+        report.loc[rows, "TIMESTEP_IN_DAYS"] = fidelity.TIMESTEP_IN_DAYS
+        report.loc[rows, "SAMPLES"] = fidelity.SAMPLES
+    report["score"] = report["high_score"].fillna(report["low_score"])
+
+    sim_df = pd.concat(frames, ignore_index=True)
+    return sim_df.sort_values(["subset", "run", "timestep"]), report
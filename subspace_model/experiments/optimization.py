@@ -0,0 +1,185 @@
+"""
+Bayesian optimization of model parameters.
+
+A Gaussian process surrogate of the objective is refitted after every
+batch of evaluations and the next batch is proposed by maximizing the
+expected improvement, using the kriging believer heuristic to pick
+several points per batch. Every evaluated point is logged to a result
+cache, and re-running a seeded optimization only simulates new points.
+"""
+import logging
+from copy import deepcopy
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from scipy.stats import norm, qmc  # type: ignore
+
+from subspace_model.experiments.batch import ResultCache, evaluate_overlays
+from subspace_model.experiments.sensitivity import Ranges
+from subspace_model.experiments.surrogate import GaussianProcessSurrogate
+from subspace_model.params import DEFAULT_PARAMS
+from subspace_model.types import SubspaceModelParams
+
+logger = logging.getLogger("subspace-digital-twin")
+
+
+def target_path_loss(column: str, target: Sequence[float]) -> Callable:
+    """
+    Objective measuring how far a trajectory is from a desired path, as the
+    root mean squared error relative to the target.
+
+    Args:
+        column (str): The state variable to compare, eg. `circulating_supply`
+        target (Sequence[float]): Desired value for every timestep
+    """
+    target = np.asarray(target, dtype=float)
+
+    def loss(sim_df: DataFrame) -> float:
+        path = sim_df.sort_values("timestep")[column].to_numpy(dtype=float)
+        n = min(len(path), len(target))
+        scale = np.maximum(np.abs(target[:n]), 1e-12)
+        return float(np.sqrt(np.mean(((path[:n] - target[:n]) / scale) ** 2)))
+
+    return loss
+
+
+def expected_improvement(
+    prediction: DataFrame, best: float, xi: float = 0.0
+) -> np.ndarray:
+    """Expected improvement below `best` for a minimization problem."""
+    mean = prediction["mean"].to_numpy()
+    std = np.maximum(prediction["std"].to_numpy(), 1e-12)
+    z = (best - mean - xi) / std
+    return (best - mean - xi) * norm.cdf(z) + std * norm.pdf(z)
+
+
+def propose_batch(
+    surrogate: GaussianProcessSurrogate,
+    space: Ranges,
+    best: float,
+    batch_size: int,
+    candidates: int = 2048,
+    seed: Optional[int] = None,
+) -> DataFrame:
+    """
+    Proposes `batch_size` points by maximizing the expected improvement
+    over a quasi-random candidate set. After each pick the surrogate
+    believes its own prediction at that point, which pushes the next
+    picks elsewhere.
+    """
+    names = list(space)
+    sampler = qmc.Sobol(d=len(names), scramble=True, seed=seed)
+    points = qmc.scale(
+        sampler.random(candidates),
+        [space[n][0] for n in names],
+        [space[n][1] for n in names],
+    )
+    candidates_df = pd.DataFrame(points, columns=names)
+
+    believer = deepcopy(surrogate)
+    picks = []
+    for _ in range(batch_size):
+        prediction = believer.predict(candidates_df)
+        i = int(np.argmax(expected_improvement(prediction, best)))
+        picks.append(candidates_df.iloc[i])
+        believer.update(
+            candidates_df.iloc[[i]], [prediction["mean"].iloc[i]], refit=False
+        )
+        candidates_df = candidates_df.drop(candidates_df.index[i])
+    return pd.DataFrame(picks).reset_index(drop=True)
+
+
+def optimize(
+    space: Ranges,
+    objective: Callable,
+    budget: int = 40,
+    batch_size: int = 4,
+    initial_points: Optional[int] = None,
+    tolerance: float = 1e-3,
+    patience: int = 3,
+    base: SubspaceModelParams = DEFAULT_PARAMS,
+    cache: Optional[ResultCache] = None,
+    seed: Optional[int] = None,
+    **run_kwargs,
+) -> tuple[dict, DataFrame]:
+    """
+    Minimizes `objective` over the parameters of `space`.
+
+    Args:
+        space (Ranges): Parameter ranges. Dotted keys reach into nested
+            params, eg. `reference_subsidy_components.0.max_cumulative_subsidy`
+        objective (Callable): Trajectory metric to minimize
+        budget (int): Maximum number of evaluated points
+        batch_size (int): Points evaluated together in one batch
+        initial_points (int): Size of the initial Latin hypercube design
+        tolerance (float): Relative improvement under which a batch counts
+            as not improving
+        patience (int): Batches without improvement before stopping
+        base (SubspaceModelParams): Params the points are overlaid onto
+        cache (ResultCache): Where evaluated points are logged and looked
+            up, the default `ResultCache` when not set. Only seeded points
+            are looked up.
+        **run_kwargs: Forwarded to the experiment runner
+
+    Returns:
+        tuple[dict, DataFrame]: The best point found, and the history of
+        every evaluated point with its objective value and batch.
+    """
+    names = list(space)
+    if cache is None:
+        cache = ResultCache()
+    if initial_points is None:
+        initial_points = max(batch_size, 2 * len(names))
+
+    lhs = qmc.LatinHypercube(d=len(names), seed=seed).random(initial_points)
+    batch = pd.DataFrame(
+        qmc.scale(lhs, [space[n][0] for n in names], [space[n][1] for n in names]),
+        columns=names,
+    )
+
+    history: list[DataFrame] = []
+    stale = 0
+    best = np.inf
+    iteration = 0
+    while True:
+        batch = batch.iloc[: budget - sum(len(h) for h in history)]
+        overlays = [
+            {**row.to_dict(), "label": "optimization"} for _, row in batch.iterrows()
+        ]
+        values = evaluate_overlays(
+            overlays, {"objective": objective}, base=base, cache=cache, **run_kwargs
+        )
+        history.append(batch.assign(objective=values["objective"], batch=iteration))
+        evaluated = pd.concat(history, ignore_index=True)
+
+        batch_best = evaluated["objective"].min()
+        improved = not np.isfinite(best) or best - batch_best > tolerance * abs(best)
+        stale = 0 if improved else stale + 1
+        best = min(best, batch_best)
+        logger.info(
+            f"Optimization batch {iteration}: {len(evaluated)} points, best {best:.6g}"
+        )
+
+        if len(evaluated) >= budget:
+            logger.info("Optimization stopped: budget exhausted")
+            break
+        if stale >= patience:
+            logger.info(f"Optimization converged: {patience} batches without improvement")
+            break
+
+        surrogate = GaussianProcessSurrogate(seed=seed).fit(
+            evaluated[names], evaluated["objective"]
+        )
+        iteration += 1
+        batch = propose_batch(
+            surrogate,
+            space,
+            best,
+            min(batch_size, budget - len(evaluated)),
+            seed=None if seed is None else seed + iteration,
+        )
+
+    best_row = evaluated.loc[evaluated["objective"].idxmin()]
+    return best_row[names + ["objective"]].to_dict(), evaluated
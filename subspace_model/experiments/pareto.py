@@ -0,0 +1,212 @@
+"""
+Multi-objective search over tokenomics parameters.
+
+An NSGA-II style genetic algorithm evolves a population of parameter
+points. Each generation is evaluated as one batch, and the search returns
+the Pareto front together with the trajectories of the front points.
+"""
+import logging
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from subspace_model.experiments.batch import (
+    cell_values,
+    overlay_params,
+    run_param_sets,
+)
+from subspace_model.experiments.sensitivity import Ranges
+from subspace_model.params import DEFAULT_PARAMS
+from subspace_model.types import SubspaceModelParams
+
+logger = logging.getLogger("subspace-digital-twin")
+
+# name -> (trajectory metric, "min" or "max")
+Objectives = dict[str, tuple[Callable, str]]
+
+DEFAULT_OBJECTIVES: Objectives = {
+    "issued_rewards": (
+        lambda df: df["reward_issuance_balance"].iloc[0]
+        - df["reward_issuance_balance"].iloc[-1],
+        "min",
+    ),
+    "farmer_income": (
+        lambda df: df["block_reward"].fillna(0).sum()
+        + df["storage_fees_to_farmers"].sum(),
+        "max",
+    ),
+    "storage_fee_volume": (lambda df: df["storage_fee_volume"].sum(), "min"),
+    "holders_balance_erosion": (
+        lambda df: (df["holders_balance"].cummax() - df["holders_balance"]).max(),
+        "min",
+    ),
+}
+
+
+def non_dominated_sort(F: np.ndarray) -> list[np.ndarray]:
+    """
+    Splits points into successive non-dominated fronts, all objectives
+    being minimized.
+    """
+    n = len(F)
+    dominates = [
+        np.where(np.all(F[i] <= F, axis=1) & np.any(F[i] < F, axis=1))[0]
+        for i in range(n)
+    ]
+    dominated_count = np.array(
+        [np.sum(np.all(F <= F[i], axis=1) & np.any(F < F[i], axis=1)) for i in range(n)]
+    )
+    fronts = []
+    current = np.where(dominated_count == 0)[0]
+    while len(current) > 0:
+        fronts.append(current)
+        for i in current:
+            dominated_count[dominates[i]] -= 1
+        candidates = np.unique(np.concatenate([dominates[i] for i in current]))
+        current = candidates[dominated_count[candidates] == 0]
+    return fronts
+
+
+def crowding_distance(F: np.ndarray) -> np.ndarray:
+    """Crowding distance of the points of one front."""
+    n, m = F.shape
+    distance = np.zeros(n)
+    if n <= 2:
+        return np.full(n, np.inf)
+    for k in range(m):
+        order = np.argsort(F[:, k])
+        span = F[order[-1], k] - F[order[0], k]
+        distance[order[0]] = distance[order[-1]] = np.inf
+        if span > 0:
+            distance[order[1:-1]] += (F[order[2:], k] - F[order[:-2], k]) / span
+    return distance
+
+
+def _rank(F: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    rank = np.zeros(len(F), dtype=int)
+    crowding = np.zeros(len(F))
+    for r, front in enumerate(non_dominated_sort(F)):
+        rank[front] = r
+        crowding[front] = crowding_distance(F[front])
+    return rank, crowding
+
+
+def _offspring(
+    X: np.ndarray,
+    rank: np.ndarray,
+    crowding: np.ndarray,
+    rng: np.random.Generator,
+    eta_crossover: float,
+    eta_mutation: float,
+) -> np.ndarray:
+    """
+    Binary tournaments, simulated binary crossover and polynomial mutation
+    on points normalized to the unit box.
+    """
+    n, d = X.shape
+
+    def tournament() -> np.ndarray:
+        i, j = rng.integers(0, n, 2)
+        better = (rank[i], -crowding[i]) <= (rank[j], -crowding[j])
+        return X[i] if better else X[j]
+
+    children = []
+    while len(children) < n:
+        p1, p2 = tournament(), tournament()
+        u = rng.random(d)
+        beta = np.where(
+            u <= 0.5,
+            (2 * u) ** (1 / (eta_crossover + 1)),
+            (1 / (2 * (1 - u))) ** (1 / (eta_crossover + 1)),
+        )
+        for child in (
+            0.5 * ((1 + beta) * p1 + (1 - beta) * p2),
+            0.5 * ((1 - beta) * p1 + (1 + beta) * p2),
+        ):
+            u = rng.random(d)
+            delta = np.where(
+                u < 0.5,
+                (2 * u) ** (1 / (eta_mutation + 1)) - 1,
+                1 - (2 * (1 - u)) ** (1 / (eta_mutation + 1)),
+            )
+            mutate = rng.random(d) < 1 / d
+            children.append(np.clip(child + mutate * delta, 0, 1))
+    return np.array(children[:n])
+
+
+def pareto_search(
+    space: Ranges,
+    objectives: Objectives = DEFAULT_OBJECTIVES,
+    population: int = 16,
+    generations: int = 10,
+    base: SubspaceModelParams = DEFAULT_PARAMS,
+    seed: Optional[int] = None,
+    eta_crossover: float = 15,
+    eta_mutation: float = 20,
+    **run_kwargs,
+) -> tuple[DataFrame, DataFrame]:
+    """
+    Searches the Pareto front of `objectives` over the parameters of `space`.
+
+    Every generation is run as one batch of `population` parameter sets.
+
+    Returns:
+        tuple[DataFrame, DataFrame]: The Pareto front (one row per point with
+        its parameters and objective values), and the trajectories of the
+        front points, identified by the `point` column.
+    """
+    names = list(space)
+    lower = np.array([space[n][0] for n in names])
+    upper = np.array([space[n][1] for n in names])
+    sign = np.array([1.0 if s == "min" else -1.0 for _, s in objectives.values()])
+    metrics = {name: metric for name, (metric, _) in objectives.items()}
+    rng = np.random.default_rng(seed)
+
+    points: list[DataFrame] = []
+    trajectories: list[DataFrame] = []
+
+    def evaluate(U: np.ndarray, generation: int) -> DataFrame:
+        X = pd.DataFrame(lower + U * (upper - lower), columns=names)
+        offset = sum(len(p) for p in points)
+        param_sets = [
+            overlay_params({**row.to_dict(), "label": "pareto"}, base)
+            for _, row in X.iterrows()
+        ]
+        sim_df = run_param_sets(param_sets, **run_kwargs)
+        sim_df["point"] = sim_df["subset"] + offset
+        trajectories.append(sim_df)
+        values = cell_values(sim_df, metrics).reindex(range(len(X)))
+        evaluated = pd.concat([X, values], axis=1)
+        evaluated.index = pd.RangeIndex(offset, offset + len(X), name="point")
+        evaluated["generation"] = generation
+        points.append(evaluated)
+        return evaluated
+
+    U = rng.random((population, len(names)))
+    current = evaluate(U, 0)
+    for generation in range(1, generations + 1):
+        F = current[list(objectives)].to_numpy() * sign
+        rank, crowding = _rank(F)
+        children = evaluate(
+            _offspring(U, rank, crowding, rng, eta_crossover, eta_mutation), generation
+        )
+
+        # Elitist survival over parents and children
+        merged = pd.concat([current, children])
+        U_children = (children[names].to_numpy() - lower) / (upper - lower)
+        U_merged = np.vstack([U, U_children])
+        rank, crowding = _rank(merged[list(objectives)].to_numpy() * sign)
+        survivors = np.lexsort((-crowding, rank))[:population]
+        current, U = merged.iloc[survivors], U_merged[survivors]
+        logger.info(
+            f"Pareto search generation {generation}: "
+            f"{np.sum(rank == 0)} non-dominated points"
+        )
+
+    evaluated = pd.concat(points)
+    F = evaluated[list(objectives)].to_numpy() * sign
+    front = evaluated.iloc[non_dominated_sort(F)[0]].sort_index()
+    sim_df = pd.concat(trajectories, ignore_index=True)
+    return front, sim_df[sim_df["point"].isin(front.index)]
@@ -0,0 +1,77 @@
+"""
+Validation of the reduced-precision (float32) result policy.
+
+Large ensembles used only for distributional charts can be stored in
+single precision (see `store.reduce_precision`). The report below
+evaluates the key metrics on the full and on the reduced results, and
+checks that their relative error stays within a tolerance.
+"""
+import logging
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from subspace_model.experiments.metrics import run_values, window_volatility
+from subspace_model.store import FULL_PRECISION_COLUMNS, reduce_precision
+
+logger = logging.getLogger("subspace-digital-twin")
+
+# Largest relative rounding error of a float32 value
+FLOAT32_ROUNDING = float(np.finfo(np.float32).eps) / 2
+
+KEY_METRICS: dict[str, Callable] = {
+    "circulating_supply_final": lambda df: df["circulating_supply"].iloc[-1],
+    "circulating_supply_volatility": lambda df: window_volatility(
+        df["circulating_supply"].diff()
+    ).mean(),
+    "block_utilization_mean": lambda df: df["block_utilization"].mean(),
+    "operator_pool_shares_final": lambda df: df["operator_pool_shares"].iloc[-1],
+    "sum_of_stocks_final": lambda df: df["sum_of_stocks"].iloc[-1],
+}
+
+
+def precision_report(
+    sim_df: DataFrame,
+    metrics: dict[str, Callable] = KEY_METRICS,
+    keep: list[str] = FULL_PRECISION_COLUMNS,
+    tolerance: float = 1e-5,
+) -> DataFrame:
+    """
+    Compares every metric on the full and the float32 results, run by run.
+
+    Args:
+        sim_df (DataFrame): Full precision simulation data
+        metrics (dict): Trajectory metrics, evaluated on every run
+        keep (list[str]): Patterns of the columns kept in float64
+        tolerance (float): Largest acceptable relative error
+
+    Returns:
+        DataFrame: One row per metric with the largest absolute and
+        relative errors across runs, and whether the relative error is
+        within `tolerance`. Metrics on missing columns are skipped.
+    """
+    reduced = reduce_precision(sim_df, keep)
+    rows = {}
+    for name, metric in metrics.items():
+        try:
+            full = run_values(sim_df, metric)
+        except KeyError as e:
+            logger.debug(f"Skipping precision check of {name}: missing {e}")
+            continue
+        error = (run_values(reduced, metric) - full).abs()
+        scale = full.abs().where(full != 0)
+        relative = (error / scale).fillna(0)
+        rows[name] = {
+            "max_abs_error": error.max(),
+            "max_rel_error": relative.max(),
+            "within_tolerance": bool(relative.max() <= tolerance),
+        }
+    report = pd.DataFrame.from_dict(
+        rows,
+        orient="index",
+        columns=["max_abs_error", "max_rel_error", "within_tolerance"],
+    )
+    report.attrs["rounding"] = FLOAT32_ROUNDING
+    return report.rename_axis("metric")
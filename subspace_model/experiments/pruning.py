@@ -0,0 +1,180 @@
+"""
+Early pruning of infeasible sweep arms.
+
+Arms are run in segments of a few timesteps. At the end of every segment
+the feasibility constraints are checked on the state of every run, and
+the arms violating one of them are cancelled: only the feasible arms are
+continued from their last state. Arms whose runs raise, eg. the
+`p_storage_fees` ValueError on pledged space, are cancelled as well.
+"""
+import logging
+from typing import Callable
+
+import pandas as pd
+from cadCAD.configuration import Experiment  # type: ignore
+from cadCAD.configuration.utils import config_sim  # type: ignore
+from cadCAD.engine import ExecutionContext, ExecutionMode, Executor  # type: ignore
+from pandas import DataFrame
+
+from subspace_model.experiments.batch import ASSIGN_PARAMS
+from subspace_model.state import INITIAL_STATE
+from subspace_model.structure import SUBSPACE_MODEL_BLOCKS
+
+logger = logging.getLogger("subspace-digital-twin")
+
+# Reason -> whether a state is feasible
+Constraints = dict[str, Callable[[dict], bool]]
+
+DEFAULT_CONSTRAINTS: Constraints = {
+    "holders balance drained": lambda s: s["holders_balance"] >= 0,
+    "reward issuance exhausted": lambda s: s["reward_issuance_balance"] > 0,
+}
+
+
+def run_models(
+    models: list[tuple[dict, dict]],
+    timesteps: int,
+    blocks: list[dict] = SUBSPACE_MODEL_BLOCKS,
+) -> DataFrame:
+    """
+    Runs one sample of every (initial state, params) model for `timesteps`
+    timesteps in a single cadCAD execution.
+
+    Returns:
+        DataFrame: A dataframe of simulation data without substeps, where
+        `simulation` is the position of the model in `models`.
+    """
+    experiment = Experiment()
+    for state, params in models:
+        experiment.append_model(
+            initial_state=state,
+            partial_state_update_blocks=blocks,
+            sim_configs=config_sim(
+                {
+                    "N": 1,
+                    "T": range(timesteps),
+                    "M": {k: [v] for k, v in params.items()},
+                }
+            ),
+        )
+    context = ExecutionContext(
+        ExecutionMode().single_mode, additional_objs={"deepcopy_off": True}
+    )
+    executor = Executor(
+        exec_context=context, configs=experiment.configs, supress_print=True
+    )
+    records, _, _ = executor.execute()
+    df = pd.DataFrame(records)
+    keep = ((df.substep == 0) & (df.timestep == 0)) | (df.substep == df.substep.max())
+    return df.loc[keep].drop(columns=["substep"])
+
+
+def pruned_run(
+    param_sets: list[dict],
+    constraints: Constraints = DEFAULT_CONSTRAINTS,
+    check_every: int = 30,
+    SIMULATION_DAYS: int = 183,
+    TIMESTEP_IN_DAYS: int = 1,
+    SAMPLES: int = 1,
+    initial_state: dict = INITIAL_STATE,
+    blocks: list[dict] = SUBSPACE_MODEL_BLOCKS,
+    assign_params: set = ASSIGN_PARAMS,
+) -> tuple[DataFrame, DataFrame]:
+    """
+    Runs every parameter set as one arm, checking `constraints` every
+    `check_every` timesteps and cancelling the arms that violate them.
+
+    Returns:
+        tuple[DataFrame, DataFrame]: The simulation data, where `subset` is
+        the position of the arm in `param_sets` and pruned arms stop at the
+        check that cancelled them, and one row per pruned arm with the
+        timestep and the reason.
+    """
+    if check_every < 1:
+        raise ValueError(f"Checks must be at least 1 timestep apart, got {check_every}")
+    TIMESTEPS = int(SIMULATION_DAYS / TIMESTEP_IN_DAYS) + 1
+    state_keys = list(initial_state)
+
+    # (subset, run) -> last state
+    active = {
+        (subset, run): dict(initial_state)
+        for subset in range(len(param_sets))
+        for run in range(1, SAMPLES + 1)
+    }
+    frames: list[DataFrame] = []
+    pruned: dict[int, dict] = {}
+    done = 0
+
+    def prune(subset: int, timestep: int, reason: str) -> None:
+        pruned[subset] = {
+            "label": param_sets[subset].get("label"),
+            "timestep": timestep,
+            "reason": reason,
+        }
+        logger.info(f"Pruned arm {subset} at timestep {timestep}: {reason}")
+
+    while done < TIMESTEPS and len(active) > 0:
+        segment = min(check_every, TIMESTEPS - done)
+        keys = list(active)
+        models = [
+            (
+                active[(subset, run)],
+                {**param_sets[subset], "random_run": run, "timestep_offset": done},
+            )
+            for subset, run in keys
+        ]
+
+        try:
+            df = run_models(models, segment, blocks)
+            df["simulation"] = df["simulation"].map(dict(enumerate(keys)))
+        except Exception:
+            # Run every arm on its own to find the ones raising
+            parts = []
+            for subset in sorted({subset for subset, _ in keys}):
+                arm = [i for i, (s, _) in enumerate(keys) if s == subset]
+                try:
+                    part = run_models([models[i] for i in arm], segment, blocks)
+                except Exception as e:
+                    prune(subset, done, f"{type(e).__name__}: {e}")
+                    continue
+                part["simulation"] = part["simulation"].map(
+                    {j: keys[i] for j, i in enumerate(arm)}
+                )
+                parts.append(part)
+            df = pd.concat(parts) if parts else pd.DataFrame(columns=["simulation"])
+
+        if len(df) > 0:
+            df["subset"] = [key[0] for key in df["simulation"]]
+            df["run"] = [key[1] for key in df["simulation"]]
+            df["timestep"] += done
+            if done > 0:
+                # The first row repeats the last state of the previous segment
+                df = df[df["timestep"] > done]
+            frames.append(df)
+        done += segment
+
+        groups = df.groupby(["subset", "run"]) if len(df) > 0 else []
+        active = {}
+        for (subset, run), g in groups:
+            if subset in pruned:
+                continue
+            state = g.iloc[-1][state_keys].to_dict()
+            violated = [reason for reason, ok in constraints.items() if not ok(state)]
+            if len(violated) > 0:
+                prune(subset, int(g["timestep"].iloc[-1]), "; ".join(violated))
+            else:
+                active[(subset, run)] = state
+        active = {k: v for k, v in active.items() if k[0] not in pruned}
+
+    sim_df = pd.concat(frames, ignore_index=True)
+    sim_df["simulation"] = 0
+    for key in assign_params:
+        values = {i: p[key] for i, p in enumerate(param_sets) if key in p}
+        if len(values) > 0:
+            sim_df[key] = sim_df["subset"].map(values)
+    sim_df = sim_df.sort_values(["subset", "run", "timestep"], ignore_index=True)
+
+    report = pd.DataFrame.from_dict(
+        pruned, orient="index", columns=["label", "timestep", "reason"]
+    ).rename_axis("subset")
+    return sim_df, report.sort_index()
@@ -0,0 +1,173 @@
+"""
+Rare-event estimation for slashing tail risks.
+
+Slashing is driven by a Poisson count of slashes per day. Tail outcomes
+such as large staking pool losses are rare under the nominal rate, so the
+runs are instead made under a tilted (higher) rate and reweighted by the
+likelihood ratio of the slash counts they drew, as recorded in the
+`slash_count` state variable. The tilt can be tuned with the
+cross-entropy method.
+"""
+import logging
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from subspace_model.experiments.batch import run_param_sets
+from subspace_model.experiments.logic import POISSON_GENERATOR
+from subspace_model.experiments.metrics import run_values
+from subspace_model.params import DEFAULT_PARAMS, ENVIRONMENTAL_SCENARIOS
+
+logger = logging.getLogger("subspace-digital-twin")
+
+STOCHASTIC_PARAMS = {**DEFAULT_PARAMS, **ENVIRONMENTAL_SCENARIOS["stochastic"]}
+
+
+def staking_pool_loss(sim_df: DataFrame) -> float:
+    """Largest relative drop of the staking pool balance from its peak."""
+    balance = sim_df.sort_values("timestep")["staking_pool_balance"]
+    peak = balance.cummax()
+    return float(((peak - balance) / peak.where(peak > 0)).fillna(0).max())
+
+
+def operator_share_collapse(sim_df: DataFrame) -> float:
+    """Largest relative drop of the operator pool shares from their peak."""
+    shares = sim_df.sort_values("timestep")["operator_pool_shares"]
+    peak = shares.cummax()
+    return float(((peak - shares) / peak.where(peak > 0)).fillna(0).max())
+
+
+def slash_log_likelihood_ratio(
+    sim_df: DataFrame, mu: float, tilted_mu: float
+) -> pd.Series:
+    """
+    Log of the likelihood ratio between the nominal and the tilted Poisson
+    slash rates of every run, from the recorded slash counts.
+
+    Returns:
+        pd.Series: Log-weights indexed by (subset, run)
+    """
+    counts = sim_df[sim_df["timestep"] > 0].groupby(["subset", "run"])["slash_count"]
+    total = counts.sum()
+    draws = counts.count()
+    return total * np.log(mu / tilted_mu) - draws * (mu - tilted_mu)
+
+
+def weighted_quantile(values: np.ndarray, weights: np.ndarray, q: float) -> float:
+    """Quantile of the weighted empirical distribution of `values`."""
+    order = np.argsort(values)
+    cdf = np.cumsum(weights[order]) / np.sum(weights)
+    return float(values[order][min(np.searchsorted(cdf, q), len(values) - 1)])
+
+
+def tilted_run(
+    tilted_mu: float,
+    params: dict = STOCHASTIC_PARAMS,
+    SAMPLES: int = 100,
+    **run_kwargs,
+) -> DataFrame:
+    """Runs `params` with the slash rate replaced by `tilted_mu`."""
+    tilted = {
+        **params,
+        "slash_per_day_function": POISSON_GENERATOR(
+            tilted_mu, name="slash_per_day_function"
+        ),
+        "label": f"{params.get('label', 'standard')}-tilted",
+    }
+    return run_param_sets([tilted], SAMPLES=SAMPLES, **run_kwargs)
+
+
+def cross_entropy_tilt(
+    metric: Callable,
+    threshold: float,
+    mu: float = 0.1,
+    params: dict = STOCHASTIC_PARAMS,
+    rounds: int = 3,
+    elite_fraction: float = 0.1,
+    SAMPLES: int = 50,
+    **run_kwargs,
+) -> float:
+    """
+    Tunes the tilted slash rate with the cross-entropy method. Every round
+    sets the rate to the weighted mean slash count of the runs reaching the
+    intermediate level, the `1 - elite_fraction` quantile of the metric
+    capped at `threshold`.
+    """
+    tilted_mu = mu
+    for iteration in range(rounds):
+        sim_df = tilted_run(tilted_mu, params, SAMPLES, **run_kwargs)
+        values = run_values(sim_df, metric)
+        weights = np.exp(slash_log_likelihood_ratio(sim_df, mu, tilted_mu))
+        level = min(threshold, np.quantile(values, 1 - elite_fraction))
+        elite = values.index[values >= level]
+
+        counts = sim_df[sim_df["timestep"] > 0].groupby(["subset", "run"])[
+            "slash_count"
+        ]
+        w = weights[elite]
+        tilted_mu = float(
+            (w * counts.sum()[elite]).sum() / (w * counts.count()[elite]).sum()
+        )
+        logger.info(
+            f"Cross-entropy round {iteration}: level {level:.4g}, rate {tilted_mu:.4g}"
+        )
+        if level >= threshold:
+            break
+    return max(tilted_mu, mu)
+
+
+def tail_estimate(
+    metrics: dict[str, Callable],
+    thresholds: dict[str, float],
+    mu: float = 0.1,
+    tilted_mu: Optional[float] = None,
+    params: dict = STOCHASTIC_PARAMS,
+    quantiles: tuple = (0.99, 0.999),
+    SAMPLES: int = 200,
+    **run_kwargs,
+) -> DataFrame:
+    """
+    Estimates the probability that each metric exceeds its threshold, and
+    its upper quantiles, by importance sampling under a tilted slash rate.
+
+    Args:
+        metrics (dict): Trajectory metrics, eg. `staking_pool_loss`
+        thresholds (dict): Tail threshold of every metric
+        mu (float): Nominal slash rate, the mean of `slash_per_day_function`
+        tilted_mu (float): Slash rate the runs are made under. Tuned by the
+            cross-entropy method on the first metric when not given.
+        quantiles (tuple): Upper quantiles to estimate
+        **run_kwargs: Forwarded to `run_param_sets`
+
+    Returns:
+        DataFrame: One row per metric with the tail probability, its
+        standard error, the effective sample size and the quantiles.
+    """
+    if tilted_mu is None:
+        name = next(iter(metrics))
+        tilted_mu = cross_entropy_tilt(
+            metrics[name], thresholds[name], mu, params, **run_kwargs
+        )
+    sim_df = tilted_run(tilted_mu, params, SAMPLES, **run_kwargs)
+    weights = np.exp(slash_log_likelihood_ratio(sim_df, mu, tilted_mu))
+
+    rows = {}
+    for name, metric in metrics.items():
+        values = run_values(sim_df, metric)
+        w = weights[values.index].to_numpy()
+        v = values.to_numpy(dtype=float)
+        hits = w * (v >= thresholds[name])
+        n = len(v)
+        row = {
+            "tilted_mu": tilted_mu,
+            "samples": n,
+            "probability": hits.mean(),
+            "std_error": hits.std(ddof=1) / np.sqrt(n) if n > 1 else np.nan,
+            "effective_samples": w.sum() ** 2 / (w**2).sum(),
+        }
+        for q in quantiles:
+            row[f"quantile_{q:g}"] = weighted_quantile(v, w, q)
+        rows[name] = row
+    return pd.DataFrame.from_dict(rows, orient="index").rename_axis("metric")
@@ -0,0 +1,278 @@
+"""
+Global sensitivity analysis over model parameters.
+
+Parameters are declared as ranges, eg.
+`{"issuance_function_constant": (0.1, 10), "fund_tax_on_storage_fees": (0, 0.2)}`.
+Designs are either Saltelli designs, from which first-order and total
+Sobol indices are estimated, or Morris trajectories, from which the
+statistics of the elementary effects are computed.
+"""
+import logging
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from scipy.stats import qmc  # type: ignore
+
+from subspace_model.experiments.batch import evaluate_param_sets, overlay_params
+from subspace_model.params import DEFAULT_PARAMS
+from subspace_model.types import SubspaceModelParams
+
+logger = logging.getLogger("subspace-digital-twin")
+
+Ranges = dict[str, tuple[float, float]]
+
+
+def plan_budget(
+    ranges: Ranges,
+    max_runs: int,
+    method: str = "sobol",
+    samples: int = 1,
+    seconds_per_run: Optional[float] = None,
+) -> dict:
+    """
+    Sizes a design so that it fits in `max_runs` simulation runs.
+
+    Saltelli designs cost `N * (d + 2)` evaluations for `N` base samples
+    (a power of two) and Morris designs cost `r * (d + 1)` evaluations for
+    `r` trajectories, each evaluation being `samples` runs.
+    """
+    d = len(ranges)
+    if method == "sobol":
+        per_base = (d + 2) * samples
+        if max_runs < 2 * per_base:
+            raise ValueError(f"A Sobol design needs at least {2 * per_base} runs")
+        base_samples = 2 ** int(np.floor(np.log2(max_runs // per_base)))
+        runs = base_samples * per_base
+    elif method == "morris":
+        per_base = (d + 1) * samples
+        if max_runs < 2 * per_base:
+            raise ValueError(f"A Morris design needs at least {2 * per_base} runs")
+        base_samples = max_runs // per_base
+        runs = base_samples * per_base
+    else:
+        raise ValueError(f"Unknown method {method}. Try one of: ['sobol', 'morris']")
+
+    plan = {"method": method, "base_samples": base_samples, "runs": runs}
+    if seconds_per_run is not None:
+        plan["estimated_seconds"] = runs * seconds_per_run
+    return plan
+
+
+def saltelli_design(
+    ranges: Ranges, base_samples: int, seed: Optional[int] = None
+) -> DataFrame:
+    """
+    Generates the A, B and AB_i matrices of a Saltelli design from a
+    scrambled Sobol sequence, scaled to the parameter ranges.
+    """
+    names = list(ranges)
+    d = len(names)
+    M = qmc.Sobol(d=2 * d, scramble=True, seed=seed).random(base_samples)
+    A, B = M[:, :d], M[:, d:]
+
+    blocks = [("A", A), ("B", B)]
+    for i, name in enumerate(names):
+        AB = A.copy()
+        AB[:, i] = B[:, i]
+        blocks.append((name, AB))
+
+    lower = [ranges[n][0] for n in names]
+    upper = [ranges[n][1] for n in names]
+    frames = []
+    for block, matrix in blocks:
+        df = pd.DataFrame(qmc.scale(matrix, lower, upper), columns=names)
+        df.insert(0, "sample", range(base_samples))
+        df.insert(0, "block", block)
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def sobol_indices(
+    design: DataFrame,
+    values: pd.Series,
+    bootstrap: int = 500,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+) -> DataFrame:
+    """
+    Estimates first-order (Saltelli 2010) and total (Jansen) Sobol indices,
+    with bootstrap confidence intervals.
+    """
+    names = [c for c in design.columns if c not in ("block", "sample")]
+    f = {
+        block: values[g.sort_values("sample").index].to_numpy(dtype=float)
+        for block, g in design.groupby("block")
+    }
+    fA, fB = f["A"], f["B"]
+
+    def estimate(idx: np.ndarray) -> np.ndarray:
+        a, b = fA[idx], fB[idx]
+        variance = np.var(np.concatenate([a, b]))
+        out = []
+        for name in names:
+            ab = f[name][idx]
+            out.append(np.mean(b * (ab - a)) / variance)
+            out.append(0.5 * np.mean((a - ab) ** 2) / variance)
+        return np.array(out)
+
+    N = len(fA)
+    point = estimate(np.arange(N))
+    rng = np.random.default_rng(seed)
+    draws = np.array([estimate(rng.integers(0, N, N)) for _ in range(bootstrap)])
+    alpha = (1 - confidence) / 2
+    low, high = np.nanquantile(draws, [alpha, 1 - alpha], axis=0)
+
+    return pd.DataFrame(
+        {
+            "S1": point[0::2],
+            "S1_low": low[0::2],
+            "S1_high": high[0::2],
+            "ST": point[1::2],
+            "ST_low": low[1::2],
+            "ST_high": high[1::2],
+        },
+        index=pd.Index(names, name="parameter"),
+    )
+
+
+def morris_design(
+    ranges: Ranges, trajectories: int, levels: int = 4, seed: Optional[int] = None
+) -> DataFrame:
+    """
+    Generates Morris one-at-a-time trajectories on a `levels` grid.
+    Each trajectory has `d + 1` points, the `changed` column naming the
+    parameter moved at every step.
+    """
+    names = list(ranges)
+    d = len(names)
+    delta = levels / (2 * (levels - 1))
+    grid = np.arange(levels) / (levels - 1)
+    rng = np.random.default_rng(seed)
+
+    rows = []
+    for trajectory in range(trajectories):
+        x = rng.choice(grid, size=d)
+        rows.append((trajectory, 0, None, x.copy()))
+        for step, i in enumerate(rng.permutation(d), start=1):
+            x[i] = x[i] + delta if x[i] + delta <= 1 else x[i] - delta
+            rows.append((trajectory, step, names[i], x.copy()))
+
+    lower = np.array([ranges[n][0] for n in names])
+    upper = np.array([ranges[n][1] for n in names])
+    points = np.array([r[3] for r in rows])
+    df = pd.DataFrame(lower + points * (upper - lower), columns=names)
+    df.insert(0, "changed", [r[2] for r in rows])
+    df.insert(0, "step", [r[1] for r in rows])
+    df.insert(0, "trajectory", [r[0] for r in rows])
+    return df
+
+
+def elementary_effects(
+    design: DataFrame,
+    values: pd.Series,
+    bootstrap: int = 500,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+    ranges: Optional[Ranges] = None,
+) -> DataFrame:
+    """
+    Computes the mean, mean absolute (mu*) and standard deviation of the
+    elementary effects of every parameter, with a bootstrap confidence
+    interval on mu*. Effects are per unit of the normalized range, taken
+    from `ranges` or else from the extent of the design.
+    """
+    names = [c for c in design.columns if c not in ("trajectory", "step", "changed")]
+    if ranges is None:
+        ranges = {n: (design[n].min(), design[n].max()) for n in names}
+    span = {n: (ranges[n][1] - ranges[n][0]) or 1.0 for n in names}
+    effects: dict[str, list[float]] = {n: [] for n in names}
+    for _, g in design.assign(value=values).groupby("trajectory"):
+        g = g.sort_values("step")
+        steps = zip(g.iloc[:-1].iterrows(), g.iloc[1:].iterrows())
+        for (_, prev), (_, curr) in steps:
+            name = curr["changed"]
+            dx = (curr[name] - prev[name]) / span[name]
+            effects[name].append((curr["value"] - prev["value"]) / dx)
+
+    rng = np.random.default_rng(seed)
+    alpha = (1 - confidence) / 2
+    rows = {}
+    for name, ee in effects.items():
+        ee = np.array(ee)
+        draws = [
+            np.mean(np.abs(rng.choice(ee, size=len(ee)))) for _ in range(bootstrap)
+        ]
+        low, high = np.quantile(draws, [alpha, 1 - alpha])
+        rows[name] = {
+            "mu": ee.mean(),
+            "mu_star": np.abs(ee).mean(),
+            "mu_star_low": low,
+            "mu_star_high": high,
+            "sigma": ee.std(ddof=1) if len(ee) > 1 else np.nan,
+        }
+    return pd.DataFrame.from_dict(rows, orient="index").rename_axis("parameter")
+
+
+def run_sensitivity(
+    ranges: Ranges,
+    metrics: dict[str, Callable],
+    max_runs: int = 1024,
+    method: str = "sobol",
+    base: SubspaceModelParams = DEFAULT_PARAMS,
+    SIMULATION_DAYS: int = 183,
+    TIMESTEP_IN_DAYS: int = 1,
+    SAMPLES: int = 1,
+    chunk_size: int = 256,
+    bootstrap: int = 500,
+    seed: Optional[int] = None,
+    **run_kwargs,
+) -> tuple[DataFrame, DataFrame]:
+    """
+    Plans, executes and analyses a sensitivity design.
+
+    The design points are overlaid onto `base` and executed in batches of
+    `chunk_size` parameter sets. Extra keyword arguments are forwarded to
+    `evaluate_param_sets`.
+
+    Returns:
+        tuple[DataFrame, DataFrame]: The indices (one row per metric and
+        parameter), and the design with the metric values of every point.
+    """
+    plan = plan_budget(ranges, max_runs, method, SAMPLES)
+    logger.info(f"Sensitivity plan: {plan}")
+    if method == "sobol":
+        design = saltelli_design(ranges, plan["base_samples"], seed)
+    else:
+        design = morris_design(ranges, plan["base_samples"], seed=seed)
+
+    values = []
+    for start in range(0, len(design), chunk_size):
+        chunk = design.iloc[start : start + chunk_size]
+        param_sets = [
+            overlay_params({**row[list(ranges)].to_dict(), "label": method}, base)
+            for _, row in chunk.iterrows()
+        ]
+        chunk_values = evaluate_param_sets(
+            param_sets,
+            metrics,
+            SIMULATION_DAYS=SIMULATION_DAYS,
+            TIMESTEP_IN_DAYS=TIMESTEP_IN_DAYS,
+            SAMPLES=SAMPLES,
+            **run_kwargs,
+        )
+        chunk_values.index = chunk.index
+        values.append(chunk_values)
+        logger.info(f"Sensitivity: {start + len(chunk)}/{len(design)} points done")
+    values = pd.concat(values)
+
+    indices = {}
+    for name in metrics:
+        if method == "sobol":
+            indices[name] = sobol_indices(design, values[name], bootstrap, seed=seed)
+        else:
+            indices[name] = elementary_effects(
+                design, values[name], bootstrap, seed=seed, ranges=ranges
+            )
+    return pd.concat(indices, names=["metric"]), pd.concat([design, values], axis=1)
@@ -0,0 +1,139 @@
+"""
+Sequential Monte Carlo sampling.
+
+Instead of running a fixed number of samples, runs are added in batches
+until the confidence interval of a trajectory metric is tight enough on
+every subset, or until a maximum number of samples is reached.
+"""
+import inspect
+import logging
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from scipy.stats import t as student_t  # type: ignore
+
+from subspace_model.experiments.metrics import run_values, total_supply_mean
+
+logger = logging.getLogger("subspace-digital-twin")
+
+
+def confidence_intervals(values: pd.Series, confidence: float = 0.95) -> DataFrame:
+    """
+    Computes the sample mean and the Student-t confidence interval half-width
+    of per-run metric values for every subset.
+
+    Args:
+        values (pd.Series): Metric values indexed by (subset, run)
+        confidence (float): Confidence level of the interval
+
+    Returns:
+        DataFrame: One row per subset with the sample statistics
+    """
+    grouped = values.groupby(level="subset")
+    stats = pd.DataFrame(
+        {
+            "samples": grouped.count(),
+            "mean": grouped.mean(),
+            "std": grouped.std(ddof=1),
+        }
+    )
+    quantile = student_t.ppf((1 + confidence) / 2, df=(stats["samples"] - 1).clip(1))
+    stats["half_width"] = quantile * stats["std"] / np.sqrt(stats["samples"])
+
+    # A zero-width interval is converged regardless of the mean
+    stats["relative_half_width"] = (
+        stats["half_width"] / stats["mean"].abs().replace(0, np.nan)
+    ).where(stats["half_width"] != 0, 0.0)
+    return stats
+
+
+def _accepts_run_offset(experiment_run: Callable) -> bool:
+    """Whether `experiment_run` takes the `RUN_OFFSET` of `run_param_sets`."""
+    parameters = inspect.signature(experiment_run).parameters.values()
+    return any(p.name == "RUN_OFFSET" or p.kind == p.VAR_KEYWORD for p in parameters)
+
+
+def sequential_run(
+    experiment_run: Callable[..., DataFrame],
+    metric: Callable = total_supply_mean,
+    target: float = 0.01,
+    relative: bool = True,
+    confidence: float = 0.95,
+    batch_size: int = 5,
+    max_samples: int = 100,
+    **experiment_kwargs,
+) -> tuple[DataFrame, DataFrame]:
+    """
+    Runs an experiment in batches of samples until the confidence interval
+    half-width of `metric` is below `target` for every subset.
+
+    The runs of every batch are numbered after the runs of the previous
+    batches. When `experiment_run` accepts a `RUN_OFFSET` (see
+    `run_param_sets`), it is set to that number, so that seeded param sets
+    draw new random numbers in every batch. Otherwise, a batch drawing the
+    same samples as the first one raises a ValueError.
+
+    Args:
+        experiment_run: An experiment function accepting `SAMPLES`
+        metric: A trajectory metric, evaluated on each run separately
+        target (float): Maximum allowed half-width of the confidence interval
+        relative (bool): Whether `target` is relative to the absolute mean
+        confidence (float): Confidence level of the interval
+        batch_size (int): Number of samples added per batch
+        max_samples (int): Cap on the total number of samples
+        **experiment_kwargs: Forwarded to `experiment_run`
+
+    Returns:
+        tuple[DataFrame, DataFrame]: The simulation data of all batches with
+        unique run numbers, and the convergence diagnostics per subset.
+    """
+    if batch_size < 2:
+        raise ValueError("batch_size must be at least 2 to estimate a variance")
+
+    frames: list[DataFrame] = []
+    values: list[pd.Series] = []
+    samples = 0
+    batches = 0
+    offsets = _accepts_run_offset(experiment_run)
+    while True:
+        batch_samples = min(batch_size, max_samples - samples)
+        offset = {"RUN_OFFSET": samples} if offsets else {}
+        batch_df = experiment_run(SAMPLES=batch_samples, **offset, **experiment_kwargs)
+        batch_values = run_values(batch_df, metric)
+        if batches > 0 and not offsets:
+            first = values[0].reindex(batch_values.index)
+            if np.array_equal(first.to_numpy(), batch_values.to_numpy()):
+                raise ValueError(
+                    "The batches draw the same samples, seeded experiments "
+                    "need to accept a RUN_OFFSET to be run sequentially"
+                )
+
+        # Keep run numbers unique across batches
+        batch_df["run"] = batch_df["run"] + samples
+        frames.append(batch_df)
+        values.append(batch_values.rename(lambda run: run + samples, level="run"))
+        samples += batch_samples
+        batches += 1
+
+        diagnostics = confidence_intervals(pd.concat(values), confidence)
+        width_column = "relative_half_width" if relative else "half_width"
+        diagnostics["converged"] = diagnostics[width_column] <= target
+        logger.info(
+            f"Sequential run: {samples} samples, max {width_column} "
+            f"{diagnostics[width_column].max():.4g} (target {target:.4g})"
+        )
+        if diagnostics["converged"].all() or samples >= max_samples:
+            break
+
+    if not diagnostics["converged"].all():
+        logger.warning(
+            f"Sequential run stopped at max_samples={max_samples} before "
+            f"converging on subsets {list(diagnostics.index[~diagnostics['converged']])}"
+        )
+
+    diagnostics["batches"] = batches
+    diagnostics["target"] = target
+    diagnostics["confidence"] = confidence
+    return pd.concat(frames, ignore_index=True), diagnostics
@@ -0,0 +1,336 @@
+"""
+Declarative experiment specs.
+
+An experiment spec is a TOML (or YAML) file describing the base params,
+the sweep, the horizon and samples of the runs and their outputs:
+
+    name = "issuance_sweep"
+
+    [run]
+    days = 183
+    timestep_in_days = 1
+    samples = 1
+
+    [base]
+    environmental_label = "stochastic"
+
+    [[sweep]]
+    values = [
+        {label = "a"},
+        {label = "b", issuance_function = "@MOCK_ISSUANCE_FUNCTION"},
+    ]
+
+    [[sweep]]
+    grid = {issuance_function_constant = {linspace = [0.1, 10, 5]}}
+
+    [outputs]
+    assign_params = ["issuance_function_constant"]
+    charts = ["ab_block_utilization"]
+
+The `sweep` factors are multiplied, the first one varying slowest. A
+factor is either explicit `values`, a `grid` of axes or a `zip` of axes
+moving together. Strings starting with `@` refer to the objects of
+`subspace_model.const`, `subspace_model.experiments.logic` and
+`subspace_model.params`, eg. `@ENVIRONMENTAL_SCENARIOS.stochastic`.
+
+`compile_spec` turns a spec into an `ExperimentPlan`: a lazy sweep of
+parameter sets plus the settings to run it with, identified by the hash
+of the spec.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field, replace
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import yaml
+from pandas import DataFrame
+
+try:
+    import tomllib
+except ImportError:
+    import tomli as tomllib
+
+import subspace_model.const as const
+import subspace_model.experiments.logic as logic
+import subspace_model.params as params
+from subspace_model.experiments.batch import ASSIGN_PARAMS
+from subspace_model.experiments.sweep import (
+    CHUNK_SIZE,
+    Concat,
+    Grid,
+    Product,
+    Sweep,
+    Values,
+    Zip,
+    stream_sweep,
+)
+from subspace_model.params import DEFAULT_PARAMS
+from subspace_model.store import BackgroundWriter
+
+logger = logging.getLogger("subspace-digital-twin")
+
+SPECS_DIRECTORY = os.path.join(os.path.dirname(__file__), "specs")
+
+REFERENCE_MODULES = (params, logic, const)
+
+# Filled in before hashing, so that the defaults do not change the hash
+RUN_DEFAULTS = {"days": 183, "timestep_in_days": 1, "samples": 1}
+
+# Chunks the sweeps are split in when their results are written as they run
+STREAM_CHUNKS = 8
+
+
+@dataclass
+class ExperimentPlan:
+    name: str
+    sweep: Sweep
+    SIMULATION_DAYS: float = 183
+    TIMESTEP_IN_DAYS: int = 1
+    SAMPLES: int = 1
+    chunk_size: Optional[int] = None
+    assign_params: set = field(default_factory=lambda: set(ASSIGN_PARAMS))
+    charts: list[str] = field(default_factory=list)
+    trajectory_metrics: list[str] = field(default_factory=list)
+    spec_hash: str = ""
+    # Sweep cell of every cell of `sweep`, when it is a shard
+    cells: Optional[range] = None
+
+    def shard(self, index: int, count: int) -> "ExperimentPlan":
+        """The plan of the `index`-th of `count` shards of the sweep."""
+        cells = range(len(self.sweep))[index::count]
+        return replace(self, sweep=self.sweep.shard(index, count), cells=cells)
+
+    def run(
+        self, writer: Optional[BackgroundWriter] = None, **run_kwargs
+    ) -> DataFrame:
+        """
+        Runs the sweep of the plan, handing the results to `writer` chunk
+        by chunk when given.
+
+        Returns:
+            DataFrame: A dataframe of simulation data, where `subset` is the
+            cell of the full sweep.
+        """
+        return run_plans([self], [writer], **run_kwargs)[0]
+
+
+def run_plans(
+    plans: list[ExperimentPlan],
+    writers: Optional[list[Optional[BackgroundWriter]]] = None,
+    **run_kwargs,
+) -> list[DataFrame]:
+    """
+    Runs several plans at once. The sweeps of the plans sharing the same
+    run settings are concatenated and run in a single execution, whose
+    results are split back per plan. The duration of an execution is
+    shared between its plans by their number of cells.
+
+    With `writers`, one per plan, the results of every chunk of cells are
+    handed to the writer of their plan as soon as they are simulated, and
+    the sweeps without a chunk size are split in `STREAM_CHUNKS` chunks, or
+    in chunks of `CHUNK_SIZE` cells when these are smaller, so that writing
+    overlaps with the simulation.
+
+    Returns:
+        list[DataFrame]: The simulation data of every plan, as `plan.run`
+    """
+    groups: dict[tuple, list[int]] = {}
+    for i, plan in enumerate(plans):
+        key = (
+            plan.SIMULATION_DAYS,
+            plan.TIMESTEP_IN_DAYS,
+            plan.SAMPLES,
+            plan.chunk_size,
+        )
+        groups.setdefault(key, []).append(i)
+
+    parts: list[list[DataFrame]] = [[] for _ in plans]
+    for (days, timestep_in_days, samples, chunk_size), group in groups.items():
+        names = ", ".join(f"{plans[i].name} ({plans[i].spec_hash})" for i in group)
+        sweep = Concat(*[plans[i].sweep for i in group])
+        logger.info(f"Running {names}: {len(sweep)} cells")
+        assign_params = set().union(*[plans[i].assign_params for i in group])
+        streaming = writers is not None and any(writers[i] for i in group)
+        if streaming and chunk_size is None:
+            chunk_size = min(-(-len(sweep) // STREAM_CHUNKS), CHUNK_SIZE)
+        chunks = stream_sweep(
+            sweep,
+            chunk_size=chunk_size,
+            SIMULATION_DAYS=days,
+            TIMESTEP_IN_DAYS=timestep_in_days,
+            SAMPLES=samples,
+            assign_params=assign_params,
+            **run_kwargs,
+        )
+
+        started = time.perf_counter()
+        for sim_df in chunks:
+            duration = time.perf_counter() - started
+            cells = sim_df["subset"].nunique()
+            start = 0
+            for i in group:
+                plan = plans[i]
+                end = start + len(plan.sweep)
+                part = sim_df[(sim_df["subset"] >= start) & (sim_df["subset"] < end)]
+                if len(part) > 0:
+                    part = part.drop(
+                        columns=[
+                            c for c in assign_params - plan.assign_params if c in part
+                        ]
+                    ).reset_index(drop=True)
+                    part["subset"] -= start
+                    if plan.cells is not None:
+                        part["subset"] = part["subset"].map(dict(enumerate(plan.cells)))
+                    part.attrs["spec_hash"] = plan.spec_hash
+                    part.attrs["assign_params"] = sorted(plan.assign_params)
+                    part.attrs["duration"] = (
+                        duration * part["subset"].nunique() / max(cells, 1)
+                    )
+                    if writers is not None and writers[i] is not None:
+                        writers[i].put(part)
+                    parts[i].append(part)
+                start = end
+            started = time.perf_counter()
+
+    results = []
+    for plan, frames in zip(plans, parts):
+        sim_df = pd.concat(frames, ignore_index=True) if frames else DataFrame()
+        sim_df.attrs["spec_hash"] = plan.spec_hash
+        sim_df.attrs["assign_params"] = sorted(plan.assign_params)
+        sim_df.attrs["duration"] = sum(f.attrs["duration"] for f in frames)
+        results.append(sim_df)
+    return results
+
+
+def bundled_specs() -> list[str]:
+    """Names of the specs in the `specs` directory."""
+    return sorted(
+        name.removesuffix(".toml")
+        for name in os.listdir(SPECS_DIRECTORY)
+        if name.endswith(".toml")
+    )
+
+
+def load_spec(spec: str) -> dict:
+    """
+    Loads a spec from a TOML or YAML file, or by name from the bundled
+    `specs` directory.
+    """
+    path = spec
+    if not os.path.exists(path):
+        path = os.path.join(SPECS_DIRECTORY, f"{spec}.toml")
+    if path.endswith((".yaml", ".yml")):
+        with open(path) as f:
+            return yaml.safe_load(f)
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def spec_hash(spec: dict) -> str:
+    """A short hash identifying a spec, independent of its key order."""
+    canonical = json.dumps(spec, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:12]
+
+
+def resolve(value: object) -> object:
+    """Replaces `@` references by the objects they refer to."""
+    if isinstance(value, str) and value.startswith("@"):
+        name, *path = value[1:].split(".")
+        module = next((m for m in REFERENCE_MODULES if hasattr(m, name)), None)
+        if module is None:
+            raise KeyError(f"Unknown reference {value}")
+        obj = getattr(module, name)
+        for key in path:
+            obj = obj[key] if isinstance(obj, dict) else getattr(obj, key)
+        return obj
+    elif isinstance(value, dict):
+        return {k: resolve(v) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [resolve(v) for v in value]
+    return value
+
+
+def _axis(values: object) -> list:
+    """The values of a sweep axis, which may be a `linspace`."""
+    if isinstance(values, dict) and "linspace" in values:
+        start, stop, num = resolve(values["linspace"])
+        return list(np.linspace(start, stop, int(num)))
+    values = resolve(values)
+    return list(values.values()) if isinstance(values, dict) else list(values)
+
+
+def _factor(factor: dict) -> Sweep:
+    if "values" in factor:
+        return Values(_axis(factor["values"]))
+    elif "grid" in factor:
+        return Grid({k: _axis(v) for k, v in factor["grid"].items()})
+    elif "zip" in factor:
+        return Zip(*[Grid({k: _axis(v)}) for k, v in factor["zip"].items()])
+    raise ValueError(f"Sweep factors need values, grid or zip, got {list(factor)}")
+
+
+def compile_spec(
+    spec: dict | str,
+    SIMULATION_DAYS: Optional[float] = None,
+    TIMESTEP_IN_DAYS: Optional[int] = None,
+    SAMPLES: Optional[int] = None,
+) -> ExperimentPlan:
+    """
+    Compiles a spec, or the name or path of one, into an execution plan.
+    The run settings of the spec can be overridden.
+
+    Returns:
+        ExperimentPlan: The lazy sweep of parameter sets and run settings
+    """
+    if isinstance(spec, str):
+        spec = load_spec(spec)
+    run = {**RUN_DEFAULTS, **spec.get("run", {})}
+    overrides = {
+        "days": SIMULATION_DAYS,
+        "timestep_in_days": TIMESTEP_IN_DAYS,
+        "samples": SAMPLES,
+    }
+    run.update({k: v for k, v in overrides.items() if v is not None})
+    spec = {**spec, "run": run}
+
+    factors = [_factor(factor) for factor in spec.get("sweep", [])]
+    sweep = Product(*factors) if len(factors) > 0 else Values([{}])
+    base = resolve(spec.get("base", {}))
+    sweep = sweep.map(lambda cell: {**base, **cell}).params(DEFAULT_PARAMS)
+
+    outputs = spec.get("outputs", {})
+    return ExperimentPlan(
+        name=spec["name"],
+        sweep=sweep,
+        SIMULATION_DAYS=run["days"],
+        TIMESTEP_IN_DAYS=run["timestep_in_days"],
+        SAMPLES=run["samples"],
+        chunk_size=run.get("chunk_size"),
+        assign_params=ASSIGN_PARAMS | set(outputs.get("assign_params", [])),
+        charts=outputs.get("charts", []),
+        trajectory_metrics=outputs.get("trajectory_metrics", []),
+        spec_hash=spec_hash(spec),
+    )
+
+
+def run_spec(
+    spec: dict | str,
+    SIMULATION_DAYS: Optional[float] = None,
+    TIMESTEP_IN_DAYS: Optional[int] = None,
+    SAMPLES: Optional[int] = None,
+    **run_kwargs,
+) -> DataFrame:
+    """
+    Compiles and runs a spec. The keyword arguments are forwarded to
+    `run_param_sets`, eg. `RUN_OFFSET`.
+
+    Returns:
+        DataFrame: A dataframe of simulation data
+    """
+    plan = compile_spec(spec, SIMULATION_DAYS, TIMESTEP_IN_DAYS, SAMPLES)
+    return plan.run(**run_kwargs)
@@ -0,0 +1,213 @@
+"""
+Surrogate models trained on sweep results.
+
+A Gaussian process maps sweep parameters to a trajectory metric so that
+parameter values that were not simulated can be queried instantly, with
+an uncertainty estimate and a flag for extrapolation outside of the
+sampled region.
+"""
+import logging
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from scipy.linalg import cho_factor, cho_solve, solve_triangular  # type: ignore
+from scipy.optimize import minimize  # type: ignore
+
+from subspace_model.experiments.metrics import run_values
+
+logger = logging.getLogger("subspace-digital-twin")
+
+
+def sweep_value(values: list, subset: int) -> object:
+    """
+    Value taken by a swept parameter on a given subset. Shorter lists are
+    padded with their last element, as cadCAD does.
+    """
+    return values[subset] if subset < len(values) else values[-1]
+
+
+def sweep_dataset(
+    sim_df: DataFrame,
+    inputs: list[str],
+    metric: Callable,
+    sweep_params: Optional[dict[str, list]] = None,
+) -> tuple[DataFrame, pd.Series]:
+    """
+    Builds a training set from simulation results: one row per subset, with
+    the swept inputs and the metric averaged over the runs of the subset.
+
+    Inputs are read from `sweep_params` when given, and otherwise from the
+    (assigned) parameter columns of `sim_df`.
+    """
+    y = run_values(sim_df, metric).groupby(level="subset").mean()
+    if sweep_params is not None:
+        X = pd.DataFrame(
+            {k: [sweep_value(sweep_params[k], s) for s in y.index] for k in inputs},
+            index=y.index,
+        )
+    else:
+        X = sim_df.groupby("subset")[inputs].first().loc[y.index]
+    return X.astype(float), y.rename("y")
+
+
+class GaussianProcessSurrogate:
+    """
+    Gaussian process regression with an anisotropic squared exponential kernel.
+
+    Inputs are scaled to the unit box spanned by the training data and the
+    target is standardized. Kernel hyperparameters are fitted by maximizing
+    the marginal likelihood.
+    """
+
+    def __init__(
+        self,
+        noise: float = 1e-6,
+        restarts: int = 3,
+        extrapolation_margin: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.noise = noise
+        self.restarts = restarts
+        self.extrapolation_margin = extrapolation_margin
+        self.seed = seed
+        self.theta: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_results(
+        cls,
+        sim_df: DataFrame,
+        inputs: list[str],
+        metric: Callable,
+        sweep_params: Optional[dict[str, list]] = None,
+        **kwargs,
+    ) -> "GaussianProcessSurrogate":
+        """Fits a surrogate on the results of a sweep."""
+        X, y = sweep_dataset(sim_df, inputs, metric, sweep_params)
+        return cls(**kwargs).fit(X, y)
+
+    def fit(self, X: DataFrame, y) -> "GaussianProcessSurrogate":
+        """Fits the kernel hyperparameters and the posterior."""
+        self.inputs = list(X.columns)
+        self.X = np.asarray(X, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.lower = self.X.min(axis=0)
+        self.upper = self.X.max(axis=0)
+        self.theta = self._fit_hyperparameters()
+        self._factorize()
+        return self
+
+    def update(
+        self, X: DataFrame, y, refit: bool = True
+    ) -> "GaussianProcessSurrogate":
+        """
+        Adds new sweep cells. Without `refit` the current hyperparameters
+        are kept and only the posterior is recomputed.
+        """
+        X = pd.DataFrame(X)[self.inputs]
+        self.X = np.vstack([self.X, np.asarray(X, dtype=float)])
+        self.y = np.concatenate([self.y, np.asarray(y, dtype=float)])
+        self.lower = self.X.min(axis=0)
+        self.upper = self.X.max(axis=0)
+        if refit:
+            self.theta = self._fit_hyperparameters()
+        self._factorize()
+        return self
+
+    def predict(self, X) -> DataFrame:
+        """
+        Predicts the metric on new parameter points.
+
+        Returns:
+            DataFrame: `mean` and `std` of the prediction, and whether
+            the point lies outside of the sampled region (`extrapolation`).
+        """
+        if isinstance(X, dict):
+            X = pd.DataFrame([X])
+        X = pd.DataFrame(X)
+        Z = self._scale(np.asarray(X[self.inputs], dtype=float))
+        lengthscales, signal, _ = self._unpack(self.theta)
+        K_star = self._kernel(Z, self.Z, lengthscales, signal)
+        mean = K_star @ self.alpha
+        v = solve_triangular(self.L, K_star.T, lower=True)
+        var = np.clip(signal - np.sum(v**2, axis=0), 0, None)
+
+        margin = self.extrapolation_margin * (self.upper - self.lower)
+        raw = np.asarray(X[self.inputs], dtype=float)
+        outside = (raw < self.lower - margin) | (raw > self.upper + margin)
+        return pd.DataFrame(
+            {
+                "mean": self.y_mean + self.y_std * mean,
+                "std": self.y_std * np.sqrt(var),
+                "extrapolation": outside.any(axis=1),
+            },
+            index=X.index,
+        )
+
+    def _scale(self, X: np.ndarray) -> np.ndarray:
+        span = np.where(self.upper > self.lower, self.upper - self.lower, 1.0)
+        return (X - self.lower) / span
+
+    @staticmethod
+    def _kernel(A, B, lengthscales, signal) -> np.ndarray:
+        d = (A[:, None, :] - B[None, :, :]) / lengthscales
+        return signal * np.exp(-0.5 * np.sum(d**2, axis=-1))
+
+    def _unpack(self, theta):
+        d = self.X.shape[1]
+        return np.exp(theta[:d]), np.exp(theta[d]), np.exp(theta[d + 1])
+
+    def _standardize(self):
+        self.Z = self._scale(self.X)
+        self.y_mean = self.y.mean()
+        self.y_std = self.y.std() if self.y.std() > 0 else 1.0
+        return (self.y - self.y_mean) / self.y_std
+
+    def _negative_log_likelihood(self, theta, y) -> float:
+        lengthscales, signal, noise = self._unpack(theta)
+        K = self._kernel(self.Z, self.Z, lengthscales, signal)
+        K[np.diag_indices_from(K)] += noise + self.noise
+        try:
+            L, lower = cho_factor(K, lower=True)
+        except np.linalg.LinAlgError:
+            return 1e25
+        alpha = cho_solve((L, lower), y)
+        return 0.5 * y @ alpha + np.sum(np.log(np.diag(L)))
+
+    def _fit_hyperparameters(self) -> np.ndarray:
+        y = self._standardize()
+        d = self.X.shape[1]
+        bounds = [(np.log(1e-2), np.log(1e2))] * d + [
+            (np.log(1e-2), np.log(1e2)),
+            (np.log(1e-8), np.log(1.0)),
+        ]
+        rng = np.random.default_rng(self.seed)
+        starts = [
+            np.array([np.log(lengthscale)] * d + [0.0, np.log(1e-6)])
+            for lengthscale in (0.1, 0.3, 1.0)
+        ]
+        starts += [
+            np.array([rng.uniform(*b) for b in bounds]) for _ in range(self.restarts)
+        ]
+        best = None
+        for x0 in starts:
+            result = minimize(
+                self._negative_log_likelihood,
+                x0,
+                args=(y,),
+                method="L-BFGS-B",
+                bounds=bounds,
+            )
+            if best is None or result.fun < best.fun:
+                best = result
+        logger.debug(f"Surrogate hyperparameters: {np.exp(best.x)}")
+        return best.x
+
+    def _factorize(self) -> None:
+        y = self._standardize()
+        lengthscales, signal, noise = self._unpack(self.theta)
+        K = self._kernel(self.Z, self.Z, lengthscales, signal)
+        K[np.diag_indices_from(K)] += noise + self.noise
+        self.L = np.linalg.cholesky(K)
+        self.alpha = cho_solve((self.L, True), y)
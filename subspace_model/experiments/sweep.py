@@ -0,0 +1,219 @@
+"""
+Lazy sweep algebra.
+
+A sweep describes a sequence of parameter overlays without building it:
+every sweep knows its length and computes its i-th cell on demand. Sweeps
+are combined with `*` (cartesian product, the left sweep varying slowest),
+`+` (concatenation) and `Zip`, derived params are added with
+`.map`, and `.params` overlays every cell onto a base parameter set.
+Runners consume sweeps one chunk at a time, so the full grid never needs
+to be materialized.
+"""
+import logging
+from abc import ABC, abstractmethod
+from itertools import islice
+from math import prod
+from typing import Callable, Iterator, Optional, Sequence
+
+import pandas as pd
+from pandas import DataFrame
+
+from subspace_model.experiments.batch import overlay_params, run_param_sets
+from subspace_model.types import SubspaceModelParams
+
+logger = logging.getLogger("subspace-digital-twin")
+
+# Cells per execution when runners are not given a chunk size, so that the
+# simulation data of a large sweep is never built at once
+CHUNK_SIZE = 64
+
+
+class Sweep(ABC):
+    """A lazily evaluated sequence of parameter overlays."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def cell(self, i: int) -> dict:
+        """The overlay of the i-th cell, with `0 <= i < len(self)`."""
+
+    def __getitem__(self, i: int) -> dict:
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(f"Sweep cell {i} out of range for {n} cells")
+        return self.cell(i)
+
+    def __iter__(self) -> Iterator[dict]:
+        return (self.cell(i) for i in range(len(self)))
+
+    def __mul__(self, other: "Sweep") -> "Sweep":
+        return Product(self, other)
+
+    def __add__(self, other: "Sweep") -> "Sweep":
+        return Concat(self, other)
+
+    def map(self, function: Callable[[dict], dict]) -> "Sweep":
+        """Transforms every cell, eg. to derive params from swept ones."""
+        return Map(self, function)
+
+    def params(self, base: SubspaceModelParams) -> "Sweep":
+        """Overlays every cell onto `base`, see `batch.overlay_params`."""
+        return Map(self, lambda cell: overlay_params(cell, base))
+
+    def shard(self, index: int, count: int) -> "Select":
+        """Every `count`-th cell from `index` on, eg. the cells of one worker."""
+        return Select(self, range(index, len(self), count))
+
+    def chunks(self, size: int) -> Iterator[tuple[int, list[dict]]]:
+        """Yields the cells `size` at a time, with the index of the first one."""
+        cells = iter(self)
+        start = 0
+        while chunk := list(islice(cells, size)):
+            yield start, chunk
+            start += len(chunk)
+
+
+class Values(Sweep):
+    """Explicit cells, eg. environmental scenarios."""
+
+    def __init__(self, cells: Sequence[dict]):
+        self.cells = list(cells)
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def cell(self, i: int) -> dict:
+        return dict(self.cells[i])
+
+
+class Grid(Sweep):
+    """Cartesian product of param axes, the last axis varying fastest."""
+
+    def __init__(self, axes: dict[str, Sequence]):
+        self.axes = {k: list(v) for k, v in axes.items()}
+
+    def __len__(self) -> int:
+        return prod(len(v) for v in self.axes.values())
+
+    def cell(self, i: int) -> dict:
+        cell = {}
+        for key, values in reversed(self.axes.items()):
+            i, j = divmod(i, len(values))
+            cell[key] = values[j]
+        return dict(reversed(cell.items()))
+
+
+class Product(Sweep):
+    """Every combination of cells, merged from left to right."""
+
+    def __init__(self, *sweeps: Sweep):
+        self.sweeps = sweeps
+
+    def __len__(self) -> int:
+        return prod(len(s) for s in self.sweeps)
+
+    def cell(self, i: int) -> dict:
+        cells = []
+        for sweep in reversed(self.sweeps):
+            i, j = divmod(i, len(sweep))
+            cells.append(sweep.cell(j))
+        return {k: v for cell in reversed(cells) for k, v in cell.items()}
+
+
+class Zip(Sweep):
+    """Cells merged position by position. Single-cell sweeps are broadcast."""
+
+    def __init__(self, *sweeps: Sweep):
+        lengths = {len(s) for s in sweeps if len(s) != 1}
+        if len(lengths) > 1:
+            raise ValueError(f"Cannot zip sweeps of lengths {sorted(lengths)}")
+        self.sweeps = sweeps
+        self.length = lengths.pop() if lengths else 1
+
+    def __len__(self) -> int:
+        return self.length
+
+    def cell(self, i: int) -> dict:
+        return {
+            k: v
+            for sweep in self.sweeps
+            for k, v in sweep.cell(i if len(sweep) > 1 else 0).items()
+        }
+
+
+class Concat(Sweep):
+    """The cells of every sweep, one sweep after the other."""
+
+    def __init__(self, *sweeps: Sweep):
+        self.sweeps = sweeps
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self.sweeps)
+
+    def cell(self, i: int) -> dict:
+        for sweep in self.sweeps:
+            if i < len(sweep):
+                return sweep.cell(i)
+            i -= len(sweep)
+        raise IndexError(i)
+
+
+class Map(Sweep):
+    """Cells transformed by a function."""
+
+    def __init__(self, sweep: Sweep, function: Callable[[dict], dict]):
+        self.sweep = sweep
+        self.function = function
+
+    def __len__(self) -> int:
+        return len(self.sweep)
+
+    def cell(self, i: int) -> dict:
+        return self.function(self.sweep.cell(i))
+
+
+class Select(Sweep):
+    """The cells at `indices` of another sweep."""
+
+    def __init__(self, sweep: Sweep, indices: Sequence[int]):
+        self.sweep = sweep
+        self.indices = indices
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def cell(self, i: int) -> dict:
+        return self.sweep.cell(self.indices[i])
+
+
+def stream_sweep(
+    sweep: Sweep, chunk_size: Optional[int] = None, **run_kwargs
+) -> Iterator[DataFrame]:
+    """
+    Runs a sweep of full parameter sets chunk by chunk, `CHUNK_SIZE` cells
+    at a time by default, yielding the simulation data of every chunk with
+    `subset` set to the sweep cell.
+    """
+    total = len(sweep)
+    for start, chunk in sweep.chunks(chunk_size or CHUNK_SIZE):
+        sim_df = run_param_sets(chunk, **run_kwargs)
+        sim_df["subset"] += start
+        logger.info(f"Sweep: {start + len(chunk)}/{total} cells done")
+        yield sim_df
+
+
+def run_sweep(
+    sweep: Sweep, chunk_size: Optional[int] = None, **run_kwargs
+) -> DataFrame:
+    """
+    Runs a sweep of full parameter sets, `chunk_size` cells per execution
+    (`CHUNK_SIZE` by default).
+
+    Returns:
+        DataFrame: A dataframe of simulation data
+    """
+    return pd.concat(stream_sweep(sweep, chunk_size, **run_kwargs), ignore_index=True)
@@ -1,4 +1,4 @@
-from math import ceil, floor
+from math import ceil, floor, nan
 from random import randint
 from typing import Callable
 
@@ -526,6 +526,8 @@ def p_slash(
     slash_to_holders = 0.0
     operator_shares_to_subtract = 0.0
     slash_to_burn = 0.0
+    # Recorded for rare-event reweighting. NaN when no slash count is drawn.
+    slash_count = nan
 
     # XXX: no slash occurs if the pool balance is zero.
     pool_balance = state["staking_pool_balance"]
@@ -562,6 +564,7 @@ def p_slash(
         "holders_balance": slash_to_holders,
         "operator_pool_shares": operator_shares_to_subtract,
         "burnt_balance": slash_to_burn,
+        "slash_count": slash_count,
     }
 
 
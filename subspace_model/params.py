@@ -22,6 +22,7 @@ DEFAULT_PARAMS = SubspaceModelParams(
     environmental_label="standard",
     # Set system wide deterministic
     timestep_in_days=1,
+    random_seed=None,
     # Mechanisms TBD
     reference_subsidy_components=DEFAULT_REFERENCE_SUBSIDY_COMPONENTS,
     issuance_function=DEFAULT_ISSUANCE_FUNCTION,
@@ -70,39 +71,94 @@ DEFAULT_PARAMS = SubspaceModelParams(
     new_sectors_per_day_function=lambda p, s: 1000,
 )
 
-ENVIRONMENTAL_SCENARIOS = {
-    "stochastic": {
+
+def stochastic_scenario(
+    transaction_count_per_day_mu: float = 1 * BLOCKS_PER_DAY,
+    transaction_size_mu: float = 256,
+    transaction_size_sigma: float = 100,
+    new_sectors_per_day_mu: float = 1000,
+    new_sectors_per_day_sigma: float = 500,
+) -> dict:
+    """
+    Builds the stochastic environmental scenario. The arguments are the
+    distribution parameters that can be calibrated against observed data.
+    """
+    return {
         # Behavioral Parameters Between 0 and 1
-        "operator_stake_per_ts_function": MAGNITUDE(NORMAL_GENERATOR(0.01, 0.02)),
-        "nominator_stake_per_ts_function": MAGNITUDE(NORMAL_GENERATOR(0.01, 0.02)),
+        "operator_stake_per_ts_function": MAGNITUDE(
+            NORMAL_GENERATOR(0.01, 0.02, name="operator_stake_per_ts_function")
+        ),
+        "nominator_stake_per_ts_function": MAGNITUDE(
+            NORMAL_GENERATOR(0.01, 0.02, name="nominator_stake_per_ts_function")
+        ),
         "transfer_farmer_to_holder_per_day_function": MAGNITUDE(
-            NORMAL_GENERATOR(0.05, 0.05)
+            NORMAL_GENERATOR(
+                0.05, 0.05, name="transfer_farmer_to_holder_per_day_function"
+            )
         ),
         "transfer_operator_to_holder_per_day_function": MAGNITUDE(
-            NORMAL_GENERATOR(0.05, 0.05)
+            NORMAL_GENERATOR(
+                0.05, 0.05, name="transfer_operator_to_holder_per_day_function"
+            )
         ),
         "transfer_holder_to_nominator_per_day_function": MAGNITUDE(
-            NORMAL_GENERATOR(0.01, 0.02)
+            NORMAL_GENERATOR(
+                0.01, 0.02, name="transfer_holder_to_nominator_per_day_function"
+            )
         ),
         "transfer_holder_to_operator_per_day_function": MAGNITUDE(
-            NORMAL_GENERATOR(0.01, 0.02)
+            NORMAL_GENERATOR(
+                0.01, 0.02, name="transfer_holder_to_operator_per_day_function"
+            )
         ),
         # Environmental Parameters (Integer positive in [0,inf])
         "environmental_label": "stochastic",
-        "priority_fee_function": POSITIVE_INTEGER(NORMAL_GENERATOR(0, 0.001)),
+        "priority_fee_function": POSITIVE_INTEGER(
+            NORMAL_GENERATOR(0, 0.001, name="priority_fee_function")
+        ),
         "compute_weights_per_tx_function": POSITIVE_INTEGER(
-            NORMAL_GENERATOR(60_000_000, 15_000_000)
+            NORMAL_GENERATOR(
+                60_000_000, 15_000_000, name="compute_weights_per_tx_function"
+            )
         ),
         "compute_weight_per_bundle_function": POSITIVE_INTEGER(
-            NORMAL_GENERATOR(10_000_000_000, 5_000_000_000)
+            NORMAL_GENERATOR(
+                10_000_000_000,
+                5_000_000_000,
+                name="compute_weight_per_bundle_function",
+            )
         ),
-        "transaction_size_function": POSITIVE_INTEGER(NORMAL_GENERATOR(256, 100)),
-        "bundle_size_function": POSITIVE_INTEGER(NORMAL_GENERATOR(1500, 1000)),
-        "transaction_count_per_day_function": POISSON_GENERATOR(1 * BLOCKS_PER_DAY),
-        "bundle_count_per_day_function": POISSON_GENERATOR(6 * BLOCKS_PER_DAY),
-        "slash_per_day_function": POISSON_GENERATOR(0.1),
-        "new_sectors_per_day_function": POSITIVE_INTEGER(NORMAL_GENERATOR(1000, 500)),
-    },
+        "transaction_size_function": POSITIVE_INTEGER(
+            NORMAL_GENERATOR(
+                transaction_size_mu,
+                transaction_size_sigma,
+                name="transaction_size_function",
+            )
+        ),
+        "bundle_size_function": POSITIVE_INTEGER(
+            NORMAL_GENERATOR(1500, 1000, name="bundle_size_function")
+        ),
+        "transaction_count_per_day_function": POISSON_GENERATOR(
+            transaction_count_per_day_mu, name="transaction_count_per_day_function"
+        ),
+        "bundle_count_per_day_function": POISSON_GENERATOR(
+            6 * BLOCKS_PER_DAY, name="bundle_count_per_day_function"
+        ),
+        "slash_per_day_function": POISSON_GENERATOR(
+            0.1, name="slash_per_day_function"
+        ),
+        "new_sectors_per_day_function": POSITIVE_INTEGER(
+            NORMAL_GENERATOR(
+                new_sectors_per_day_mu,
+                new_sectors_per_day_sigma,
+                name="new_sectors_per_day_function",
+            )
+        ),
+    }
+
+
+ENVIRONMENTAL_SCENARIOS = {
+    "stochastic": stochastic_scenario(),
     "weekly-varying": {
         "environmental_label": "weekly-varying",
         "priority_fee_function": WEEKLY_VARYING,
@@ -6,14 +6,14 @@ from subspace_model.types import SubspaceModelState
 INITIAL_STATE = SubspaceModelState(
     days_passed=0,
     blocks_passed=0,
-    # Metrics
+    # Metrics, as computed from the initial stock balances below
     circulating_supply=0.0,
     user_supply=0.0,
     earned_supply=0.0,
-    issued_supply=0.0,
+    issued_supply=MAX_CREDIT_ISSUANCE - ISSUANCE_FOR_FARMERS,
     earned_minus_burned_supply=0.0,
-    total_supply=0.0,
-    sum_of_stocks=0.0,
+    total_supply=MAX_CREDIT_ISSUANCE - ISSUANCE_FOR_FARMERS,
+    sum_of_stocks=MAX_CREDIT_ISSUANCE,
     storage_fee_per_rewards=0.0,
     block_utilization=0.0,
     # Governance Variables
@@ -46,6 +46,7 @@ INITIAL_STATE = SubspaceModelState(
     average_compute_weight_per_bundle=0.0,
     average_bundle_size=0.0,
     bundle_count=0.0,
+    slash_count=0.0,
     compute_fee_multiplier=0.0,
     compute_fee_volume=0.0,
     free_space=0.0,
@@ -65,3 +66,4 @@ INITIAL_STATE = SubspaceModelState(
     targeted_adjustment_parameter=0.0,
     tx_compute_weight=0.0,
 )
+
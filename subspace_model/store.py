@@ -0,0 +1,957 @@
+"""
+Result store.
+
+Simulation results are written as Parquet datasets, one per result set,
+at `data/simulations/{experiment}-{timestamp}.parquet/`. Every dataset is
+hive-partitioned by `label` and `environmental_label`, compressed with
+zstd, and sorted by subset, run and timestep, so that every row group
+holds consecutive timesteps of a few runs. Runs are not partitioned on:
+one file per run makes reading a column across many runs bound by file
+overhead, while the row group statistics on `run` already let reads of a
+few runs skip the others.
+
+Columns that are constant within every run, eg. the assigned params, are
+stored once per run in a `_runs.parquet` table at the root of the
+dataset, and joined back on load only when they are read. Repeated
+values in the other columns are dictionary and run-length encoded by
+Parquet on disk, and can be loaded as categorical and sparse columns.
+
+Every dataset written is recorded in the catalog of its directory (see
+`subspace_model.catalog`), which the lookups of the latest results query.
+
+Results produced piecewise by concurrent writers, eg. shard jobs or pool
+workers, are appended to an append-only dataset instead (see
+`append_results`): every writer writes its own segment files, commits
+them by adding a numbered entry to the manifest of the dataset, and
+readers read the segments of the latest manifest entry, a consistent
+snapshot. `compact_segments` merges small segments into larger row groups
+without disturbing the readers. Results written while a sweep runs, by a
+`BackgroundWriter`, are written straight into the partitioned layout
+instead, chunk by chunk, and moved into place once the sweep is complete.
+
+Columns derived from the stored stocks by the supply definitions of
+`subspace_model.metrics`, eg. `circulating_supply`, are virtual: they are
+not stored, and are computed from the stocks when read (see
+`VIRTUAL_COLUMNS`). New definitions apply to results already stored.
+
+Sparse results keep the full state of every run only every K timesteps,
+in a `_checkpoints.parquet` table, and a few summary columns at every
+timestep (see `CHECKPOINT_EVERY`). The runs can be re-simulated from the
+checkpoints, see `subspace_model.experiments.checkpoints`.
+
+Under the `float32` precision policy, the float columns are stored in
+single precision, except for the conservation-critical stocks (see
+`FULL_PRECISION_COLUMNS`).
+"""
+import fnmatch
+import glob
+import json
+import logging
+import atexit
+import os
+import queue
+import shutil
+import threading
+import uuid
+from functools import lru_cache
+from typing import Callable, Iterable, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as fs
+import pyarrow.parquet as pq
+
+import subspace_model.metrics as metrics
+from subspace_model.catalog import latest_result, record_results
+from subspace_model.params import DEFAULT_PARAMS
+
+logger = logging.getLogger("subspace-digital-twin")
+
+SIMULATIONS_DIRECTORY = "data/simulations"
+
+PARTITION_COLUMNS = ["label", "environmental_label"]
+
+# Rows per row group, a few dozen runs of daily timesteps over a year
+ROW_GROUP_ROWS = 8192
+
+COMPRESSION = "zstd"
+
+SORT_COLUMNS = ["simulation", "subset", "run", "timestep"]
+
+KEY_COLUMNS = ["simulation", "subset", "run"]
+
+RUNS_FILE = "_runs.parquet"
+
+CHECKPOINTS_FILE = "_checkpoints.parquet"
+
+# Columns kept at every timestep by sparse results, besides the keys, the
+# labels and the run-constant columns
+SUMMARY_COLUMNS = [
+    "days_passed",
+    "circulating_supply",
+    "block_utilization",
+    "operator_pool_shares",
+    "nominator_pool_shares",
+]
+
+# Timesteps between the checkpoints of sparse results, see `use_checkpoints`.
+# Results are stored in full when None.
+CHECKPOINT_EVERY: Optional[int] = None
+
+LABEL_COLUMNS = ["label", "environmental_label"]
+
+MANIFEST_DIRECTORY = "_manifest"
+
+SEGMENTS_DIRECTORY = "segments"
+
+# Segments smaller than this many rows are merged by compaction, which
+# appends run in the background once there are enough of them
+COMPACT_MIN_ROWS = 8 * ROW_GROUP_ROWS
+COMPACT_MIN_SEGMENTS = 8
+
+# Frames a background writer holds before the producer waits for it
+WRITER_QUEUE_SIZE = 4
+
+# Share of a column equal to its most common value from which it is loaded
+# as a sparse column. Sparse values take an index besides the value, so
+# below a half the savings are small.
+SPARSE_MIN_SHARE = 0.5
+
+# Columns kept in float64 under the float32 policy, as the stocks must
+# still add up to the total supply
+FULL_PRECISION_COLUMNS = ["*_balance", "sum_of_stocks"]
+
+PRECISIONS = ["float64", "float32"]
+
+# Precision results are stored with, see `use_precision`
+PRECISION = "float64"
+
+# Columns computed on read from the stored columns. The functions take a
+# state, and are evaluated on the frame of the stored columns at once.
+VIRTUAL_COLUMNS: dict[str, Callable] = {
+    name: getattr(metrics, name)
+    for name in [
+        "circulating_supply",
+        "user_supply",
+        "earned_supply",
+        "issued_supply",
+        "earned_minus_burned_supply",
+        "total_supply",
+        "sum_of_stocks",
+    ]
+}
+
+# An Arrow expression, or (column, op, value) tuples combined with AND
+Filters = Union[ds.Expression, list[tuple]]
+
+
+def result_path(
+    experiment: str, timestamp: str, directory: str = SIMULATIONS_DIRECTORY
+) -> str:
+    return os.path.join(directory, f"{experiment}-{timestamp}.parquet")
+
+
+def use_precision(name: str) -> None:
+    """Sets the precision results are stored with, eg. from `--precision`."""
+    global PRECISION
+    if name not in PRECISIONS:
+        raise ValueError(f"Unknown precision {name}, try one of {PRECISIONS}")
+    PRECISION = name
+
+
+def use_checkpoints(every: Optional[int]) -> None:
+    """Stores results sparsely, with a checkpoint every `every` timesteps."""
+    global CHECKPOINT_EVERY
+    if every is not None and every < 1:
+        raise ValueError(f"Checkpoints must be at least 1 timestep apart, got {every}")
+    CHECKPOINT_EVERY = every
+
+
+def sparse_results(
+    sim_df: pd.DataFrame, every: int, summary: list[str] = SUMMARY_COLUMNS
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Splits results into their summary and their checkpoints.
+
+    Returns:
+        tuple: The key, label, run-constant and `summary` columns at every
+        timestep, and every column every `every` timesteps
+    """
+    keep = {*SORT_COLUMNS, *PARTITION_COLUMNS, *run_constant_columns(sim_df), *summary}
+    summary_df = sim_df[[c for c in sim_df.columns if c in keep]]
+    checkpoints = sim_df[sim_df["timestep"] % every == 0]
+    return summary_df, checkpoints
+
+
+def reduce_precision(
+    df: pd.DataFrame, keep: list[str] = FULL_PRECISION_COLUMNS
+) -> pd.DataFrame:
+    """
+    Converts the float64 columns to float32, except for the ones matching
+    the `keep` patterns.
+    """
+    columns = [
+        c
+        for c in df.columns
+        if df[c].dtype == "float64"
+        and not any(fnmatch.fnmatch(c, pattern) for pattern in keep)
+    ]
+    return df.astype({c: "float32" for c in columns})
+
+
+class _RecordingState(dict):
+    """A state recording the variables read from it, which are all 1."""
+
+    def __missing__(self, key: str) -> float:
+        self[key] = 1.0
+        return 1.0
+
+
+@lru_cache
+def _dependencies(function: Callable) -> tuple[str, ...]:
+    state = _RecordingState()
+    function(state)
+    return tuple(state)
+
+
+def virtual_dependencies(name: str) -> list[str]:
+    """The columns a virtual column is computed from."""
+    return list(_dependencies(VIRTUAL_COLUMNS[name]))
+
+
+def virtual_columns(columns: Iterable[str]) -> list[str]:
+    """The virtual columns among `columns` whose dependencies are in it."""
+    columns = list(columns)
+    return [
+        c
+        for c in columns
+        if c in VIRTUAL_COLUMNS and set(virtual_dependencies(c)) <= set(columns)
+    ]
+
+
+def _storable(df: pd.DataFrame) -> pd.DataFrame:
+    """Converts the object columns Parquet cannot store, eg. functions, to str."""
+    df = df.copy()
+    for column in df.columns[df.dtypes == object]:
+        values = df[column].dropna()
+        if not values.map(lambda v: isinstance(v, (str, bytes))).all():
+            df[column] = df[column].map(lambda v: v if v is None else str(v))
+    return df
+
+
+def _write_partitioned(
+    table: pa.Table,
+    path: str,
+    partitioning: list[str],
+    basename_template: str = "part-{i}.parquet",
+) -> None:
+    """Writes a table into the hive partitions of the dataset at `path`."""
+    ds.write_dataset(
+        table,
+        path,
+        format="parquet",
+        partitioning=partitioning,
+        partitioning_flavor="hive",
+        basename_template=basename_template,
+        file_options=ds.ParquetFileFormat().make_write_options(
+            compression=COMPRESSION
+        ),
+        max_rows_per_group=ROW_GROUP_ROWS,
+        min_rows_per_group=ROW_GROUP_ROWS,
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def _write_runs(runs: pd.DataFrame, columns: list[str], path: str) -> None:
+    """Writes the runs table, with the original column order in the metadata."""
+    table = pa.Table.from_pandas(runs, preserve_index=False)
+    metadata = {**table.schema.metadata, b"columns": json.dumps(columns)}
+    pq.write_table(
+        table.replace_schema_metadata(metadata),
+        os.path.join(path, RUNS_FILE),
+        compression=COMPRESSION,
+    )
+
+
+def write_results(
+    sim_df: pd.DataFrame,
+    experiment: str,
+    timestamp: str,
+    directory: str = SIMULATIONS_DIRECTORY,
+    precision: Optional[str] = None,
+    checkpoint_every: Optional[int] = None,
+) -> str:
+    """
+    Writes simulation results as a partitioned Parquet dataset, with
+    `precision`, or the precision set with `use_precision` when not given.
+    With `checkpoint_every`, or the interval set with `use_checkpoints`,
+    the results are stored sparsely: see `sparse_results`. Checkpoints are
+    always stored in full precision.
+
+    Returns:
+        str: The path of the dataset
+    """
+    path = result_path(experiment, timestamp, directory)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    params = param_columns(sim_df)
+    every = checkpoint_every or CHECKPOINT_EVERY
+    if every:
+        sim_df, checkpoints = sparse_results(sim_df, every)
+    partitioning = [c for c in PARTITION_COLUMNS if c in sim_df.columns]
+    order = [c for c in SORT_COLUMNS if c in sim_df.columns]
+    df = _storable(sim_df.sort_values(partitioning + order, ignore_index=True))
+    if (precision or PRECISION) == "float32":
+        df = reduce_precision(df)
+
+    # The column order, virtual columns included, is kept in the metadata
+    columns = list(df.columns)
+    df = df.drop(columns=virtual_columns(columns))
+    run_columns = run_constant_columns(df)
+    table = pa.Table.from_pandas(df.drop(columns=run_columns), preserve_index=False)
+    _write_partitioned(table, path, partitioning)
+
+    keys = [c for c in KEY_COLUMNS if c in df.columns]
+    runs = df[keys + run_columns].drop_duplicates(keys, ignore_index=True)
+    _write_runs(runs, columns, path)
+    if every:
+        checkpoints = _storable(checkpoints.sort_values(order, ignore_index=True))
+        table = pa.Table.from_pandas(checkpoints, preserve_index=False)
+        metadata = {**table.schema.metadata, b"every": str(every).encode()}
+        pq.write_table(
+            table.replace_schema_metadata(metadata),
+            os.path.join(path, CHECKPOINTS_FILE),
+            compression=COMPRESSION,
+        )
+    record_results(sim_df, experiment, timestamp, path, directory, params)
+    logger.info(f"Results saved to {path}.")
+    return path
+
+
+def param_columns(sim_df: pd.DataFrame) -> list[str]:
+    """
+    The columns of the assigned params, which identify the param set of
+    every subset in the catalog: the `assign_params` the backends record in
+    `sim_df.attrs`, or else the columns named after a model param.
+    """
+    assigned = sim_df.attrs.get("assign_params", DEFAULT_PARAMS)
+    return [c for c in sim_df.columns if c in assigned]
+
+
+def run_constant_columns(df: pd.DataFrame) -> list[str]:
+    """The columns holding a single value within every run."""
+    keys = [c for c in KEY_COLUMNS if c in df.columns]
+    skip = set(keys) | set(PARTITION_COLUMNS) | {"timestep"}
+    candidates = [c for c in df.columns if c not in skip]
+    if len(keys) == 0 or len(candidates) == 0 or len(df) == 0:
+        return []
+    counts = df.groupby(keys)[candidates].nunique(dropna=False).max()
+    return [c for c in candidates if counts[c] <= 1]
+
+
+def write_table(df: pd.DataFrame, path: str) -> str:
+    """Writes a small table, eg. metrics, as a single Parquet file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    _storable(df).to_parquet(path, compression=COMPRESSION)
+    logger.info(f"Results saved to {path}.")
+    return path
+
+
+def _open_dataset(path: str) -> Optional[ds.Dataset]:
+    """
+    The dataset of a result set: the committed segments of an append-only
+    dataset, or the partitioned files of a written one. None when no
+    segment is committed yet.
+    """
+    filesystem = fs.LocalFileSystem(use_mmap=True)
+    if is_append_only(path):
+        _, segments, _ = manifest_snapshot(path)
+        if len(segments) == 0:
+            return None
+        files = [os.path.join(path, SEGMENTS_DIRECTORY, name) for name in segments]
+        return ds.dataset(files, format="parquet", filesystem=filesystem)
+    return ds.dataset(
+        path, format="parquet", partitioning="hive", filesystem=filesystem
+    )
+
+
+def result_columns(path: str) -> list[str]:
+    """The columns of a result dataset, in their original order."""
+    dataset = _open_dataset(path)
+    if dataset is None:
+        return []
+    runs_path = os.path.join(path, RUNS_FILE)
+    if os.path.exists(runs_path):
+        metadata = pq.read_schema(runs_path).metadata or {}
+        if b"columns" in metadata:
+            return json.loads(metadata[b"columns"])
+    if b"columns" in (dataset.schema.metadata or {}):
+        return json.loads(dataset.schema.metadata[b"columns"])
+    pandas_metadata = dataset.schema.pandas_metadata or {}
+    original = [c["name"] for c in pandas_metadata.get("columns", [])]
+    names = dataset.schema.names
+    return [c for c in original if c in names] + [c for c in names if c not in original]
+
+
+def compact(df: pd.DataFrame, categorical: bool = True, sparse: bool = True):
+    """
+    Reduces the memory of loaded results: the label columns become
+    categorical, and the numeric columns mostly equal to a single value
+    become sparse columns filled with it.
+    """
+    if categorical:
+        for column in LABEL_COLUMNS:
+            if column in df.columns:
+                df[column] = df[column].astype("category")
+    if sparse and len(df) > 0:
+        skip = set(SORT_COLUMNS)
+        for column in df.columns:
+            dtype = df[column].dtype
+            if column in skip or not pd.api.types.is_numeric_dtype(dtype):
+                continue
+            if isinstance(dtype, pd.SparseDtype):
+                continue
+            counts = df[column].value_counts(dropna=False)
+            if len(counts) > 0 and counts.iloc[0] >= SPARSE_MIN_SHARE * len(df):
+                fill = counts.index[0]
+                df[column] = df[column].astype(pd.SparseDtype(dtype, fill))
+    return df
+
+
+def read_results(
+    path: str,
+    columns: Optional[list[str]] = None,
+    filters: Optional[Filters] = None,
+    categorical: bool = False,
+    sparse: bool = False,
+) -> pd.DataFrame:
+    """
+    Reads a result dataset back, with the partition and run columns
+    restored as regular columns in their original position and the rows
+    in simulation order. Append-only datasets are read at their latest
+    snapshot. Virtual columns are computed from the stored ones they
+    depend on, which are read for them.
+
+    Only the `columns` asked for are read, and the runs table is only
+    joined when some of its columns are. `filters` are pushed down to the
+    scan, skipping the partitions and row groups whose statistics exclude
+    them; they apply to the per-timestep and partition columns. The files
+    are memory-mapped and converted to pandas without copying where the
+    column types allow it.
+
+    Args:
+        path (str): The path of the dataset
+        columns (list[str]): Columns to read, all of them by default. Any
+            virtual column can be asked for, eg. a new supply definition.
+        filters: An Arrow expression, or `(column, op, value)` tuples
+            combined with AND, eg. `[("timestep", "<=", 90)]`
+        categorical (bool): Load the label columns as categoricals
+        sparse (bool): Load mostly constant columns as sparse columns
+    """
+    dataset = _open_dataset(path)
+    if dataset is None:
+        return pd.DataFrame()
+    runs_path = os.path.join(path, RUNS_FILE)
+    run_columns = []
+    if os.path.exists(runs_path):
+        run_columns = [
+            c for c in pq.read_schema(runs_path).names if c not in KEY_COLUMNS
+        ]
+    if isinstance(filters, list):
+        filters = pq.filters_to_expression(filters)
+
+    # Stored columns take precedence over virtual ones of the same name
+    original = result_columns(path)
+    stored = set(dataset.schema.names) | set(run_columns)
+    virtual = [
+        c for c in (columns or original) if c in VIRTUAL_COLUMNS and c not in stored
+    ]
+
+    requested = columns
+    scanned = None
+    if columns is not None:
+        dependencies = [d for c in virtual for d in virtual_dependencies(c)]
+        columns = [
+            c for c in dict.fromkeys([*columns, *dependencies]) if c not in virtual
+        ]
+        run_columns = [c for c in run_columns if c in columns]
+        # The sort keys are read to order the rows and join the runs table
+        keys = [c for c in SORT_COLUMNS if c in dataset.schema.names]
+        scanned = [c for c in dict.fromkeys([*columns, *keys]) if c not in run_columns]
+    table = dataset.to_table(columns=scanned, filter=filters)
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+
+    if len(run_columns) > 0:
+        keys = [c for c in KEY_COLUMNS if c in df.columns]
+        runs = pq.read_table(runs_path, columns=keys + run_columns).to_pandas()
+        df = df.merge(runs, on=keys, how="left")
+    for column in virtual:
+        df[column] = VIRTUAL_COLUMNS[column](df)
+
+    df = df[[c for c in original if c in df] + [c for c in df if c not in original]]
+    order = [c for c in SORT_COLUMNS if c in df]
+    if order:
+        df = df.sort_values(order, ignore_index=True)
+    if requested is not None:
+        df = df[[c for c in df if c in requested]]
+    return compact(df, categorical, sparse) if categorical or sparse else df
+
+
+def read_checkpoints(path: str, filters: Optional[Filters] = None) -> pd.DataFrame:
+    """
+    Reads the checkpoints of sparse results, with the interval between
+    them in `attrs["every"]`.
+    """
+    checkpoints_path = os.path.join(path, CHECKPOINTS_FILE)
+    if not os.path.exists(checkpoints_path):
+        raise FileNotFoundError(f"{path} has no checkpoints")
+    table = pq.read_table(checkpoints_path, filters=filters)
+    df = table.to_pandas()
+    df.attrs["every"] = int(table.schema.metadata[b"every"])
+    return df
+
+
+def latest_timestamp(
+    experiment: str,
+    directory: str = SIMULATIONS_DIRECTORY,
+    params_hash: Optional[str] = None,
+) -> Optional[str]:
+    """
+    The timestamp of the most recent results of an experiment, if any,
+    optionally among the ones with a subset of the given params hash (see
+    `catalog.param_set_hash`).
+    Results written before the catalog existed are found on disk.
+    """
+    record = latest_result(directory, experiment, params_hash)
+    if record is not None:
+        return record["timestamp"]
+    if params_hash is not None:
+        return None
+    paths = glob.glob(os.path.join(directory, f"{experiment}-*.parquet"))
+    timestamps = [
+        os.path.basename(p).removeprefix(f"{experiment}-").removesuffix(".parquet")
+        for p in paths
+    ]
+    return max(timestamps) if timestamps else None
+
+
+def load_results(
+    experiment: str,
+    columns: Optional[list[str]] = None,
+    filters: Optional[Filters] = None,
+    runs: Optional[Iterable[int]] = None,
+    exclude: Iterable[str] = (),
+    timestamp: Optional[str] = None,
+    directory: str = SIMULATIONS_DIRECTORY,
+    categorical: bool = False,
+    sparse: bool = False,
+) -> pd.DataFrame:
+    """
+    Loads the results of an experiment, the most recent ones unless
+    `timestamp` is set, reading only what is needed (see `read_results`).
+
+    Args:
+        experiment (str): The experiment name
+        columns (list[str]): Columns to read, all of them by default
+        filters: Row filters, see `read_results`
+        runs (Iterable[int]): Runs to read, all of them by default
+        exclude (Iterable[str]): Columns not to read
+        categorical, sparse (bool): See `compact`
+
+    Returns:
+        pd.DataFrame: The simulation data
+    """
+    timestamp = timestamp or latest_timestamp(experiment, directory)
+    if timestamp is None:
+        raise FileNotFoundError(f"No results found for experiment {experiment}")
+    path = result_path(experiment, timestamp, directory)
+
+    expression = None
+    if filters is not None:
+        expression = (
+            pq.filters_to_expression(filters) if isinstance(filters, list) else filters
+        )
+    if runs is not None:
+        in_runs = ds.field("run").isin(list(runs))
+        expression = in_runs if expression is None else expression & in_runs
+    if exclude:
+        names = columns or result_columns(path)
+        columns = [c for c in names if c not in set(exclude)]
+    return read_results(path, columns, expression, categorical, sparse)
+
+
+def is_append_only(path: str) -> bool:
+    return os.path.isdir(os.path.join(path, MANIFEST_DIRECTORY))
+
+
+def manifest_snapshot(
+    path: str, version: Optional[int] = None
+) -> tuple[int, dict[str, int], set[str]]:
+    """
+    Replays the manifest of an append-only dataset up to `version`, the
+    latest one by default.
+
+    Returns:
+        tuple: The version, the live segments with their row counts, and
+        the segments removed by compaction
+    """
+    directory = os.path.join(path, MANIFEST_DIRECTORY)
+    entries = sorted(
+        name
+        for name in os.listdir(directory)
+        if name.endswith(".json") and name.removesuffix(".json").isdigit()
+    )
+    current, segments, removed = -1, {}, set()
+    for name in entries:
+        entry_version = int(name.removesuffix(".json"))
+        if version is not None and entry_version > version:
+            break
+        with open(os.path.join(directory, name)) as f:
+            entry = json.load(f)
+        segments.update(entry["add"])
+        for segment in entry["remove"]:
+            segments.pop(segment, None)
+            removed.add(segment)
+        current = entry_version
+    return current, segments, removed
+
+
+class CommitConflict(Exception):
+    """A manifest entry removes segments that are no longer live."""
+
+
+def _commit(
+    path: str, add: dict[str, int], remove: Optional[list[str]] = None
+) -> int:
+    """
+    Adds an entry to the manifest, on top of the latest one. Entries are
+    written to a temporary file and hard-linked into place, which fails
+    if another writer committed that version first; the commit is then
+    retried on top of the new entry.
+
+    Returns:
+        int: The version committed
+    """
+    if remove is None:
+        remove = []
+    directory = os.path.join(path, MANIFEST_DIRECTORY)
+    temporary = os.path.join(directory, f".{uuid.uuid4().hex}.tmp")
+    with open(temporary, "w") as f:
+        json.dump({"add": add, "remove": remove}, f)
+    try:
+        while True:
+            version, segments, _ = manifest_snapshot(path)
+            if not set(remove) <= set(segments):
+                raise CommitConflict(f"Segments already removed from {path}")
+            try:
+                os.link(temporary, os.path.join(directory, f"{version + 1:08d}.json"))
+                return version + 1
+            except FileExistsError:
+                continue
+    finally:
+        os.remove(temporary)
+
+
+def _write_segment(table: pa.Table, path: str) -> str:
+    """Writes a segment under a temporary name, renamed once complete."""
+    name = f"{os.getpid()}-{uuid.uuid4().hex[:12]}.parquet"
+    directory = os.path.join(path, SEGMENTS_DIRECTORY)
+    temporary = os.path.join(directory, f".{name}.tmp")
+    pq.write_table(
+        table, temporary, row_group_size=ROW_GROUP_ROWS, compression=COMPRESSION
+    )
+    os.replace(temporary, os.path.join(directory, name))
+    return name
+
+
+def append_results(
+    sim_df: pd.DataFrame,
+    experiment: str,
+    timestamp: str,
+    directory: str = SIMULATIONS_DIRECTORY,
+    precision: Optional[str] = None,
+) -> str:
+    """
+    Appends simulation results to an append-only dataset, creating it if
+    needed. Any number of processes can append to the same dataset at
+    once: every call writes its own segment and commits it to the
+    manifest. Compaction is started in the background once enough small
+    segments piled up.
+
+    Returns:
+        str: The path of the dataset
+    """
+    path = result_path(experiment, timestamp, directory)
+    os.makedirs(os.path.join(path, MANIFEST_DIRECTORY), exist_ok=True)
+    os.makedirs(os.path.join(path, SEGMENTS_DIRECTORY), exist_ok=True)
+    order = [c for c in SORT_COLUMNS if c in sim_df.columns]
+    df = _storable(sim_df.sort_values(order, ignore_index=True))
+    if (precision or PRECISION) == "float32":
+        df = reduce_precision(df)
+
+    columns = list(df.columns)
+    table = pa.Table.from_pandas(
+        df.drop(columns=virtual_columns(columns)), preserve_index=False
+    )
+    metadata = {**table.schema.metadata, b"columns": json.dumps(columns)}
+    name = _write_segment(table.replace_schema_metadata(metadata), path)
+    version = _commit(path, {name: len(df)})
+    params = param_columns(sim_df)
+    record_results(sim_df, experiment, timestamp, path, directory, params, True)
+    logger.debug(f"Appended {len(df)} rows to {path} (version {version}).")
+
+    _, segments, _ = manifest_snapshot(path)
+    small = [s for s, rows in segments.items() if rows < COMPACT_MIN_ROWS]
+    if len(small) >= COMPACT_MIN_SEGMENTS:
+        compact_in_background(path)
+    return path
+
+
+def compact_segments(path: str, min_rows: int = COMPACT_MIN_ROWS) -> Optional[str]:
+    """
+    Merges the segments of an append-only dataset smaller than `min_rows`
+    into a single sorted segment, replacing them in a new manifest entry.
+    Readers of older snapshots still find the merged segments, which are
+    only deleted by `vacuum_segments`.
+
+    Returns:
+        str: The name of the merged segment, or None when there was
+        nothing to merge or another compaction merged the segments first
+    """
+    _, segments, _ = manifest_snapshot(path)
+    small = sorted(s for s, rows in segments.items() if rows < min_rows)
+    if len(small) < 2:
+        return None
+    files = [os.path.join(path, SEGMENTS_DIRECTORY, s) for s in small]
+    table = ds.dataset(files, format="parquet").to_table()
+    order = [c for c in SORT_COLUMNS if c in table.column_names]
+    table = table.sort_by([(c, "ascending") for c in order])
+    name = _write_segment(table, path)
+    try:
+        _commit(path, {name: table.num_rows}, small)
+    except CommitConflict:
+        os.remove(os.path.join(path, SEGMENTS_DIRECTORY, name))
+        return None
+    logger.debug(f"Compacted {len(small)} segments of {path} into {name}.")
+    return name
+
+
+# Compactions running in this process, by dataset
+_compactions: dict[str, threading.Thread] = {}
+
+
+def compact_in_background(path: str) -> threading.Thread:
+    """Runs `compact_segments` in a thread, one at a time per dataset."""
+    thread = _compactions.get(path)
+    if thread is None or not thread.is_alive():
+        thread = threading.Thread(target=compact_segments, args=(path,))
+        thread.start()
+        _compactions[path] = thread
+    return thread
+
+
+def vacuum_segments(path: str) -> list[str]:
+    """
+    Deletes the segments that compaction replaced. Readers holding an
+    older snapshot of the dataset must be done reading first.
+
+    Returns:
+        list[str]: The names of the segments deleted
+    """
+    _, _, removed = manifest_snapshot(path)
+    deleted = []
+    for name in sorted(removed):
+        segment = os.path.join(path, SEGMENTS_DIRECTORY, name)
+        if os.path.exists(segment):
+            os.remove(segment)
+            deleted.append(name)
+    return deleted
+
+
+class BackgroundWriter:
+    """
+    Writes the frames of a result set from a writer thread, so that their
+    serialization, compression and writing overlap with the simulation
+    producing the next ones. Frames go through a bounded queue: `put`
+    blocks while the writer is `max_pending` frames behind.
+
+    Every frame is written into the label partitions of the layout of
+    `write_results`, in a `.partial` directory next to the dataset. Its
+    assigned params go to the runs table, which is kept in memory with a
+    row per run for the catalog. Closing the writer, eg. leaving its
+    `with` block, waits for every frame to be written, then writes the
+    runs table, moves the dataset into place and records it in the
+    catalog; the exit of the interpreter closes the writers left open.
+    Aborting the writer, eg. leaving its `with` block on an exception,
+    deletes the partial dataset instead.
+    """
+
+    def __init__(
+        self,
+        experiment: str,
+        timestamp: str,
+        directory: str = SIMULATIONS_DIRECTORY,
+        precision: Optional[str] = None,
+        max_pending: int = WRITER_QUEUE_SIZE,
+    ):
+        self.path = result_path(experiment, timestamp, directory)
+        self.partial = f"{self.path}.partial"
+        self.args = (experiment, timestamp, directory, precision)
+        self.queue: queue.Queue = queue.Queue(max_pending)
+        self.error: Optional[BaseException] = None
+        self.closed = False
+        # Attributes of the frames, recorded in the catalog
+        self.attrs: dict = {"duration": 0.0}
+        # Written by the writer thread only
+        self.frames = 0
+        self.rows = 0
+        self.columns: Optional[list[str]] = None
+        self.schema: Optional[pa.Schema] = None
+        self.runs: list[pd.DataFrame] = []
+        self.last_rows: list[pd.DataFrame] = []
+        if os.path.exists(self.partial):
+            shutil.rmtree(self.partial)
+        # A daemon thread, as non-daemon threads are joined before atexit
+        # hooks could tell the writer to stop
+        self.thread = threading.Thread(target=self._write, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def _write(self) -> None:
+        while True:
+            df = self.queue.get()
+            if df is None:
+                return
+            if self.error is None:
+                try:
+                    self._write_frame(df)
+                except BaseException as e:
+                    self.error = e
+
+    def _write_frame(self, sim_df: pd.DataFrame) -> None:
+        partitioning = [c for c in PARTITION_COLUMNS if c in sim_df.columns]
+        order = [c for c in SORT_COLUMNS if c in sim_df.columns]
+        keys = [c for c in KEY_COLUMNS if c in sim_df.columns]
+        df = _storable(sim_df.sort_values(partitioning + order, ignore_index=True))
+        if (self.args[3] or PRECISION) == "float32":
+            df = reduce_precision(df)
+        columns = list(df.columns)
+        if self.columns is None:
+            self.columns = columns
+        elif columns != self.columns:
+            raise ValueError(f"Frames written to {self.path} differ in columns")
+        df = df.drop(columns=virtual_columns(columns))
+
+        # Unlike other outputs, assigned params are constant within every run
+        # of every frame, so that all frames store the same columns
+        params = param_columns(sim_df)
+        run_columns = [
+            c for c in params if c in df.columns and c not in partitioning + keys
+        ]
+        table = pa.Table.from_pandas(
+            df.drop(columns=run_columns), preserve_index=False
+        )
+        if self.schema is None:
+            self.schema = table.schema
+        else:
+            table = table.cast(self.schema)
+        _write_partitioned(
+            table, self.partial, partitioning, f"part-{self.frames}-{{i}}.parquet"
+        )
+        self.runs.append(df[keys + run_columns].drop_duplicates(keys))
+
+        # The last row of every run holds what the catalog records of it
+        summary = [*keys, "timestep", "days_passed", "random_seed", *params]
+        last = sim_df.sort_values(order).groupby(keys).tail(1)
+        self.last_rows.append(last[[c for c in dict.fromkeys(summary) if c in last]])
+        self.frames += 1
+        self.rows += len(sim_df)
+
+    def _finish(self) -> None:
+        experiment, timestamp, directory, _ = self.args
+        runs = pd.concat(self.runs, ignore_index=True)
+        _write_runs(runs, self.columns or [], self.partial)
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+        os.replace(self.partial, self.path)
+
+        summary = pd.concat(self.last_rows, ignore_index=True)
+        summary.attrs.update(self.attrs)
+        params = param_columns(summary)
+        record_results(
+            summary, experiment, timestamp, self.path, directory, params, rows=self.rows
+        )
+        logger.info(f"Results saved to {self.path}.")
+
+    def _raise(self) -> None:
+        if self.error is not None:
+            raise RuntimeError(f"Writing {self.path} failed") from self.error
+
+    def put(self, df: pd.DataFrame) -> None:
+        """Queues a frame, waiting while the queue is full."""
+        self._raise()
+        if self.closed:
+            raise ValueError(f"The writer of {self.path} is closed")
+        self.attrs.update({k: v for k, v in df.attrs.items() if k != "duration"})
+        self.attrs["duration"] += df.attrs.get("duration", 0.0)
+        self.queue.put(df)
+
+    def _stop(self) -> bool:
+        """Waits for the writer thread, returning whether it was running."""
+        if self.closed:
+            return False
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+        atexit.unregister(self.close)
+        return True
+
+    def close(self) -> None:
+        """
+        Waits for the queued frames to be written, then moves the dataset
+        into place and records it in the catalog.
+        """
+        if self._stop():
+            if self.error is not None:
+                shutil.rmtree(self.partial, ignore_errors=True)
+            elif self.frames > 0:
+                self._finish()
+        self._raise()
+
+    def abort(self) -> None:
+        """Stops writing and deletes the partial dataset."""
+        if self._stop() and os.path.exists(self.partial):
+            shutil.rmtree(self.partial)
+            logger.warning(f"Partial results deleted from {self.partial}.")
+
+    def __enter__(self) -> "BackgroundWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def migrate_pickles(
+    directory: str = SIMULATIONS_DIRECTORY, remove: bool = False
+) -> list[str]:
+    """
+    Converts the `{experiment}-{timestamp}.pkl.gz` results in `directory`
+    into Parquet datasets, optionally removing the pickles.
+
+    Returns:
+        list[str]: The paths of the datasets written
+    """
+    paths = []
+    for pickle_path in sorted(glob.glob(os.path.join(directory, "*.pkl.gz"))):
+        name = os.path.basename(pickle_path).removesuffix(".pkl.gz")
+        experiment, _, timestamp = name.partition("-")
+        sim_df = pd.read_pickle(pickle_path)
+        paths.append(write_results(sim_df, experiment, timestamp, directory))
+        if remove:
+            os.remove(pickle_path)
+        logger.info(f"Migrated {pickle_path}.")
+    return paths
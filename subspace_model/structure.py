@@ -142,6 +142,7 @@ _SUBSPACE_MODEL_BLOCKS: list[dict] = [
             "holders_balance": add_suf,
             "operator_pool_shares": add_suf,
             "burnt_balance": add_suf,
+            "slash_count": replace_suf,
         },
     },
     {
@@ -182,7 +183,7 @@ _SUBSPACE_MODEL_BLOCKS: list[dict] = [
                 user_supply(state),
             ),
             "earned_supply": lambda _1, _2, _3, state, _5: (
-                "user_supply",
+                "earned_supply",
                 earned_supply(state),
             ),
             "issued_supply": lambda _1, _2, _3, state, _5: (
@@ -190,7 +191,7 @@ _SUBSPACE_MODEL_BLOCKS: list[dict] = [
                 issued_supply(state),
             ),
             "earned_minus_burned_supply": lambda _1, _2, _3, state, _5: (
-                "user_supply",
+                "earned_minus_burned_supply",
                 earned_minus_burned_supply(state),
             ),
             "total_supply": lambda _1, _2, _3, state, _5: (
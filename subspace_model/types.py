@@ -89,6 +89,7 @@ class SubspaceModelState(TypedDict):
     average_compute_weight_per_bundle: ComputeWeights
     average_bundle_size: Bytes
     bundle_count: int
+    slash_count: float
 
     # Metrics
     compute_fee_volume: Credits
@@ -107,6 +108,9 @@ class SubspaceModelParams(TypedDict):
     label: str
     timestep_in_days: Days
 
+    # Seed of the stochastic generators, unseeded when None
+    random_seed: Optional[int]
+
     # Mechanisms to be determined
     issuance_function: Callable
     slash_function: Callable[[SubspaceModelState], Credits]
@@ -0,0 +1,46 @@
+import shutil
+
+from subspace_model.catalog import find_results, latest_result, param_set_hash
+from subspace_model.store import latest_timestamp, write_results
+from test.test_store import PARAM_SETS, toy_results
+
+
+def test_record_results(tmp_path):
+    sim_df = toy_results()
+    sim_df.attrs['duration'] = 1.5
+    write_results(sim_df, 'toy', '2024-01-01_00-00-00', str(tmp_path))
+    write_results(sim_df, 'toy', '2023-01-01_00-00-00', str(tmp_path))
+    write_results(sim_df, 'other', '2025-01-01_00-00-00', str(tmp_path))
+
+    results = find_results(str(tmp_path), experiment='toy')
+    assert list(results['timestamp']) == ['2024-01-01_00-00-00', '2023-01-01_00-00-00']
+    record = results.iloc[0]
+    assert record['samples'] == 2
+    assert record['subsets'] == 2
+    assert record['timesteps'] == 10
+    assert record['rows'] == len(sim_df)
+    assert record['duration'] == 1.5
+    assert len(find_results(str(tmp_path), label='b')) == 3
+
+    # Rewriting a result set replaces its record
+    write_results(sim_df, 'toy', '2024-01-01_00-00-00', str(tmp_path))
+    assert len(find_results(str(tmp_path), experiment='toy')) == 2
+
+
+def test_latest_timestamp(tmp_path):
+    sim_df = toy_results()
+    # Outputs constant within a run are not params
+    write_results(sim_df.assign(peak=1.0), 'toy', '2023-01-01_00-00-00', str(tmp_path))
+    newest = write_results(
+        sim_df.assign(rate=3.0), 'toy', '2024-01-01_00-00-00', str(tmp_path)
+    )
+    assert latest_timestamp('toy', str(tmp_path)) == '2024-01-01_00-00-00'
+
+    # Lookup by the assigned params of a param set
+    assign_params = {'label', 'environmental_label', 'rate', 'f'}
+    hashed = param_set_hash(PARAM_SETS[0], assign_params)
+    assert latest_timestamp('toy', str(tmp_path), hashed) == '2023-01-01_00-00-00'
+
+    # Results removed from disk are skipped
+    shutil.rmtree(newest)
+    assert latest_result(str(tmp_path), 'toy')['timestamp'] == '2023-01-01_00-00-00'
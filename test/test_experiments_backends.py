@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from subspace_model.experiments import backends
+from subspace_model.experiments.backends import (
+    _from_shared_memory,
+    _to_shared_memory,
+    run_local,
+    run_process_pool,
+    run_single,
+    select_backend,
+)
+from test.test_experiments_batch import TOY_BLOCKS, TOY_STATE, toy_blocks
+
+PARAM_SETS = [{'label': str(rate), 'rate': rate} for rate in [1.0, 2.0, 3.0]]
+ARGS = (PARAM_SETS, 4, 2, TOY_STATE, TOY_BLOCKS, {'label', 'rate'})
+
+
+def test_backends_schema():
+    expected = run_single(*ARGS)
+    pd.testing.assert_frame_equal(run_local(*ARGS), expected)
+    pd.testing.assert_frame_equal(run_process_pool(*ARGS, workers=2), expected)
+    assert list(expected.groupby('subset')['rate'].first()) == [1.0, 2.0, 3.0]
+
+
+def test_select_backend(monkeypatch):
+    assert select_backend(PARAM_SETS, 4, 2, TOY_STATE, TOY_BLOCKS) == 'single'
+    monkeypatch.setattr(backends.os, 'cpu_count', lambda: 4)
+    monkeypatch.setattr(backends, 'POOL_MIN_WORK', 10)
+    assert select_backend(PARAM_SETS, 4, 2, TOY_STATE, TOY_BLOCKS) == 'process_pool'
+    assert select_backend(PARAM_SETS[:1], 4, 2, TOY_STATE, TOY_BLOCKS) == 'single'
+
+
+def shared_memory_blocks() -> set:
+    return set(os.listdir('/dev/shm'))
+
+
+def test_shared_memory_round_trip():
+    sim_df = pd.DataFrame(
+        {
+            'subset': np.array([0, 1, 2], dtype='int32'),
+            'balance': [0.5, np.nan, 2.0],
+            'count': pd.array([1, None, 3], dtype='Int64'),
+            'active': [True, False, True],
+            'label': pd.Categorical(['a', 'b', 'a']),
+            'function': [len, min, max],
+        }
+    )
+    name, objects, columns = _to_shared_memory(sim_df, 'subspace_test_round_trip')
+    assert list(objects.columns) == ['label', 'function']
+    numeric = _from_shared_memory([name])
+    round_trip = pd.concat([numeric, objects], axis=1)[columns]
+    pd.testing.assert_frame_equal(round_trip, sim_df)
+    assert 'subspace_test_round_trip' not in shared_memory_blocks()
+
+
+def test_process_pool_unlinks_blocks_on_failure():
+    def failing_balance(p, _2, _3, s, _5):
+        if p['rate'] == 3.0:
+            raise ValueError('failed run')
+        return ('balance', s['balance'] + p['rate'])
+
+    before = shared_memory_blocks()
+    with pytest.raises(ValueError):
+        run_process_pool(
+            PARAM_SETS,
+            4,
+            2,
+            TOY_STATE,
+            toy_blocks(balance=failing_balance),
+            {'label', 'rate'},
+            workers=3,
+        )
+    assert shared_memory_blocks() == before
@@ -0,0 +1,93 @@
+from typing import Optional
+
+from subspace_model.experiments.batch import (
+    ResultCache,
+    evaluate_overlays,
+    evaluate_param_sets,
+    overlay_params,
+    param_sets_to_sweep,
+)
+from subspace_model.experiments.logic import POISSON_GENERATOR, SubsidyComponent
+from subspace_model.params import DEFAULT_PARAMS
+
+# A minimal model with the same layout as the subspace model
+TOY_STATE = {'days_passed': 0, 'balance': 0.0}
+TOY_VARIABLES = {
+    'days_passed': lambda p, _2, _3, s, _5: ('days_passed', s['days_passed'] + 1),
+    'balance': lambda p, _2, _3, s, _5: ('balance', s['balance'] + p['rate']),
+}
+TOY_BLOCKS = [{'policies': {}, 'variables': TOY_VARIABLES}]
+
+
+def toy_blocks(policies: Optional[dict] = None, **variables) -> list[dict]:
+    """The toy model with extra policies and extra or replaced state updates."""
+    if policies is None:
+        policies = {}
+    return [{'policies': policies, 'variables': {**TOY_VARIABLES, **variables}}]
+
+
+def test_overlay_params_nested():
+    params = overlay_params(
+        {
+            'label': 'nested',
+            'reference_subsidy_components.0.max_reference_subsidy': 1.0,
+        }
+    )
+    component = params['reference_subsidy_components'][0]
+    assert isinstance(component, SubsidyComponent)
+    assert component.max_reference_subsidy == 1.0
+    # The defaults are left untouched
+    assert DEFAULT_PARAMS['reference_subsidy_components'][0].max_reference_subsidy != 1.0
+    assert DEFAULT_PARAMS['label'] == 'standard'
+
+
+def test_param_sets_to_sweep():
+    sweep = param_sets_to_sweep([{'a': 1, 'b': 2}, {'a': 3, 'b': 4}])
+    assert sweep == {'a': [1, 3], 'b': [2, 4]}
+
+
+def test_evaluate_param_sets():
+    param_sets = [{'label': 'slow', 'rate': 1.0}, {'label': 'fast', 'rate': 2.0}]
+    values = evaluate_param_sets(
+        param_sets,
+        {'rate': lambda df: df['balance'].iloc[-1] / df['days_passed'].iloc[-1]},
+        SIMULATION_DAYS=10,
+        initial_state=TOY_STATE,
+        blocks=TOY_BLOCKS,
+    )
+    assert list(values['rate']) == [1.0, 2.0]
+
+
+def test_evaluate_overlays_logs_every_point(tmp_path):
+    cache = ResultCache(str(tmp_path / 'evaluations.pkl.gz'))
+
+    def evaluate(seed):
+        return evaluate_overlays(
+            [{'rate': 1.0, 'random_seed': seed}],
+            {'balance': lambda df: df['balance'].iloc[-1]},
+            base={'label': 'toy', 'rate': 0.0},
+            cache=cache,
+            SIMULATION_DAYS=10,
+            initial_state=TOY_STATE,
+            blocks=TOY_BLOCKS,
+        )
+
+    # Unseeded points are logged but never looked up
+    evaluate(None)
+    evaluate(None)
+    assert len(cache.df) == 2
+    assert cache.df['random_seed'].isna().all()
+
+    evaluate(0)
+    evaluate(0)
+    reloaded = ResultCache(str(tmp_path / 'evaluations.pkl.gz'))
+    assert len(reloaded.df) == 3
+    assert reloaded.df['random_seed'].iloc[-1] == 0
+
+
+def test_result_cache_key_functions_by_value():
+    # Lambdas share a name, their closures tell them apart
+    generator = POISSON_GENERATOR(1.0)
+    a = ResultCache.key({'generator': generator})
+    assert a == ResultCache.key({'generator': generator})
+    assert a != ResultCache.key({'generator': POISSON_GENERATOR(2.0)})
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from subspace_model.experiments.calibration import (
+    abc_smc,
+    distance,
+    posterior_scenario,
+    summary_statistics,
+    write_posterior,
+)
+from test.test_experiments_batch import TOY_BLOCKS, TOY_STATE
+
+
+def test_summary_statistics_distance():
+    observed = summary_statistics({'x': pd.Series([1.0, 2.0, 3.0])})
+    assert observed[('x', 'mean')] == 2.0
+    assert observed[('x', 'std')] == 1.0
+    assert distance(observed, observed) == 0.0
+    assert distance(observed * 2, observed) > 0
+
+
+def test_abc_smc_toy_model(tmp_path):
+    observations = pd.DataFrame({'balance': 0.4 * np.arange(11)})
+    posterior, history = abc_smc(
+        observations,
+        priors={'rate': (0.0, 1.0)},
+        scenario=lambda rate: {'rate': rate},
+        series={'balance': lambda df: df['balance']},
+        particles=20,
+        generations=3,
+        base={'label': 'toy', 'rate': 0.0},
+        seed=1,
+        initial_state=TOY_STATE,
+        blocks=TOY_BLOCKS,
+    )
+    assert len(posterior) == 20
+    assert np.isclose(posterior['weight'].sum(), 1.0)
+    assert list(history['generation']) == [0, 1, 2, 3]
+    assert history['epsilon'].is_monotonic_decreasing
+
+    path = write_posterior(posterior, str(tmp_path / 'posterior.csv'))
+    scenario = posterior_scenario(path, scenario=lambda rate: {'rate': rate})
+    assert abs(scenario['rate'] - 0.4) < 0.05
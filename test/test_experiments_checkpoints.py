@@ -0,0 +1,37 @@
+from subspace_model.experiments.backends import run_single
+from subspace_model.experiments.checkpoints import reconstruct
+from subspace_model.experiments.logic import random_state
+from subspace_model.store import read_results, write_results
+
+# A toy model drawing seeded random numbers at every timestep
+STATE = {'days_passed': 0, 'balance': 0.0, 'noise': 0.0}
+BLOCKS = [
+    {
+        'policies': {},
+        'variables': {
+            'days_passed': lambda p, _2, _3, s, _5: ('days_passed', s['days_passed'] + 1),
+            'noise': lambda p, _2, _3, s, _5: ('noise', random_state(p, s, 0).rand()),
+            'balance': lambda p, _2, _3, s, _5: ('balance', s['balance'] + s['noise']),
+        },
+    }
+]
+PARAM_SETS = [{'label': 'a', 'random_seed': 7}, {'label': 'b', 'random_seed': 8}]
+
+
+def test_reconstruct(tmp_path):
+    sim_df = run_single(PARAM_SETS, 12, 2, STATE, BLOCKS, {'label'})
+    path = write_results(
+        sim_df, 'toy', '2024-01-01_00-00-00', str(tmp_path), checkpoint_every=4
+    )
+    stored = read_results(path)
+    assert 'balance' not in stored and len(stored) == len(sim_df)
+
+    df = reconstruct(
+        path, PARAM_SETS[1], 2, (6, 9), subset=1, initial_state=STATE, blocks=BLOCKS
+    )
+    expected = sim_df[
+        (sim_df['subset'] == 1) & (sim_df['run'] == 2) & sim_df['timestep'].between(6, 9)
+    ]
+    assert list(df['timestep']) == [6, 7, 8, 9]
+    assert list(df['balance']) == list(expected['balance'])
+    assert list(df['noise']) == list(expected['noise'])
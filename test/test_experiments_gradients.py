@@ -0,0 +1,61 @@
+import numpy as np
+
+from subspace_model.experiments.gradients import (
+    local_gradients,
+    numeric_parameters,
+    perturbed_param_sets,
+)
+from subspace_model.experiments.logic import NORMAL_GENERATOR
+from subspace_model.params import DEFAULT_PARAMS
+from test.test_experiments_batch import TOY_STATE, toy_blocks
+
+NOISE = NORMAL_GENERATOR(1.0, 0.5)
+NOISY_BLOCKS = toy_blocks(
+    balance=lambda p, _2, _3, s, _5: (
+        'balance',
+        s['balance'] + p['rate'] * NOISE(p, s) + p['offset'],
+    )
+)
+
+
+def test_perturbed_param_sets():
+    base = {'label': 'toy', 'rate': 2.0, 'count': 100, 'share': 0.0, 'flag': True}
+    assert numeric_parameters(base) == ['rate', 'count', 'share']
+    param_sets = perturbed_param_sets(base, numeric_parameters(base), h=0.01)
+    # 2P + 1 runs, minus the downward step of the zero-valued param
+    assert len(param_sets) == 6
+    assert [p['count'] for p in param_sets if p['perturbed_parameter'] == 'count'] == [
+        99.0,
+        101.0,
+    ]
+    assert [p['share'] for p in param_sets if p['perturbed_parameter'] == 'share'] == [0.01]
+
+
+def test_perturbed_param_sets_default_params():
+    parameters = numeric_parameters(DEFAULT_PARAMS)
+    param_sets = perturbed_param_sets(dict(DEFAULT_PARAMS), parameters, h=0.01)
+    for p in param_sets[1:]:
+        base = DEFAULT_PARAMS[p['perturbed_parameter']]
+        expected = base * (1 + 0.01 * p['perturbation']) if base != 0 else 0.01
+        assert np.isclose(p['perturbed_value'], expected)
+    # Small integer params stay close to their base value
+    constants = [
+        p['issuance_function_constant']
+        for p in param_sets
+        if p['perturbed_parameter'] == 'issuance_function_constant'
+    ]
+    assert np.allclose(constants, [0.99, 1.01])
+
+
+def test_local_gradients_common_random_numbers():
+    table = local_gradients(
+        {'balance': lambda df: df['balance'].iloc[-1]},
+        base={'label': 'toy', 'rate': 2.0, 'offset': 0.0},
+        SIMULATION_DAYS=20,
+        initial_state=TOY_STATE,
+        blocks=NOISY_BLOCKS,
+    )
+    # The balance is proportional to the rate: with common random numbers
+    # the elasticity is exact despite the noise
+    assert np.isclose(table.loc[('balance', 'rate'), 'elasticity'], 1.0)
+    assert np.isclose(table.loc[('balance', 'offset'), 'derivative'], 21.0)
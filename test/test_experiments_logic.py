@@ -20,3 +20,34 @@ def test_reference_subsidy():
 def test_generators():
     normal = MAGNITUDE(NORMAL_GENERATOR(0.1, 0.1))(0, 0)
     assert (normal >= 0) and (normal <= 1)
+
+
+def test_seeded_generators():
+    generator = NORMAL_GENERATOR(0, 1, name='a')
+    other = NORMAL_GENERATOR(0, 1, name='b')
+    params = {'random_seed': 7}
+    relabeled = dict(params, label='x')
+    state = {'run': 1, 'timestep': 3, 'substep': 0}
+    other_run = {**state, 'run': 2}
+    first = generator(params, state)
+    assert generator(params, state) != first
+    assert generator(relabeled, state) == first
+    assert other(params, state) != first
+    assert generator(params, other_run) != first
+
+
+def test_generator_streams_are_stable():
+    params = {'random_seed': 7}
+    state = {'run': 1, 'timestep': 3, 'substep': 0}
+    first = POISSON_GENERATOR(100, name='a')(params, state)
+    NORMAL_GENERATOR(0, 1, name='a')
+    relabeled = dict(params, label='x')
+    assert POISSON_GENERATOR(100, name='a')(relabeled, state) == first
+
+
+def test_run_offset():
+    generator = POISSON_GENERATOR(100, name='a')
+    offset = {'random_seed': 7, 'run_offset': 1}
+    later = {'run': 2, 'timestep': 3, 'substep': 0}
+    first = generator(offset, {'run': 1, 'timestep': 3, 'substep': 0})
+    assert first == generator({'random_seed': 7}, later)
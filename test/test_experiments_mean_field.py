@@ -0,0 +1,69 @@
+import numpy as np
+
+from subspace_model.experiments.batch import run_param_sets
+from subspace_model.experiments.logic import (
+    MAGNITUDE,
+    NORMAL_GENERATOR,
+    POISSON_GENERATOR,
+)
+from subspace_model.experiments.mean_field import (
+    control_variate_estimate,
+    generator_moments,
+    mean_field_params,
+    mean_field_run,
+)
+
+from test.test_experiments_batch import TOY_STATE, toy_blocks
+
+TOY_PARAMS = {'label': 'toy', 'noise_function': NORMAL_GENERATOR(1.0, 0.5)}
+DRAW_STATE = {**TOY_STATE, 'draw': 0.0}
+DRAW_BLOCKS = toy_blocks(
+    {'draw': lambda p, _2, _3, s: {'draw': p['noise_function'](p, s)}},
+    draw=lambda p, _2, _3, s, u: ('draw', u['draw']),
+    balance=lambda p, _2, _3, s, u: ('balance', s['balance'] + u['draw']),
+)
+
+
+def test_generator_moments():
+    mean, std = generator_moments(POISSON_GENERATOR(4.0))
+    assert np.isclose(mean, 4.0, rtol=1e-3) and np.isclose(std, 2.0, rtol=1e-2)
+    # Clipping to [0, 1] raises the mean of a normal centered on zero
+    mean, _ = generator_moments(MAGNITUDE(NORMAL_GENERATOR(0.0, 1.0)))
+    assert 0.3 < mean < 0.4
+
+
+def test_mean_field_run():
+    params = mean_field_params(TOY_PARAMS)
+    expected, _ = generator_moments(TOY_PARAMS['noise_function'])
+    assert params['noise_function'](params, {}) == expected
+
+    sim_df = mean_field_run(
+        TOY_PARAMS,
+        moments=True,
+        SIMULATION_DAYS=16,
+        initial_state=DRAW_STATE,
+        blocks=DRAW_BLOCKS,
+    )
+    last = sim_df.iloc[-1]
+    assert np.isclose(last['balance'], last['timestep'], rtol=1e-3)
+    # A random walk with steps of std 0.5
+    assert np.isclose(last['balance_std'], 0.5 * np.sqrt(last['timestep']), rtol=1e-2)
+
+
+def test_control_variate_estimate():
+    sim_df = run_param_sets(
+        [TOY_PARAMS],
+        SIMULATION_DAYS=10,
+        SAMPLES=8,
+        initial_state=DRAW_STATE,
+        blocks=DRAW_BLOCKS,
+    )
+    estimate = control_variate_estimate(
+        sim_df,
+        lambda df: df['balance'].iloc[-1],
+        TOY_PARAMS,
+        controls={'draw': ('noise_function', None)},
+    )
+    # The final balance is fully explained by the draws
+    assert np.isclose(estimate.loc[0, 'cv_mean'], sim_df['timestep'].max(), rtol=1e-3)
+    assert estimate.loc[0, 'variance_reduction'] > 100
@@ -0,0 +1,41 @@
+import pandas as pd
+
+from subspace_model.experiments.batch import sweep_to_param_sets
+from subspace_model.experiments.multifidelity import (
+    Fidelity,
+    multifidelity_sweep,
+    promote,
+)
+from test.test_experiments_batch import TOY_BLOCKS, TOY_STATE
+
+
+def test_sweep_to_param_sets():
+    param_sets = sweep_to_param_sets({'a': [1, 2, 3], 'b': ['x']})
+    assert param_sets == [{'a': 1, 'b': 'x'}, {'a': 2, 'b': 'x'}, {'a': 3, 'b': 'x'}]
+
+
+def test_promote():
+    scores = pd.Series([5.0, 1.0, 3.0, 4.0, 2.0])
+    assert list(promote(scores, top_k=2)) == [0, 3]
+    assert list(promote(scores, top_k=1, maximize=False)) == [1]
+    assert list(promote(scores, threshold=2.9, boundary_k=1)) == [2]
+
+
+def test_multifidelity_sweep_toy_model():
+    param_sets = [{'label': f'rate-{r}', 'rate': r} for r in (0.1, 0.5, 0.9, 0.3)]
+    sim_df, report = multifidelity_sweep(
+        param_sets,
+        score=lambda df: df['balance'].iloc[-1],
+        top_k=2,
+        low=Fidelity('low', SIMULATION_DAYS=4, TIMESTEP_IN_DAYS=2, SAMPLES=1),
+        high=Fidelity('high', SIMULATION_DAYS=10, TIMESTEP_IN_DAYS=1, SAMPLES=2),
+        initial_state=TOY_STATE,
+        blocks=TOY_BLOCKS,
+    )
+    assert list(report.index[report['promoted']]) == [1, 2]
+    assert list(report['fidelity']) == ['low', 'high', 'high', 'low']
+    assert report.loc[2, 'score'] > report.loc[1, 'score'] > report.loc[0, 'score']
+
+    fidelity = sim_df.groupby('subset')['fidelity'].first()
+    assert list(fidelity) == list(report['fidelity'])
+    assert sim_df[sim_df['subset'] == 2]['run'].nunique() == 2
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from subspace_model.experiments.batch import ResultCache
+from subspace_model.experiments.optimization import optimize, target_path_loss
+from test.test_experiments_batch import TOY_BLOCKS, TOY_STATE
+
+TOY_PARAMS = {'label': 'toy', 'rate': 0.0, 'random_seed': 0}
+
+
+def test_target_path_loss():
+    import pandas as pd
+
+    sim_df = pd.DataFrame({'timestep': [0, 1, 2], 'supply': [1.0, 2.0, 3.0]})
+    assert target_path_loss('supply', [1.0, 2.0, 3.0])(sim_df) == 0
+    assert target_path_loss('supply', [2.0, 4.0, 6.0])(sim_df) == pytest.approx(0.5)
+
+
+def test_optimize_toy_model(tmp_path):
+    # The balance grows by `rate` every day, the target path has rate 0.37
+    cache = ResultCache(str(tmp_path / 'evaluations.pkl.gz'))
+
+    def run(rate):
+        return optimize(
+            {'rate': (0.0, 1.0)},
+            target_path_loss('balance', 1.0 + rate * np.arange(11)),
+            budget=16,
+            batch_size=4,
+            base=TOY_PARAMS,
+            cache=cache,
+            seed=1,
+            SIMULATION_DAYS=10,
+            initial_state={**TOY_STATE, 'balance': 1.0},
+            blocks=TOY_BLOCKS,
+        )
+
+    best, history = run(0.37)
+    assert len(history) <= 16
+    assert best['rate'] == pytest.approx(0.37, abs=0.02)
+
+    # Every evaluated point was logged to the cache
+    reloaded = ResultCache(str(tmp_path / 'evaluations.pkl.gz'))
+    assert len(reloaded.df) == len(history)
+
+    # Another objective on the same cache is not answered with stale values
+    best, _ = run(0.8)
+    assert best['rate'] == pytest.approx(0.8, abs=0.02)
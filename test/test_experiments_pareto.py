@@ -0,0 +1,50 @@
+import numpy as np
+
+from subspace_model.experiments.pareto import (
+    crowding_distance,
+    non_dominated_sort,
+    pareto_search,
+)
+
+from test.test_experiments_batch import TOY_STATE, toy_blocks
+
+COST_STATE = {**TOY_STATE, 'cost': 0.0}
+COST_BLOCKS = toy_blocks(
+    cost=lambda p, _2, _3, s, _5: (
+        'cost',
+        s['cost'] + (1 - p['rate']) ** 2 + p['waste'],
+    )
+)
+
+
+def test_non_dominated_sort():
+    F = np.array([[1, 4], [2, 2], [4, 1], [3, 3], [5, 5]])
+    fronts = non_dominated_sort(F)
+    assert [sorted(f) for f in fronts] == [[0, 1, 2], [3], [4]]
+
+
+def test_crowding_distance():
+    F = np.array([[0.0, 2.0], [1.0, 1.0], [2.0, 0.0]])
+    distance = crowding_distance(F)
+    assert np.isinf(distance[0]) and np.isinf(distance[2])
+    assert distance[1] == 2.0
+
+
+def test_pareto_search_toy_model():
+    front, trajectories = pareto_search(
+        {'rate': (0.0, 1.0), 'waste': (0.0, 1.0)},
+        {
+            'income': (lambda df: df['balance'].iloc[-1], 'max'),
+            'cost': (lambda df: df['cost'].iloc[-1], 'min'),
+        },
+        population=16,
+        generations=16,
+        base={'label': 'toy', 'rate': 0.0, 'waste': 0.0},
+        seed=3,
+        SIMULATION_DAYS=5,
+        initial_state=COST_STATE,
+        blocks=COST_BLOCKS,
+    )
+    # Waste only adds cost, so the front converges towards no waste
+    assert front['waste'].median() < 0.2
+    assert set(trajectories['point']) == set(front.index)
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from subspace_model.experiments.precision import precision_report
+from subspace_model.store import reduce_precision
+
+RUNS = pd.DataFrame(
+    {
+        'subset': 0,
+        'run': np.repeat([1, 2], 50),
+        'timestep': np.tile(np.arange(50), 2),
+        'circulating_supply': np.linspace(1e9, 2e9, 100) + 1 / 3,
+        'fund_balance': np.linspace(0, 1e9, 100) + 1 / 3,
+    }
+)
+
+
+def test_reduce_precision():
+    df = reduce_precision(RUNS)
+    assert df['circulating_supply'].dtype == 'float32'
+    assert df['fund_balance'].dtype == 'float64'
+    assert df['run'].dtype == RUNS['run'].dtype
+
+
+def test_precision_report():
+    report = precision_report(
+        RUNS,
+        metrics={
+            'supply': lambda df: df['circulating_supply'].iloc[-1],
+            'fund': lambda df: df['fund_balance'].iloc[-1],
+            'missing': lambda df: df['block_utilization'].mean(),
+        },
+    )
+    assert list(report.index) == ['supply', 'fund']
+    assert 0 < report.loc['supply', 'max_rel_error'] < 1e-7
+    assert report.loc['fund', 'max_abs_error'] == 0
+    assert report['within_tolerance'].all()
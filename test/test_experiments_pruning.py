@@ -0,0 +1,56 @@
+import pytest
+
+from subspace_model.experiments.batch import run_param_sets
+from subspace_model.experiments.pruning import pruned_run
+from test.test_experiments_batch import TOY_STATE, toy_blocks
+
+FUNDED_STATE = {**TOY_STATE, 'balance': 10.0}
+
+
+def toy_balance(p, _2, _3, s, _5):
+    if s['days_passed'] >= p['fails_after']:
+        raise ValueError('pledged space exceeded')
+    return ('balance', s['balance'] + p['rate'])
+
+
+FAILING_BLOCKS = toy_blocks(balance=toy_balance)
+
+
+def test_pruned_run_toy_model():
+    param_sets = [
+        {'label': 'feasible', 'rate': 1.0, 'fails_after': 100},
+        {'label': 'drained', 'rate': -1.0, 'fails_after': 100},
+        {'label': 'raises', 'rate': 1.0, 'fails_after': 7},
+    ]
+    sim_df, pruned = pruned_run(
+        param_sets,
+        constraints={'balance drained': lambda s: s['balance'] >= 0},
+        check_every=5,
+        SIMULATION_DAYS=29,
+        SAMPLES=2,
+        initial_state=FUNDED_STATE,
+        blocks=FAILING_BLOCKS,
+        assign_params={'label'},
+    )
+    assert list(pruned['label']) == ['drained', 'raises']
+    assert pruned.loc[1, 'reason'] == 'balance drained'
+    assert pruned.loc[1, 'timestep'] == 15
+    assert pruned.loc[2, 'reason'].startswith('ValueError')
+
+    # The feasible arm matches an unsegmented run
+    full = run_param_sets(
+        param_sets[:1],
+        SIMULATION_DAYS=29,
+        initial_state=FUNDED_STATE,
+        blocks=FAILING_BLOCKS,
+    )
+    feasible = sim_df[(sim_df['subset'] == 0) & (sim_df['run'] == 1)]
+    assert list(feasible['timestep']) == list(full['timestep'])
+    assert list(feasible['balance']) == list(full['balance'])
+    assert set(feasible['label']) == {'feasible'}
+    assert sim_df[sim_df['subset'] == 1]['timestep'].max() == 15
+
+
+def test_pruned_run_checks_every_timestep_at_least():
+    with pytest.raises(ValueError):
+        pruned_run([{'label': 'feasible'}], check_every=0, blocks=FAILING_BLOCKS)
@@ -0,0 +1,52 @@
+import numpy as np
+from scipy.stats import poisson
+
+from subspace_model.experiments.logic import POISSON_GENERATOR
+from subspace_model.experiments.rare_events import tail_estimate, weighted_quantile
+from test.test_experiments_batch import TOY_VARIABLES
+
+TOY_PARAMS = {
+    'label': 'toy',
+    'random_seed': 1,
+    'slash_per_day_function': POISSON_GENERATOR(0.1),
+}
+TOY_STATE = {'days_passed': 0, 'slash_count': 0.0, 'loss': 0.0}
+TOY_BLOCKS = [
+    {
+        'policies': {
+            'slash': lambda p, _2, _3, s: {
+                'slash_count': p['slash_per_day_function'](p, s)
+            }
+        },
+        'variables': {
+            'days_passed': TOY_VARIABLES['days_passed'],
+            'slash_count': lambda p, _2, _3, s, u: ('slash_count', u['slash_count']),
+            'loss': lambda p, _2, _3, s, u: ('loss', s['loss'] + u['slash_count']),
+        },
+    }
+]
+
+
+def test_weighted_quantile():
+    values = np.array([3.0, 1.0, 2.0])
+    assert weighted_quantile(values, np.ones(3), 0.5) == 2.0
+    assert weighted_quantile(values, np.array([0.0, 0.0, 1.0]), 0.1) == 2.0
+
+
+def test_tail_estimate_toy_model():
+    estimate = tail_estimate(
+        {'loss': lambda df: df['loss'].iloc[-1]},
+        {'loss': 12},
+        mu=0.1,
+        params=TOY_PARAMS,
+        SAMPLES=400,
+        SIMULATION_DAYS=30,
+        initial_state=TOY_STATE,
+        blocks=TOY_BLOCKS,
+    )
+    row = estimate.loc['loss']
+    # 31 daily draws, so the total loss is Poisson(3.1)
+    exact = poisson.sf(11, 3.1)
+    assert row['tilted_mu'] > 0.1
+    assert abs(row['probability'] - exact) < 3 * row['std_error']
+    assert row['std_error'] < exact
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from subspace_model.experiments.sensitivity import (
+    elementary_effects,
+    morris_design,
+    plan_budget,
+    run_sensitivity,
+    saltelli_design,
+    sobol_indices,
+)
+from test.test_experiments_batch import TOY_BLOCKS, TOY_STATE
+
+ISHIGAMI_RANGES = {'x1': (-np.pi, np.pi), 'x2': (-np.pi, np.pi), 'x3': (-np.pi, np.pi)}
+
+
+def ishigami(df, a=7, b=0.1):
+    return np.sin(df.x1) + a * np.sin(df.x2) ** 2 + b * df.x3**4 * np.sin(df.x1)
+
+
+def test_sobol_indices_ishigami():
+    design = saltelli_design(ISHIGAMI_RANGES, base_samples=4096, seed=1)
+    indices = sobol_indices(design, ishigami(design), bootstrap=50, seed=1)
+
+    expected_S1 = [0.3139, 0.4424, 0.0]
+    expected_ST = [0.5576, 0.4424, 0.2437]
+    assert np.allclose(indices['S1'], expected_S1, atol=0.05)
+    assert np.allclose(indices['ST'], expected_ST, atol=0.05)
+    assert (indices['S1_low'] <= indices['S1_high']).all()
+
+
+def test_elementary_effects_linear():
+    ranges = {'a': (0.0, 10.0), 'b': (0.0, 1.0)}
+    design = morris_design(ranges, trajectories=10, seed=1)
+    assert len(design) == 10 * 3
+
+    effects = elementary_effects(design, 2 * design['a'], bootstrap=20, ranges=ranges)
+    assert effects.loc['a', 'mu_star'] == pytest.approx(20.0)
+    assert effects.loc['b', 'mu_star'] == pytest.approx(0.0)
+
+
+def test_plan_budget():
+    plan = plan_budget(ISHIGAMI_RANGES, max_runs=1000, method='sobol', samples=2)
+    assert plan['base_samples'] == 64
+    assert plan['runs'] <= 1000
+
+    plan = plan_budget(ISHIGAMI_RANGES, max_runs=100, method='morris')
+    assert plan['runs'] == 100
+
+    with pytest.raises(ValueError):
+        plan_budget(ISHIGAMI_RANGES, max_runs=5)
+
+
+def test_run_sensitivity_toy_model():
+    indices, design = run_sensitivity(
+        {'rate': (0.0, 1.0), 'unused': (0.0, 1.0)},
+        {'balance': lambda df: df['balance'].iloc[-1]},
+        max_runs=64,
+        method='morris',
+        base={'label': 'toy', 'rate': 0.0, 'unused': 0.0},
+        SIMULATION_DAYS=5,
+        bootstrap=10,
+        chunk_size=16,
+        initial_state=TOY_STATE,
+        blocks=TOY_BLOCKS,
+    )
+    assert len(design) == 63
+    assert indices.loc[('balance', 'rate'), 'mu_star'] > 0
+    assert indices.loc[('balance', 'unused'), 'mu_star'] == 0
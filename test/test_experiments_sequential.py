@@ -0,0 +1,92 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from subspace_model.experiments.metrics import run_values, total_supply_mean
+from subspace_model.experiments.sequential import sequential_run
+
+
+def noisy_run(
+    SAMPLES: int = 1,
+    SIMULATION_DAYS: int = 10,
+    SIGMA: float = 1.0,
+    SEED: Optional[int] = None,
+    RUN_OFFSET: int = 0,
+):
+    """
+    Mimics the output of an experiment with two subsets. With a `SEED`,
+    every run draws the numbers of its run number shifted by `RUN_OFFSET`.
+    """
+    rows = []
+    for subset, label in enumerate(['a', 'b']):
+        for run in range(1, SAMPLES + 1):
+            if SEED is None:
+                noise = np.random.normal(0, SIGMA)
+            else:
+                rs = np.random.RandomState([SEED, subset, RUN_OFFSET + run])
+                noise = rs.normal(0, SIGMA)
+            level = 100.0 * (subset + 1) + noise
+            for day in range(SIMULATION_DAYS + 1):
+                rows.append(
+                    {
+                        'subset': subset,
+                        'run': run,
+                        'label': label,
+                        'environmental_label': 'standard',
+                        'days_passed': day,
+                        'total_supply': level,
+                    }
+                )
+    return pd.DataFrame(rows)
+
+
+def test_run_values():
+    sim_df = noisy_run(SAMPLES=3)
+    values = run_values(sim_df, total_supply_mean)
+    assert len(values) == 6
+    assert list(values.index.names) == ['subset', 'run']
+
+
+def test_sequential_run_converges():
+    sim_df, diagnostics = sequential_run(
+        noisy_run, target=0.01, batch_size=4, max_samples=40, SIGMA=0.1
+    )
+    assert diagnostics['converged'].all()
+    assert (diagnostics['samples'] == 4).all()
+    assert sim_df.groupby('subset')['run'].nunique().eq(4).all()
+
+
+def test_sequential_run_stops_at_max_samples():
+    sim_df, diagnostics = sequential_run(
+        noisy_run, target=1e-9, batch_size=3, max_samples=7, SIGMA=10.0
+    )
+    assert not diagnostics['converged'].any()
+    assert (diagnostics['samples'] == 7).all()
+    assert (diagnostics['batches'] == 3).all()
+    # Run numbers stay unique across batches
+    assert sorted(sim_df['run'].unique()) == list(range(1, 8))
+
+
+def test_sequential_run_offsets_seeded_batches():
+    sim_df, diagnostics = sequential_run(
+        noisy_run, target=1e-9, batch_size=3, max_samples=6, SIGMA=10.0, SEED=1
+    )
+    levels = sim_df.groupby(['subset', 'run'])['total_supply'].first()
+    assert levels.nunique() == 12
+    # The batches continue the runs of a single execution
+    assert levels.tolist() == (
+        noisy_run(SAMPLES=6, SIGMA=10.0, SEED=1)
+        .groupby(['subset', 'run'])['total_supply']
+        .first()
+        .tolist()
+    )
+
+
+def test_sequential_run_rejects_repeated_batches():
+    def seeded_run(SAMPLES: int = 1, SIGMA: float = 10.0):
+        return noisy_run(SAMPLES=SAMPLES, SIGMA=SIGMA, SEED=1)
+
+    with pytest.raises(ValueError):
+        sequential_run(seeded_run, target=1e-9, batch_size=3, max_samples=6)
@@ -0,0 +1,86 @@
+import subspace_model.experiments.charts as charts
+import subspace_model.experiments.metrics as metrics
+from subspace_model.experiments.logic import MOCK_ISSUANCE_FUNCTION
+from subspace_model.experiments.spec import bundled_specs, compile_spec, run_plans
+from subspace_model.store import BackgroundWriter, read_results
+from test.test_experiments_batch import TOY_BLOCKS, TOY_STATE
+
+TOY_SPEC = {
+    'name': 'toy',
+    'run': {'days': 3, 'samples': 1},
+    'base': {'environmental_label': 'toy'},
+    'sweep': [
+        {'values': [{'label': 'a'}, {'label': 'b'}]},
+        {'grid': {'rate': {'linspace': [1, 3, 3]}}},
+    ],
+    'outputs': {'assign_params': ['rate']},
+}
+
+
+def test_compile_spec():
+    plan = compile_spec(TOY_SPEC)
+    assert len(plan.sweep) == 6
+    cell = plan.sweep[4]
+    assert (cell['label'], cell['rate'], cell['environmental_label']) == ('b', 2, 'toy')
+    assert 'rate' in plan.assign_params
+
+    # Overrides change the hash, key order and explicit defaults do not
+    reordered = dict(reversed(TOY_SPEC.items()))
+    assert compile_spec(reordered).spec_hash == plan.spec_hash
+    assert compile_spec(TOY_SPEC, SAMPLES=2).spec_hash != plan.spec_hash
+    explicit = {**TOY_SPEC, 'run': {**TOY_SPEC['run'], 'timestep_in_days': 1}}
+    assert compile_spec(explicit).spec_hash == plan.spec_hash
+
+
+def test_bundled_specs():
+    plan = compile_spec('sweep_credit_supply', SIMULATION_DAYS=70)
+    assert len(plan.sweep) == 6 and plan.SIMULATION_DAYS == 70
+    plan = compile_spec('issuance_sweep')
+    assert plan.sweep[1]['issuance_function'] is MOCK_ISSUANCE_FUNCTION
+    plan = compile_spec('standard_stochastic_run')
+    assert plan.sweep[0]['environmental_label'] == 'stochastic'
+    assert plan.charts == ['ab_block_utilization']
+
+    # The outputs of every spec name existing charts and metrics
+    for name in bundled_specs():
+        plan = compile_spec(name)
+        assert all(callable(getattr(charts, c, None)) for c in plan.charts)
+        assert all(callable(getattr(metrics, m, None)) for m in plan.trajectory_metrics)
+
+
+def test_run_shard():
+    plan = compile_spec(TOY_SPEC).shard(1, 2)
+    sim_df = plan.run(initial_state=TOY_STATE, blocks=TOY_BLOCKS)
+    last = sim_df.groupby('subset').last()
+    assert list(last.index) == [1, 3, 5]
+    assert list(last['rate']) == [2, 1, 3]
+    assert sim_df.attrs['spec_hash'] == plan.spec_hash
+
+
+def test_run_plans():
+    plans = [
+        compile_spec(TOY_SPEC),
+        compile_spec({**TOY_SPEC, 'name': 'other', 'outputs': {}}),
+        compile_spec(TOY_SPEC, SIMULATION_DAYS=5),
+    ]
+    kwargs = {'initial_state': TOY_STATE, 'blocks': TOY_BLOCKS}
+    results = run_plans(plans, **kwargs)
+    assert [df['subset'].nunique() for df in results] == [6, 6, 6]
+    assert 'rate' in results[0] and 'rate' not in results[1]
+    assert results[2]['timestep'].max() == 6
+    # The same data as running the plan on its own
+    alone = plans[0].run(**kwargs)
+    assert (results[0]['balance'] == alone['balance']).all()
+
+
+def test_run_plans_writers(tmp_path):
+    plans = [compile_spec(TOY_SPEC), compile_spec({**TOY_SPEC, 'name': 'other'})]
+    kwargs = {'initial_state': TOY_STATE, 'blocks': TOY_BLOCKS}
+    writers = [BackgroundWriter(plan.name, 'now', str(tmp_path)) for plan in plans]
+    results = run_plans(plans, writers, **kwargs)
+    for sim_df, writer in zip(results, writers):
+        writer.close()
+        # Written chunk by chunk, as the sweep ran
+        assert writer.frames > 1
+        written = read_results(writer.path)
+        assert list(written['balance']) == list(sim_df['balance'])
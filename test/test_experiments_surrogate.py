@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from subspace_model.experiments.surrogate import (
+    GaussianProcessSurrogate,
+    sweep_dataset,
+)
+
+
+def f(x):
+    return np.sin(3 * x) + x
+
+
+def test_surrogate_interpolates():
+    X = pd.DataFrame({'issuance_function_constant': np.linspace(0.1, 2.0, 12)})
+    y = f(X['issuance_function_constant'])
+    surrogate = GaussianProcessSurrogate(seed=0).fit(X, y)
+
+    prediction = surrogate.predict({'issuance_function_constant': 1.23})
+    assert abs(prediction['mean'].iloc[0] - f(1.23)) < 0.05
+    assert not prediction['extrapolation'].iloc[0]
+
+    far = surrogate.predict({'issuance_function_constant': 3.7})
+    assert far['extrapolation'].iloc[0]
+    assert far['std'].iloc[0] > prediction['std'].iloc[0]
+
+
+def test_surrogate_update():
+    X = pd.DataFrame({'c': [0.0, 1.0], 'd': [0.0, 1.0]})
+    surrogate = GaussianProcessSurrogate(seed=0).fit(X, [0.0, 1.0])
+    assert surrogate.predict({'c': 2.0, 'd': 2.0})['extrapolation'].iloc[0]
+
+    surrogate.update(pd.DataFrame({'c': [2.0], 'd': [2.0]}), [2.0], refit=False)
+    prediction = surrogate.predict({'c': 2.0, 'd': 2.0})
+    assert not prediction['extrapolation'].iloc[0]
+    assert abs(prediction['mean'].iloc[0] - 2.0) < 0.05
+
+
+def test_sweep_dataset():
+    sim_df = pd.DataFrame(
+        {
+            'subset': [0, 0, 1, 1],
+            'run': [1, 1, 1, 1],
+            'total_supply': [1.0, 3.0, 5.0, 7.0],
+        }
+    )
+    X, y = sweep_dataset(
+        sim_df,
+        ['issuance_function_constant'],
+        lambda df: df['total_supply'].mean(),
+        sweep_params={'issuance_function_constant': [0.5, 1.5]},
+    )
+    assert list(X['issuance_function_constant']) == [0.5, 1.5]
+    assert list(y) == [2.0, 6.0]
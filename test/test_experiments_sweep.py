@@ -0,0 +1,60 @@
+from cadCAD.tools.preparation import sweep_cartesian_product
+
+from subspace_model.experiments import sweep as sweep_module
+from subspace_model.experiments.sweep import Concat, Grid, Values, Zip, run_sweep
+from test.test_experiments_batch import TOY_BLOCKS, TOY_STATE
+
+
+def test_grid_matches_cartesian_product():
+    axes = {'a': [1, 2, 3], 'b': ['x', 'y'], 'c': [True, False]}
+    product = sweep_cartesian_product(axes)
+    expected = [{k: v[i] for k, v in product.items()} for i in range(12)]
+    assert list(Grid(axes)) == expected
+
+
+def test_sweep_algebra():
+    envs = Values([{'env': 'a'}, {'env': 'b'}])
+    grid = Grid({'rate': [1, 2, 3]})
+    product = envs * grid
+    assert len(product) == 6
+    assert product[4] == {'env': 'b', 'rate': 2}
+    assert product[-1] == {'env': 'b', 'rate': 3}
+
+    zipped = Zip(grid, Values([{'label': 'l'}]))
+    assert [c['label'] for c in zipped] == ['l'] * 3
+
+    both = Concat(product, grid.map(lambda c: {**c, 'env': 'c'}))
+    assert len(both) == 9 and both[8] == {'rate': 3, 'env': 'c'}
+    assert [start for start, _ in both.chunks(4)] == [0, 4, 8]
+
+
+def test_run_sweep_chunks():
+    sweep = Grid({'rate': [1.0, 2.0, 3.0]}).map(lambda c: {**c, 'label': 'toy'})
+    sim_df = run_sweep(
+        sweep,
+        chunk_size=2,
+        SIMULATION_DAYS=3,
+        initial_state=TOY_STATE,
+        blocks=TOY_BLOCKS,
+    )
+    last = sim_df.groupby('subset')['balance'].last()
+    assert list(last.index) == [0, 1, 2]
+    assert list(last / last.iloc[0]) == [1.0, 2.0, 3.0]
+
+
+def test_run_sweep_default_chunks(monkeypatch):
+    executions = []
+    run_param_sets = sweep_module.run_param_sets
+
+    def counted(chunk, **run_kwargs):
+        executions.append(len(chunk))
+        return run_param_sets(chunk, **run_kwargs)
+
+    monkeypatch.setattr(sweep_module, 'CHUNK_SIZE', 2)
+    monkeypatch.setattr(sweep_module, 'run_param_sets', counted)
+    sweep = Grid({'rate': [1.0, 2.0, 3.0]}).map(lambda c: {**c, 'label': 'toy'})
+    sim_df = run_sweep(
+        sweep, SIMULATION_DAYS=3, initial_state=TOY_STATE, blocks=TOY_BLOCKS
+    )
+    assert executions == [2, 1]
+    assert sorted(sim_df['subset'].unique()) == [0, 1, 2]
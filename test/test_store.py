@@ -0,0 +1,248 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow.dataset as ds
+import pytest
+
+from subspace_model.catalog import find_results
+from subspace_model.const import ISSUANCE_FOR_FARMERS, MAX_CREDIT_ISSUANCE
+from subspace_model.experiments.backends import run_single
+from subspace_model.state import INITIAL_STATE
+from subspace_model.store import (
+    VIRTUAL_COLUMNS,
+    BackgroundWriter,
+    append_results,
+    compact_segments,
+    latest_timestamp,
+    load_results,
+    manifest_snapshot,
+    migrate_pickles,
+    read_results,
+    vacuum_segments,
+    virtual_dependencies,
+    write_results,
+)
+from subspace_model.structure import SUBSPACE_MODEL_BLOCKS
+from test.test_experiments_batch import TOY_BLOCKS, TOY_STATE
+
+PARAM_SETS = [
+    {'label': 'a', 'environmental_label': 'x', 'rate': 1.0, 'f': len},
+    {'label': 'b', 'environmental_label': 'y', 'rate': 2.0, 'f': len},
+]
+
+
+def toy_results() -> pd.DataFrame:
+    return run_single(
+        PARAM_SETS,
+        10,
+        2,
+        TOY_STATE,
+        TOY_BLOCKS,
+        {'label', 'environmental_label', 'rate', 'f'},
+    )
+
+
+def test_write_read_results(tmp_path):
+    sim_df = toy_results()
+    path = write_results(sim_df, 'toy', '2024-01-01_00-00-00', str(tmp_path))
+    partition = os.path.join(path, 'label=b', 'environmental_label=y')
+    assert os.path.exists(partition)
+    df = read_results(path)
+    # Functions are stored by their description
+    assert (df['f'] == str(len)).all()
+    pd.testing.assert_frame_equal(
+        df.drop(columns='f'), sim_df.drop(columns='f'), check_dtype=False
+    )
+
+
+def test_migrate_pickles(tmp_path):
+    sim_df = toy_results()
+    sim_df.to_pickle(tmp_path / 'toy-2024-01-01_00-00-00.pkl.gz', compression='gzip')
+    [path] = migrate_pickles(str(tmp_path), remove=True)
+    assert path.endswith('toy-2024-01-01_00-00-00.parquet')
+    assert not any(tmp_path.glob('*.pkl.gz'))
+    assert len(read_results(path)) == len(sim_df)
+
+
+def test_load_results(tmp_path):
+    sim_df = toy_results()
+    write_results(sim_df, 'toy', '2024-01-01_00-00-00', str(tmp_path))
+    older = sim_df.assign(balance=-1.0)
+    write_results(older, 'toy', '2023-01-01_00-00-00', str(tmp_path))
+
+    df = load_results(
+        'toy',
+        columns=['balance', 'label'],
+        filters=[('timestep', '<=', 5)],
+        runs=[2],
+        directory=str(tmp_path),
+    )
+    assert list(df.columns) == ['balance', 'label']
+    expected = sim_df[(sim_df['timestep'] <= 5) & (sim_df['run'] == 2)]
+    assert list(df['balance']) == list(expected['balance'])
+
+    df = load_results('toy', exclude=['f', 'rate'], directory=str(tmp_path))
+    assert 'f' not in df and 'balance' in df and len(df) == len(sim_df)
+
+
+def test_runs_table(tmp_path):
+    sim_df = toy_results()
+    sim_df['zeros'] = 0.0
+    path = write_results(sim_df, 'toy', '2024-01-01_00-00-00', str(tmp_path))
+    runs = pd.read_parquet(os.path.join(path, '_runs.parquet'))
+    assert len(runs) == 4 and {'rate', 'f', 'zeros'} <= set(runs.columns)
+
+    df = read_results(path, columns=['balance', 'rate'])
+    assert list(df.groupby('rate')['balance'].last()) == [10.0, 20.0]
+
+    df = read_results(path, categorical=True, sparse=True)
+    assert list(df.columns) == list(sim_df.columns)
+    assert df['label'].dtype == 'category'
+    assert isinstance(df['zeros'].dtype, pd.SparseDtype)
+
+
+def test_write_float32(tmp_path):
+    sim_df = toy_results()
+    path = write_results(
+        sim_df, 'toy', '2024-01-01_00-00-00', str(tmp_path), precision='float32'
+    )
+    assert read_results(path)['balance'].dtype == 'float32'
+
+
+def test_append_results(tmp_path):
+    sim_df = toy_results()
+    parts = [sim_df[sim_df['subset'] == subset] for subset in [1, 0]]
+    with ThreadPoolExecutor(2) as pool:
+        [path, _] = pool.map(
+            lambda part: append_results(
+                part, 'toy', '2024-01-01_00-00-00', str(tmp_path)
+            ),
+            parts,
+        )
+    version, segments, _ = manifest_snapshot(path)
+    assert version == 1 and len(segments) == 2
+    expected = read_results(path)
+    pd.testing.assert_frame_equal(
+        expected.drop(columns='f'), sim_df.drop(columns='f'), check_dtype=False
+    )
+
+    merged = compact_segments(path)
+    assert list(manifest_snapshot(path)[1]) == [merged]
+    # Older snapshots stay readable until the replaced segments are vacuumed
+    assert all(
+        os.path.exists(os.path.join(path, 'segments', s)) for s in segments
+    )
+    assert sorted(vacuum_segments(path)) == sorted(segments)
+    pd.testing.assert_frame_equal(read_results(path), expected)
+
+
+def test_background_writer(tmp_path):
+    sim_df = toy_results()
+    with BackgroundWriter(
+        'toy', '2024-01-01_00-00-00', str(tmp_path), max_pending=1
+    ) as writer:
+        for subset in [0, 1]:
+            writer.put(sim_df[sim_df['subset'] == subset])
+        # Partial results are neither in place nor in the catalog
+        assert not os.path.exists(writer.path)
+        assert latest_timestamp('toy', str(tmp_path)) is None
+    assert writer.frames == 2
+    # Closing moves the dataset into place, in the layout of write_results
+    assert os.path.exists(os.path.join(writer.path, '_runs.parquet'))
+    assert os.path.exists(os.path.join(writer.path, 'label=b'))
+    assert latest_timestamp('toy', str(tmp_path)) == '2024-01-01_00-00-00'
+    record = find_results(str(tmp_path), experiment='toy').iloc[0]
+    assert (record['rows'], record['samples'], record['subsets']) == (len(sim_df), 2, 2)
+    pd.testing.assert_frame_equal(
+        read_results(writer.path).drop(columns='f'),
+        sim_df.drop(columns='f'),
+        check_dtype=False,
+    )
+
+    # Partial results are deleted when the producer fails
+    with pytest.raises(ValueError):
+        with BackgroundWriter('toy', '2025-01-01_00-00-00', str(tmp_path)) as writer:
+            writer.put(sim_df)
+            raise ValueError('simulation failed')
+    assert not os.path.exists(writer.path) and not os.path.exists(writer.partial)
+    assert latest_timestamp('toy', str(tmp_path)) == '2024-01-01_00-00-00'
+
+    # Write errors surface in the producer
+    (tmp_path / 'file').touch()
+    writer = BackgroundWriter('toy', '2025-01-01_00-00-00', str(tmp_path / 'file'))
+    writer.put(sim_df)
+    with pytest.raises(RuntimeError):
+        writer.close()
+
+
+def test_virtual_columns(tmp_path, monkeypatch):
+    balances = [
+        'operators_balance',
+        'nominators_balance',
+        'holders_balance',
+        'farmers_balance',
+        'staking_pool_balance',
+        'fund_balance',
+        'other_issuance_balance',
+        'reward_issuance_balance',
+        'burnt_balance',
+    ]
+    sim_df = toy_results()
+    for i, column in enumerate(balances):
+        sim_df[column] = sim_df['balance'] * (i + 1)
+    for column, function in VIRTUAL_COLUMNS.items():
+        sim_df[column] = sim_df.apply(function, axis=1)
+    assert virtual_dependencies('circulating_supply') == balances[:4]
+
+    path = write_results(sim_df, 'toy', '2024-01-01_00-00-00', str(tmp_path))
+    schema = ds.dataset(path, format='parquet', partitioning='hive').schema
+    assert 'sum_of_stocks' not in schema.names
+    pd.testing.assert_frame_equal(
+        read_results(path).drop(columns='f'),
+        sim_df.drop(columns='f'),
+        check_dtype=False,
+    )
+    df = read_results(path, columns=['run', 'circulating_supply'])
+    assert list(df.columns) == ['run', 'circulating_supply']
+    assert list(df['circulating_supply']) == list(sim_df['circulating_supply'])
+
+    # New definitions apply to stored results
+    monkeypatch.setitem(VIRTUAL_COLUMNS, 'fund_supply', lambda s: s['fund_balance'])
+    df = read_results(path, columns=['fund_supply'])
+    assert list(df['fund_supply']) == list(sim_df['fund_balance'])
+
+
+def test_virtual_columns_match_model():
+    # The model stores the same values as the virtual columns compute,
+    # from the initial state on
+    state = dict(INITIAL_STATE)
+    for i, column in enumerate(c for c in state if c.endswith('_balance')):
+        state[column] = 10.0 * (i + 1)
+    metrics = next(b for b in SUBSPACE_MODEL_BLOCKS if b['label'] == 'Metrics')
+    for column, function in VIRTUAL_COLUMNS.items():
+        assert INITIAL_STATE[column] == function(INITIAL_STATE)
+        update = metrics['variables'][column]
+        assert update({}, 0, [], state, {}) == (column, function(state))
+
+
+def test_metrics_store_supplies_under_their_names():
+    # The Metrics block used to write earned_supply and
+    # earned_minus_burned_supply under the user_supply key
+    state = {
+        **INITIAL_STATE,
+        'holders_balance': 1.0,
+        'staking_pool_balance': 2.0,
+        'fund_balance': 4.0,
+        'burnt_balance': 8.0,
+    }
+    metrics = next(b for b in SUBSPACE_MODEL_BLOCKS if b['label'] == 'Metrics')
+    updates = {
+        column: metrics['variables'][column]({}, 0, [], state, {})
+        for column in ['user_supply', 'earned_supply', 'earned_minus_burned_supply']
+    }
+    assert updates['user_supply'] == ('user_supply', 3.0)
+    assert updates['earned_supply'] == ('earned_supply', 7.0)
+    assert updates['earned_minus_burned_supply'] == ('earned_minus_burned_supply', -1.0)
+    assert INITIAL_STATE['sum_of_stocks'] == MAX_CREDIT_ISSUANCE
+    assert INITIAL_STATE['total_supply'] == MAX_CREDIT_ISSUANCE - ISSUANCE_FOR_FARMERS